@@ -1,5 +1,6 @@
 import requests
 from huggingface_hub import HfApi
+from interpreter.core.utils.http_pool import http_pool
 import openai
 import os
 
@@ -21,7 +22,7 @@ class ModelManager:
 
     def discover_ollama_models(self):
         try:
-            response = requests.get(f"{self.ollama_url}/api/tags")
+            response = http_pool.get(f"{self.ollama_url}/api/tags")
             response.raise_for_status()
             models = response.json().get("models", [])
             return [{"name": model["name"], "source": "ollama"} for model in models]
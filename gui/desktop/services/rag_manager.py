@@ -4,7 +4,7 @@ import markdown
 from bs4 import BeautifulSoup
 import chromadb
 import uuid
-from sentence_transformers import SentenceTransformer
+from interpreter.core.llm.utils.embedding_service import get_embedding_service
 import google.generativeai as genai
 from .rag_config import RAGConfig
 
@@ -12,8 +12,6 @@ import nltk
 from nltk.tokenize import sent_tokenize
 
 class RAGManager:
-    _embedding_model_cache = {}
-
     def __init__(self, document_storage_service, permission_service, rag_config=None, embedding_model_name="all-MiniLM-L6-v2"):
         self.document_storage_service = document_storage_service
         self.permission_service = permission_service
@@ -38,9 +36,8 @@ class RAGManager:
                 print("   RAG features may be limited")
 
     def _get_embedding_model(self, model_name):
-        if model_name not in self._embedding_model_cache:
-            self._embedding_model_cache[model_name] = SentenceTransformer(model_name)
-        return self._embedding_model_cache[model_name]
+        # Shared with the interpreter's Llm.embed, so the model is only loaded once per process
+        return get_embedding_service(model_name)
 
     def create_collection(self, name, embedding_model_name=None, agent_id=None):
         if name in self.collections:
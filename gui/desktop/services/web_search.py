@@ -1,5 +1,6 @@
 import requests
 from bs4 import BeautifulSoup
+from interpreter.core.utils.http_pool import http_pool
 
 class WebSearchService:
     def __init__(self, searxng_url="http://localhost:8888"): # Default SearXNG URL
@@ -11,7 +12,7 @@ class WebSearchService:
                 "q": query,
                 "format": "json"
             }
-            response = requests.get(f"{self.searxng_url}/search", params=params)
+            response = http_pool.get(f"{self.searxng_url}/search", params=params)
             response.raise_for_status()  # Raise an exception for HTTP errors
             results = response.json()
             return self._parse_results(results)
@@ -32,7 +33,7 @@ class WebSearchService:
 
     def scrape_article(self, url):
         try:
-            response = requests.get(url)
+            response = http_pool.get(url)
             response.raise_for_status()
             soup = BeautifulSoup(response.text, 'html.parser')
             # Attempt to extract main content. This is a simplified approach.
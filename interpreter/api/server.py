@@ -18,6 +18,7 @@ except ImportError:
     print("📝 python-dotenv not installed, using system environment variables only")
 
 from fastapi import FastAPI, HTTPException, Request, Response, UploadFile, File, Query, Depends
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from fastapi.responses import StreamingResponse, FileResponse
@@ -25,6 +26,8 @@ from pydantic import BaseModel
 import uvicorn
 
 from ..core.utils.lazy_import import lazy_import
+from ..core.utils.session_pool import SessionPool, SessionPoolFull, session_key
+from ..core.utils.tool_runtime import run_code, screenshot_base64
 
 # Lazy imports for dependencies
 uvicorn = lazy_import("uvicorn")
@@ -144,6 +147,11 @@ def create_colonel_katie_server(interpreter, host="localhost", port=8264, auth_t
         allow_headers=["*"],
     )
     
+    # Tool calls run on their conversation's own copy of the interpreter (see SessionPool)
+    session_pool = SessionPool(interpreter)
+    app.state.session_pool = session_pool
+    app.add_event_handler("shutdown", session_pool.close)
+    
     # Security
     security = HTTPBearer(auto_error=False) if auth_token else None
     
@@ -155,53 +163,20 @@ def create_colonel_katie_server(interpreter, host="localhost", port=8264, auth_t
         if auth_token and (not credentials or credentials.credentials != auth_token):
             raise HTTPException(status_code=401, detail="Invalid authentication")
         return True
-    
-    def load_profile(profile_name: Optional[str] = None):
-        """Load profile configuration (defaults to fast.yaml for gpt-4o-mini)"""
-        if not profile_name:
-            profile_name = "fast.yaml"  # Default to fast profile with gpt-4o-mini
-            
-        # Look for profile in profiles directory
-        profiles_dir = Path(__file__).parent.parent / "terminal_interface" / "profiles" / "defaults"
-        
-        # Try both .py and .yaml/.yml extensions
-        for ext in [".py", ".yaml", ".yml"]:
-            profile_file = profiles_dir / f"{profile_name.replace('.yaml', '').replace('.yml', '')}{ext}"
-            if profile_file.exists():
-                break
-        else:
-            # If no profile file found, try the built-in profile loading
-            try:
-                from interpreter.terminal_interface.profiles.profiles import profile
-                profile(interpreter, profile_name)
-                print(f"Loaded profile: {profile_name}")
-                return True
-            except Exception as e:
-                print(f"Error loading profile {profile_name}: {e}")
-                return None
-        
-        if profile_file.exists():
-            try:
-                # Import and return profile configuration
-                import importlib.util
-                spec = importlib.util.spec_from_file_location(profile_name, profile_file)
-                profile_module = importlib.util.module_from_spec(spec)
-                spec.loader.exec_module(profile_module)
-                
-                # Apply profile settings to interpreter
-                if hasattr(profile_module, 'interpreter'):
-                    profile_config = profile_module.interpreter
-                    for key, value in profile_config.items():
-                        if hasattr(interpreter, key):
-                            setattr(interpreter, key, value)
-                        elif hasattr(interpreter.llm, key):
-                            setattr(interpreter.llm, key, value)
-                            
-                return profile_config
-            except Exception as e:
-                print(f"Error loading profile {profile_name}: {e}")
-        
-        return None
+
+    async def tool_runtime(http_request: Request):
+        """The conversation's own interpreter for running tool code, checked out for one call"""
+        key = session_key(http_request.headers)  # None (a one-off session) without a conversation header
+        if key is not None:
+            key = "tools|" + key
+        try:
+            session = await run_in_threadpool(session_pool.checkout, key)
+        except SessionPoolFull as e:
+            raise HTTPException(status_code=503, detail=str(e))
+        try:
+            yield session.interpreter
+        finally:
+            session_pool.release(session)
     
     @app.get("/openapi.json")
     async def get_openapi():
@@ -801,48 +776,20 @@ def create_colonel_katie_server(interpreter, host="localhost", port=8264, auth_t
     
     # Individual tool endpoints
     @app.post("/python/execute")
-    async def python_tool_execute(request: ExecuteCodeRequest, _: bool = Depends(verify_auth)):
+    async def python_tool_execute(request: ExecuteCodeRequest, _: bool = Depends(verify_auth), runtime=Depends(tool_runtime)):
         """Python Code Executor - Execute Python code"""
         try:
-            # Save current state
-            saved_messages = interpreter.messages.copy()
-            interpreter.messages = []
-            result_chunks = []
-            
-            for chunk in interpreter.chat(f"```python\n{request.code}\n```", stream=True, display=False):
-                if isinstance(chunk, dict) and chunk.get("type") == "console" and "content" in chunk:
-                    result_chunks.append(chunk["content"])
-            
-            # Restore previous state
-            interpreter.messages = saved_messages
-            
-            output = "".join(result_chunks)
-            return {"output": output, "error": None}
-            
+            return await run_in_threadpool(run_code, runtime, "python", request.code)
         except Exception as e:
-            return {"output": "", "error": str(e)}
+            return {"output": "", "images": [], "error": str(e)}
     
     @app.post("/shell/execute")
-    async def shell_tool_execute(request: ExecuteShellRequest, _: bool = Depends(verify_auth)):
+    async def shell_tool_execute(request: ExecuteShellRequest, _: bool = Depends(verify_auth), runtime=Depends(tool_runtime)):
         """Shell Command Executor - Execute shell commands"""
         try:
-            # Save current state
-            saved_messages = interpreter.messages.copy()
-            interpreter.messages = []
-            result_chunks = []
-            
-            for chunk in interpreter.chat(f"```bash\n{request.command}\n```", stream=True, display=False):
-                if isinstance(chunk, dict) and chunk.get("type") == "console" and "content" in chunk:
-                    result_chunks.append(chunk["content"])
-            
-            # Restore previous state
-            interpreter.messages = saved_messages
-            
-            output = "".join(result_chunks)
-            return {"output": output, "error": None}
-            
+            return await run_in_threadpool(run_code, runtime, "shell", request.command)
         except Exception as e:
-            return {"output": "", "error": str(e)}
+            return {"output": "", "images": [], "error": str(e)}
     
     @app.post("/files/read")
     async def files_tool_read(request: FileReadRequest, _: bool = Depends(verify_auth)):
@@ -908,13 +855,8 @@ def create_colonel_katie_server(interpreter, host="localhost", port=8264, auth_t
     async def take_screenshot(_: bool = Depends(verify_auth)):
         """Take a screenshot"""
         try:
-            result_chunks = []
-            for chunk in interpreter.chat("```python\ncomputer.display.screenshot()\n```", stream=True, display=False):
-                if chunk.get("type") == "console" and "content" in chunk:
-                    result_chunks.append(chunk["content"])
-            
-            output = "".join(result_chunks)
-            return {"output": output, "error": None}
+            image = await run_in_threadpool(screenshot_base64, interpreter.computer)
+            return {"output": "", "image": image, "error": None}
         except Exception as e:
             return {"output": "", "error": str(e)}
 
@@ -927,13 +869,8 @@ def create_colonel_katie_server(interpreter, host="localhost", port=8264, auth_t
             if x is None or y is None:
                 return {"output": "", "error": "x and y coordinates required"}
             
-            result_chunks = []
-            for chunk in interpreter.chat(f"```python\ncomputer.mouse.click({x}, {y})\n```", stream=True, display=False):
-                if chunk.get("type") == "console" and "content" in chunk:
-                    result_chunks.append(chunk["content"])
-            
-            output = "".join(result_chunks)
-            return {"output": output, "error": None}
+            await run_in_threadpool(interpreter.computer.mouse.click, x, y)
+            return {"output": "", "error": None}
         except Exception as e:
             return {"output": "", "error": str(e)}
 
@@ -941,15 +878,8 @@ def create_colonel_katie_server(interpreter, host="localhost", port=8264, auth_t
     async def type_text(request: dict, _: bool = Depends(verify_auth)):
         """Type text"""
         try:
-            text = request.get("text", "")
-            
-            result_chunks = []
-            for chunk in interpreter.chat(f"```python\ncomputer.keyboard.write({repr(text)})\n```", stream=True, display=False):
-                if isinstance(chunk, dict) and chunk.get("type") == "console" and "content" in chunk:
-                    result_chunks.append(chunk["content"])
-            
-            output = "".join(result_chunks)
-            return {"output": output, "error": None}
+            await run_in_threadpool(interpreter.computer.keyboard.write, request.get("text", ""))
+            return {"output": "", "error": None}
         except Exception as e:
             return {"output": "", "error": str(e)}
 
@@ -957,15 +887,8 @@ def create_colonel_katie_server(interpreter, host="localhost", port=8264, auth_t
     async def press_key(request: dict, _: bool = Depends(verify_auth)):
         """Press a key or key combination"""
         try:
-            key = request.get("key", "")
-            
-            result_chunks = []
-            for chunk in interpreter.chat(f"```python\ncomputer.keyboard.press({repr(key)})\n```", stream=True, display=False):
-                if chunk.get("type") == "console" and "content" in chunk:
-                    result_chunks.append(chunk["content"])
-            
-            output = "".join(result_chunks)
-            return {"output": output, "error": None}
+            await run_in_threadpool(interpreter.computer.keyboard.press, request.get("key", ""))
+            return {"output": "", "error": None}
         except Exception as e:
             return {"output": "", "error": str(e)}
 
@@ -1022,358 +945,277 @@ def create_colonel_katie_server(interpreter, host="localhost", port=8264, auth_t
         desktop: int
 
     @app.post("/kde/clipboard/get")
-    async def kde_clipboard_get(_: bool = Depends(verify_auth)):
+    async def kde_clipboard_get(_: bool = Depends(verify_auth), runtime=Depends(tool_runtime)):
         """Get clipboard contents using KDE tools."""
         try:
             code = "print(computer.kde_clipboard.get_contents())"
-            result_chunks = []
-            for chunk in interpreter.chat(f"```python\n{code}\n```", stream=True, display=False):
-                if isinstance(chunk, dict) and chunk.get("type") == "console" and "content" in chunk:
-                    result_chunks.append(chunk["content"])
-            output = "".join(result_chunks)
+            result = await run_in_threadpool(run_code, runtime, "python", code, computer_api=True)
+            output = result["output"]
             return {"output": output, "error": None}
         except Exception as e:
             return {"output": "", "error": str(e)}
 
     @app.post("/kde/clipboard/set")
-    async def kde_clipboard_set(request: ClipboardSetRequest, _: bool = Depends(verify_auth)):
+    async def kde_clipboard_set(request: ClipboardSetRequest, _: bool = Depends(verify_auth), runtime=Depends(tool_runtime)):
         """Set clipboard contents using KDE tools."""
         try:
             code = f"computer.kde_clipboard.set_contents({repr(request.text)})"
-            result_chunks = []
-            for chunk in interpreter.chat(f"```python\n{code}\n```", stream=True, display=False):
-                if isinstance(chunk, dict) and chunk.get("type") == "console" and "content" in chunk:
-                    result_chunks.append(chunk["content"])
-            output = "".join(result_chunks)
+            result = await run_in_threadpool(run_code, runtime, "python", code, computer_api=True)
+            output = result["output"]
             return {"output": output, "error": None}
         except Exception as e:
             return {"output": "", "error": str(e)}
 
     @app.post("/kde/file/write")
-    async def kde_file_write(request: FileWriteRequestKDE, _: bool = Depends(verify_auth)):
+    async def kde_file_write(request: FileWriteRequestKDE, _: bool = Depends(verify_auth), runtime=Depends(tool_runtime)):
         """Write content to a file using KDE tools."""
         try:
             code = f"computer.kde_file_operations.write_file_content({repr(request.path)}, {repr(request.content)})"
-            result_chunks = []
-            for chunk in interpreter.chat(f"```python\n{code}\n```", stream=True, display=False):
-                if isinstance(chunk, dict) and chunk.get("type") == "console" and "content" in chunk:
-                    result_chunks.append(chunk["content"])
-            output = "".join(result_chunks)
+            result = await run_in_threadpool(run_code, runtime, "python", code, computer_api=True)
+            output = result["output"]
             return {"output": output, "error": None}
         except Exception as e:
             return {"output": "", "error": str(e)}
 
     @app.post("/kde/file/read")
-    async def kde_file_read(request: FileReadRequestKDE, _: bool = Depends(verify_auth)):
+    async def kde_file_read(request: FileReadRequestKDE, _: bool = Depends(verify_auth), runtime=Depends(tool_runtime)):
         """Read content from a file using KDE tools."""
         try:
             code = f"print(computer.kde_file_operations.read_file_content({repr(request.path)}))"
-            result_chunks = []
-            for chunk in interpreter.chat(f"```python\n{code}\n```", stream=True, display=False):
-                if isinstance(chunk, dict) and chunk.get("type") == "console" and "content" in chunk:
-                    result_chunks.append(chunk["content"])
-            output = "".join(result_chunks)
+            result = await run_in_threadpool(run_code, runtime, "python", code, computer_api=True)
+            output = result["output"]
             return {"output": output, "error": None}
         except Exception as e:
             return {"output": "", "error": str(e)}
 
     @app.post("/kde/file/append")
-    async def kde_file_append(request: FileAppendRequestKDE, _: bool = Depends(verify_auth)):
+    async def kde_file_append(request: FileAppendRequestKDE, _: bool = Depends(verify_auth), runtime=Depends(tool_runtime)):
         """Append content to a file using KDE tools."""
         try:
             code = f"computer.kde_file_operations.append_file_content({repr(request.path)}, {repr(request.content)})"
-            result_chunks = []
-            for chunk in interpreter.chat(f"```python\n{code}\n```", stream=True, display=False):
-                if isinstance(chunk, dict) and chunk.get("type") == "console" and "content" in chunk:
-                    result_chunks.append(chunk["content"])
-            output = "".join(result_chunks)
+            result = await run_in_threadpool(run_code, runtime, "python", code, computer_api=True)
+            output = result["output"]
             return {"output": output, "error": None}
         except Exception as e:
             return {"output": "", "error": str(e)}
 
     @app.post("/kde/file/create_directory")
-    async def kde_file_create_directory(request: FileCreateDirectoryRequestKDE, _: bool = Depends(verify_auth)):
+    async def kde_file_create_directory(request: FileCreateDirectoryRequestKDE, _: bool = Depends(verify_auth), runtime=Depends(tool_runtime)):
         """Create a new directory using KDE tools."""
         try:
             code = f"computer.kde_file_operations.create_directory({repr(request.path)})"
-            result_chunks = []
-            for chunk in interpreter.chat(f"```python\n{code}\n```", stream=True, display=False):
-                if isinstance(chunk, dict) and chunk.get("type") == "console" and "content" in chunk:
-                    result_chunks.append(chunk["content"])
-            output = "".join(result_chunks)
+            result = await run_in_threadpool(run_code, runtime, "python", code, computer_api=True)
+            output = result["output"]
             return {"output": output, "error": None}
         except Exception as e:
             return {"output": "", "error": str(e)}
 
     @app.post("/kde/file/delete_file")
-    async def kde_file_delete_file(request: FileDeleteRequestKDE, _: bool = Depends(verify_auth)):
+    async def kde_file_delete_file(request: FileDeleteRequestKDE, _: bool = Depends(verify_auth), runtime=Depends(tool_runtime)):
         """Delete a file using KDE tools."""
         try:
             code = f"computer.kde_file_operations.delete_file({repr(request.path)})"
-            result_chunks = []
-            for chunk in interpreter.chat(f"```python\n{code}\n```", stream=True, display=False):
-                if isinstance(chunk, dict) and chunk.get("type") == "console" and "content" in chunk:
-                    result_chunks.append(chunk["content"])
-            output = "".join(result_chunks)
+            result = await run_in_threadpool(run_code, runtime, "python", code, computer_api=True)
+            output = result["output"]
             return {"output": output, "error": None}
         except Exception as e:
             return {"output": "", "error": str(e)}
 
     @app.post("/kde/file/delete_directory")
-    async def kde_file_delete_directory(request: FileDeleteRequestKDE, _: bool = Depends(verify_auth)):
+    async def kde_file_delete_directory(request: FileDeleteRequestKDE, _: bool = Depends(verify_auth), runtime=Depends(tool_runtime)):
         """Delete a directory using KDE tools."""
         try:
             code = f"computer.kde_file_operations.delete_directory({repr(request.path)})"
-            result_chunks = []
-            for chunk in interpreter.chat(f"```python\n{code}\n```", stream=True, display=False):
-                if isinstance(chunk, dict) and chunk.get("type") == "console" and "content" in chunk:
-                    result_chunks.append(chunk["content"])
-            output = "".join(result_chunks)
+            result = await run_in_threadpool(run_code, runtime, "python", code, computer_api=True)
+            output = result["output"]
             return {"output": output, "error": None}
         except Exception as e:
             return {"output": "", "error": str(e)}
 
     @app.post("/kde/file/list_directory")
-    async def kde_file_list_directory(request: FileReadRequestKDE, _: bool = Depends(verify_auth)):
+    async def kde_file_list_directory(request: FileReadRequestKDE, _: bool = Depends(verify_auth), runtime=Depends(tool_runtime)):
         """List contents of a directory using KDE tools."""
         try:
             code = f"print(computer.kde_file_operations.list_directory_contents({repr(request.path)}))"
-            result_chunks = []
-            for chunk in interpreter.chat(f"```python\n{code}\n```", stream=True, display=False):
-                if isinstance(chunk, dict) and chunk.get("type") == "console" and "content" in chunk:
-                    result_chunks.append(chunk["content"])
-            output = "".join(result_chunks)
+            result = await run_in_threadpool(run_code, runtime, "python", code, computer_api=True)
+            output = result["output"]
             return {"output": output, "error": None}
         except Exception as e:
             return {"output": "", "error": str(e)}
 
     @app.post("/kde/file/move")
-    async def kde_file_move(request: FileMoveCopyRequestKDE, _: bool = Depends(verify_auth)):
+    async def kde_file_move(request: FileMoveCopyRequestKDE, _: bool = Depends(verify_auth), runtime=Depends(tool_runtime)):
         """Move a file or directory using KDE tools."""
         try:
             code = f"computer.kde_file_operations.move_item({repr(request.source_path)}, {repr(request.destination_path)})"
-            result_chunks = []
-            for chunk in interpreter.chat(f"```python\n{code}\n```", stream=True, display=False):
-                if isinstance(chunk, dict) and chunk.get("type") == "console" and "content" in chunk:
-                    result_chunks.append(chunk["content"])
-            output = "".join(result_chunks)
+            result = await run_in_threadpool(run_code, runtime, "python", code, computer_api=True)
+            output = result["output"]
             return {"output": output, "error": None}
         except Exception as e:
             return {"output": "", "error": str(e)}
 
     @app.post("/kde/file/copy")
-    async def kde_file_copy(request: FileMoveCopyRequestKDE, _: bool = Depends(verify_auth)):
+    async def kde_file_copy(request: FileMoveCopyRequestKDE, _: bool = Depends(verify_auth), runtime=Depends(tool_runtime)):
         """Copy a file or directory using KDE tools."""
         try:
             code = f"computer.kde_file_operations.copy_item({repr(request.source_path)}, {repr(request.destination_path)})"
-            result_chunks = []
-            for chunk in interpreter.chat(f"```python\n{code}\n```", stream=True, display=False):
-                if isinstance(chunk, dict) and chunk.get("type") == "console" and "content" in chunk:
-                    result_chunks.append(chunk["content"])
-            output = "".join(result_chunks)
+            result = await run_in_threadpool(run_code, runtime, "python", code, computer_api=True)
+            output = result["output"]
             return {"output": output, "error": None}
         except Exception as e:
             return {"output": "", "error": str(e)}
 
     @app.post("/kde/notifications/send")
-    async def kde_notifications_send(request: NotificationSendRequest, _: bool = Depends(verify_auth)):
+    async def kde_notifications_send(request: NotificationSendRequest, _: bool = Depends(verify_auth), runtime=Depends(tool_runtime)):
         """Send a desktop notification using KDE tools."""
         try:
             code = f"computer.kde_notifications.send_notification(summary={repr(request.summary)}, body={repr(request.body)}, app_name={repr(request.app_name)}, app_icon={repr(request.app_icon)}, timeout={request.timeout})"
-            result_chunks = []
-            for chunk in interpreter.chat(f"```python\n{code}\n```", stream=True, display=False):
-                if isinstance(chunk, dict) and chunk.get("type") == "console" and "content" in chunk:
-                    result_chunks.append(chunk["content"])
-            output = "".join(result_chunks)
+            result = await run_in_threadpool(run_code, runtime, "python", code, computer_api=True)
+            output = result["output"]
             return {"output": output, "error": None}
         except Exception as e:
             return {"output": "", "error": str(e)}
 
     @app.post("/kde/plasma/evaluate_script")
-    async def kde_plasma_evaluate_script(request: PlasmaEvaluateScriptRequest, _: bool = Depends(verify_auth)):
+    async def kde_plasma_evaluate_script(request: PlasmaEvaluateScriptRequest, _: bool = Depends(verify_auth), runtime=Depends(tool_runtime)):
         """Evaluate a JavaScript script in the Plasma Shell using KDE tools."""
         try:
             code = f"print(computer.kde_plasma_shell.evaluate_script({repr(request.script)}))"
-            result_chunks = []
-            for chunk in interpreter.chat(f"```python\n{code}\n```", stream=True, display=False):
-                if isinstance(chunk, dict) and chunk.get("type") == "console" and "content" in chunk:
-                    result_chunks.append(chunk["content"])
-            output = "".join(result_chunks)
+            result = await run_in_threadpool(run_code, runtime, "python", code, computer_api=True)
+            output = result["output"]
             return {"output": output, "error": None}
         except Exception as e:
             return {"output": "", "error": str(e)}
 
     @app.post("/kde/virtual_desktops/get_count")
-    async def kde_virtual_desktops_get_count(_: bool = Depends(verify_auth)):
+    async def kde_virtual_desktops_get_count(_: bool = Depends(verify_auth), runtime=Depends(tool_runtime)):
         """Get the number of virtual desktops using KDE tools."""
         try:
             code = "print(computer.kde_virtual_desktops.get_desktop_count())"
-            result_chunks = []
-            for chunk in interpreter.chat(f"```python\n{code}\n```", stream=True, display=False):
-                if isinstance(chunk, dict) and chunk.get("type") == "console" and "content" in chunk:
-                    result_chunks.append(chunk["content"])
-            output = "".join(result_chunks)
+            result = await run_in_threadpool(run_code, runtime, "python", code, computer_api=True)
+            output = result["output"]
             return {"output": output, "error": None}
         except Exception as e:
             return {"output": "", "error": str(e)}
 
     @app.post("/kde/virtual_desktops/get_current")
-    async def kde_virtual_desktops_get_current(_: bool = Depends(verify_auth)):
+    async def kde_virtual_desktops_get_current(_: bool = Depends(verify_auth), runtime=Depends(tool_runtime)):
         """Get the ID of the current virtual desktop using KDE tools."""
         try:
             code = "print(computer.kde_virtual_desktops.get_current_desktop())"
-            result_chunks = []
-            for chunk in interpreter.chat(f"```python\n{code}\n```", stream=True, display=False):
-                if isinstance(chunk, dict) and chunk.get("type") == "console" and "content" in chunk:
-                    result_chunks.append(chunk["content"])
-            output = "".join(result_chunks)
+            result = await run_in_threadpool(run_code, runtime, "python", code, computer_api=True)
+            output = result["output"]
             return {"output": output, "error": None}
         except Exception as e:
             return {"output": "", "error": str(e)}
 
     @app.post("/kde/virtual_desktops/create")
-    async def kde_virtual_desktops_create(request: VirtualDesktopCreateRequest, _: bool = Depends(verify_auth)):
+    async def kde_virtual_desktops_create(request: VirtualDesktopCreateRequest, _: bool = Depends(verify_auth), runtime=Depends(tool_runtime)):
         """Create a new virtual desktop using KDE tools."""
         try:
             code = f"computer.kde_virtual_desktops.create_desktop(position={request.position}, name={repr(request.name)})"
-            result_chunks = []
-            for chunk in interpreter.chat(f"```python\n{code}\n```", stream=True, display=False):
-                if isinstance(chunk, dict) and chunk.get("type") == "console" and "content" in chunk:
-                    result_chunks.append(chunk["content"])
-            output = "".join(result_chunks)
+            result = await run_in_threadpool(run_code, runtime, "python", code, computer_api=True)
+            output = result["output"]
             return {"output": output, "error": None}
         except Exception as e:
             return {"output": "", "error": str(e)}
 
     @app.post("/kde/virtual_desktops/remove")
-    async def kde_virtual_desktops_remove(request: VirtualDesktopRemoveRequest, _: bool = Depends(verify_auth)):
+    async def kde_virtual_desktops_remove(request: VirtualDesktopRemoveRequest, _: bool = Depends(verify_auth), runtime=Depends(tool_runtime)):
         """Remove a virtual desktop using KDE tools."""
         try:
             code = f"computer.kde_virtual_desktops.remove_desktop(desktop_id={repr(request.desktop_id)})"
-            result_chunks = []
-            for chunk in interpreter.chat(f"```python\n{code}\n```", stream=True, display=False):
-                if isinstance(chunk, dict) and chunk.get("type") == "console" and "content" in chunk:
-                    result_chunks.append(chunk["content"])
-            output = "".join(result_chunks)
+            result = await run_in_threadpool(run_code, runtime, "python", code, computer_api=True)
+            output = result["output"]
             return {"output": output, "error": None}
         except Exception as e:
             return {"output": "", "error": str(e)}
 
     @app.post("/kde/virtual_desktops/set_name")
-    async def kde_virtual_desktops_set_name(request: VirtualDesktopSetNameRequest, _: bool = Depends(verify_auth)):
+    async def kde_virtual_desktops_set_name(request: VirtualDesktopSetNameRequest, _: bool = Depends(verify_auth), runtime=Depends(tool_runtime)):
         """Set the name of a virtual desktop using KDE tools."""
         try:
             code = f"computer.kde_virtual_desktops.set_desktop_name(desktop_id={repr(request.desktop_id)}, name={repr(request.name)})"
-            result_chunks = []
-            for chunk in interpreter.chat(f"```python\n{code}\n```", stream=True, display=False):
-                if isinstance(chunk, dict) and chunk.get("type") == "console" and "content" in chunk:
-                    result_chunks.append(chunk["content"])
-            output = "".join(result_chunks)
+            result = await run_in_threadpool(run_code, runtime, "python", code, computer_api=True)
+            output = result["output"]
             return {"output": output, "error": None}
         except Exception as e:
             return {"output": "", "error": str(e)}
 
     @app.post("/kde/windows/get_info")
-    async def kde_windows_get_info(request: WindowInfoRequest, _: bool = Depends(verify_auth)):
+    async def kde_windows_get_info(request: WindowInfoRequest, _: bool = Depends(verify_auth), runtime=Depends(tool_runtime)):
         """Get information about a specific window using KDE tools."""
         try:
             code = f"print(computer.kde_windows.get_window_info(window_id={repr(request.window_id)}))"
-            result_chunks = []
-            for chunk in interpreter.chat(f"```python\n{code}\n```", stream=True, display=False):
-                if isinstance(chunk, dict) and chunk.get("type") == "console" and "content" in chunk:
-                    result_chunks.append(chunk["content"])
-            output = "".join(result_chunks)
+            result = await run_in_threadpool(run_code, runtime, "python", code, computer_api=True)
+            output = result["output"]
             return {"output": output, "error": None}
         except Exception as e:
             return {"output": "", "error": str(e)}
 
     @app.post("/kde/windows/query_info")
-    async def kde_windows_query_info(_: bool = Depends(verify_auth)):
+    async def kde_windows_query_info(_: bool = Depends(verify_auth), runtime=Depends(tool_runtime)):
         """Get information about all windows using KDE tools."""
         try:
             code = "print(computer.kde_windows.query_window_info())"
-            result_chunks = []
-            for chunk in interpreter.chat(f"```python\n{code}\n```", stream=True, display=False):
-                if isinstance(chunk, dict) and chunk.get("type") == "console" and "content" in chunk:
-                    result_chunks.append(chunk["content"])
-            output = "".join(result_chunks)
+            result = await run_in_threadpool(run_code, runtime, "python", code, computer_api=True)
+            output = result["output"]
             return {"output": output, "error": None}
         except Exception as e:
             return {"output": "", "error": str(e)}
 
     @app.post("/kde/windows/set_current_desktop")
-    async def kde_windows_set_current_desktop(request: WindowSetCurrentDesktopRequest, _: bool = Depends(verify_auth)):
+    async def kde_windows_set_current_desktop(request: WindowSetCurrentDesktopRequest, _: bool = Depends(verify_auth), runtime=Depends(tool_runtime)):
         """Switch to the specified virtual desktop using KDE tools."""
         try:
             code = f"computer.kde_windows.set_current_desktop(desktop={request.desktop})"
-            result_chunks = []
-            for chunk in interpreter.chat(f"```python\n{code}\n```", stream=True, display=False):
-                if isinstance(chunk, dict) and chunk.get("type") == "console" and "content" in chunk:
-                    result_chunks.append(chunk["content"])
-            output = "".join(result_chunks)
+            result = await run_in_threadpool(run_code, runtime, "python", code, computer_api=True)
+            output = result["output"]
             return {"output": output, "error": None}
         except Exception as e:
             return {"output": "", "error": str(e)}
 
     @app.post("/kde/windows/next_desktop")
-    async def kde_windows_next_desktop(_: bool = Depends(verify_auth)):
+    async def kde_windows_next_desktop(_: bool = Depends(verify_auth), runtime=Depends(tool_runtime)):
         """Switch to the next virtual desktop using KDE tools."""
         try:
             code = "computer.kde_windows.next_desktop()"
-            result_chunks = []
-            for chunk in interpreter.chat(f"```python\n{code}\n```", stream=True, display=False):
-                if isinstance(chunk, dict) and chunk.get("type") == "console" and "content" in chunk:
-                    result_chunks.append(chunk["content"])
-            output = "".join(result_chunks)
+            result = await run_in_threadpool(run_code, runtime, "python", code, computer_api=True)
+            output = result["output"]
             return {"output": output, "error": None}
         except Exception as e:
             return {"output": "", "error": str(e)}
 
     @app.post("/kde/windows/previous_desktop")
-    async def kde_windows_previous_desktop(_: bool = Depends(verify_auth)):
+    async def kde_windows_previous_desktop(_: bool = Depends(verify_auth), runtime=Depends(tool_runtime)):
         """Switch to the previous virtual desktop using KDE tools."""
         try:
             code = "computer.kde_windows.previous_desktop()"
-            result_chunks = []
-            for chunk in interpreter.chat(f"```python\n{code}\n```", stream=True, display=False):
-                if isinstance(chunk, dict) and chunk.get("type") == "console" and "content" in chunk:
-                    result_chunks.append(chunk["content"])
-            output = "".join(result_chunks)
+            result = await run_in_threadpool(run_code, runtime, "python", code, computer_api=True)
+            output = result["output"]
             return {"output": output, "error": None}
         except Exception as e:
             return {"output": "", "error": str(e)}
     
     # Browser Automation Tool Endpoints
     @app.post("/browser/navigate")
-    async def browser_navigate(request: BrowserNavigateRequest, _: bool = Depends(verify_auth)):
+    async def browser_navigate(request: BrowserNavigateRequest, _: bool = Depends(verify_auth), runtime=Depends(tool_runtime)):
         """Navigate browser to URL"""
         try:
-            saved_messages = interpreter.messages.copy()
-            interpreter.messages = []
-            result_chunks = []
-            
             code = f"""browser.navigate('{request.url}')
 print(f"Navigated to: {browser.get_url()}")
 print(f"Page title: {browser.get_title()}")"""
             
-            for chunk in interpreter.chat(f"```python\n{code}\n```", stream=True, display=False):
-                if isinstance(chunk, dict) and chunk.get("type") == "console" and "content" in chunk:
-                    result_chunks.append(chunk["content"])
-            
-            interpreter.messages = saved_messages
-            output = "".join(result_chunks)
+            result = await run_in_threadpool(run_code, runtime, "python", code, computer_api=True)
+            output = result["output"]
             return {"status": "success", "url": request.url, "output": output}
         except Exception as e:
             return {"status": "error", "message": str(e)}
     
     @app.post("/browser/click")
-    async def browser_click(request: BrowserClickRequest, _: bool = Depends(verify_auth)):
+    async def browser_click(request: BrowserClickRequest, _: bool = Depends(verify_auth), runtime=Depends(tool_runtime)):
         """Click web element"""
         try:
-            saved_messages = interpreter.messages.copy()
-            interpreter.messages = []
-            result_chunks = []
-            
             if request.selector_type == "css":
                 code = f"browser.click('{request.selector}')"
             elif request.selector_type == "xpath":
@@ -1381,46 +1223,30 @@ print(f"Page title: {browser.get_title()}")"""
             else:
                 code = f"browser.click('{request.selector}')"
             
-            for chunk in interpreter.chat(f"```python\n{code}\n```", stream=True, display=False):
-                if isinstance(chunk, dict) and chunk.get("type") == "console" and "content" in chunk:
-                    result_chunks.append(chunk["content"])
-            
-            interpreter.messages = saved_messages
-            output = "".join(result_chunks)
+            result = await run_in_threadpool(run_code, runtime, "python", code, computer_api=True)
+            output = result["output"]
             return {"status": "success", "message": "Element clicked", "output": output}
         except Exception as e:
             return {"status": "error", "message": str(e)}
     
     @app.post("/browser/fill")
-    async def browser_fill(request: BrowserFillRequest, _: bool = Depends(verify_auth)):
+    async def browser_fill(request: BrowserFillRequest, _: bool = Depends(verify_auth), runtime=Depends(tool_runtime)):
         """Fill form field"""
         try:
-            saved_messages = interpreter.messages.copy()
-            interpreter.messages = []
-            result_chunks = []
-            
             clear_code = f"browser.clear('{request.selector}')" if request.clear_first else ""
             code = f"""{clear_code}
 browser.fill('{request.selector}', '''{request.text}''')"""
             
-            for chunk in interpreter.chat(f"```python\n{code}\n```", stream=True, display=False):
-                if isinstance(chunk, dict) and chunk.get("type") == "console" and "content" in chunk:
-                    result_chunks.append(chunk["content"])
-            
-            interpreter.messages = saved_messages
-            output = "".join(result_chunks)
+            result = await run_in_threadpool(run_code, runtime, "python", code, computer_api=True)
+            output = result["output"]
             return {"status": "success", "message": "Field filled", "output": output}
         except Exception as e:
             return {"status": "error", "message": str(e)}
     
     @app.post("/browser/extract")
-    async def browser_extract(request: BrowserExtractRequest, _: bool = Depends(verify_auth)):
+    async def browser_extract(request: BrowserExtractRequest, _: bool = Depends(verify_auth), runtime=Depends(tool_runtime)):
         """Extract content from page"""
         try:
-            saved_messages = interpreter.messages.copy()
-            interpreter.messages = []
-            result_chunks = []
-            
             if request.extract_type == "page_source":
                 code = "print(browser.get_page_source())"
             elif request.selector:
@@ -1435,35 +1261,23 @@ browser.fill('{request.selector}', '''{request.text}''')"""
             else:
                 code = "print(browser.get_page_source())"
             
-            for chunk in interpreter.chat(f"```python\n{code}\n```", stream=True, display=False):
-                if isinstance(chunk, dict) and chunk.get("type") == "console" and "content" in chunk:
-                    result_chunks.append(chunk["content"])
-            
-            interpreter.messages = saved_messages
-            content = "".join(result_chunks)
+            result = await run_in_threadpool(run_code, runtime, "python", code, computer_api=True)
+            content = result["output"]
             return {"status": "success", "content": content, "elements_found": 1 if content else 0}
         except Exception as e:
             return {"status": "error", "content": "", "elements_found": 0}
     
     @app.post("/browser/search")
-    async def web_search(request: WebSearchRequest, _: bool = Depends(verify_auth)):
+    async def web_search(request: WebSearchRequest, _: bool = Depends(verify_auth), runtime=Depends(tool_runtime)):
         """Perform web search"""
         try:
-            saved_messages = interpreter.messages.copy()
-            interpreter.messages = []
-            result_chunks = []
-            
             code = f"""import json
 browser.navigate('https://www.google.com/search?q={request.query.replace(' ', '+')}')
 results = browser.get_search_results({request.max_results})
 print(json.dumps(results))"""
             
-            for chunk in interpreter.chat(f"```python\n{code}\n```", stream=True, display=False):
-                if isinstance(chunk, dict) and chunk.get("type") == "console" and "content" in chunk:
-                    result_chunks.append(chunk["content"])
-            
-            interpreter.messages = saved_messages
-            output = "".join(result_chunks)
+            result = await run_in_threadpool(run_code, runtime, "python", code, computer_api=True)
+            output = result["output"]
             
             try:
                 results = json.loads(output)
@@ -1475,21 +1289,13 @@ print(json.dumps(results))"""
             return {"status": "error", "results": []}
     
     @app.post("/browser/screenshot")
-    async def browser_screenshot(_: bool = Depends(verify_auth)):
+    async def browser_screenshot(_: bool = Depends(verify_auth), runtime=Depends(tool_runtime)):
         """Take browser screenshot"""
         try:
-            saved_messages = interpreter.messages.copy()
-            interpreter.messages = []
-            result_chunks = []
-            
             code = "screenshot = browser.screenshot()\nprint(screenshot)"
             
-            for chunk in interpreter.chat(f"```python\n{code}\n```", stream=True, display=False):
-                if isinstance(chunk, dict) and chunk.get("type") == "console" and "content" in chunk:
-                    result_chunks.append(chunk["content"])
-            
-            interpreter.messages = saved_messages
-            screenshot_data = "".join(result_chunks)
+            result = await run_in_threadpool(run_code, runtime, "python", code, computer_api=True)
+            screenshot_data = result["output"]
             return {"status": "success", "screenshot": screenshot_data}
         except Exception as e:
             return {"status": "error", "screenshot": ""}
@@ -1499,16 +1305,7 @@ print(json.dumps(results))"""
     async def clipboard_read(_: bool = Depends(verify_auth)):
         """Read clipboard content"""
         try:
-            saved_messages = interpreter.messages.copy()
-            interpreter.messages = []
-            result_chunks = []
-            
-            for chunk in interpreter.chat("```python\nprint(computer.clipboard.view())\n```", stream=True, display=False):
-                if isinstance(chunk, dict) and chunk.get("type") == "console" and "content" in chunk:
-                    result_chunks.append(chunk["content"])
-            
-            interpreter.messages = saved_messages
-            content = "".join(result_chunks)
+            content = await run_in_threadpool(interpreter.computer.clipboard.view)
             return {"status": "success", "content": content}
         except Exception as e:
             return {"status": "error", "content": ""}
@@ -1517,15 +1314,7 @@ print(json.dumps(results))"""
     async def clipboard_write(request: ClipboardWriteRequest, _: bool = Depends(verify_auth)):
         """Write to clipboard"""
         try:
-            saved_messages = interpreter.messages.copy()
-            interpreter.messages = []
-            result_chunks = []
-            
-            for chunk in interpreter.chat(f"```python\ncomputer.clipboard.copy({repr(request.text)})\n```", stream=True, display=False):
-                if isinstance(chunk, dict) and chunk.get("type") == "console" and "content" in chunk:
-                    result_chunks.append(chunk["content"])
-            
-            interpreter.messages = saved_messages
+            await run_in_threadpool(interpreter.computer.clipboard.copy, request.text)
             return {"status": "success", "message": "Text copied to clipboard"}
         except Exception as e:
             return {"status": "error", "message": str(e)}
@@ -1534,106 +1323,59 @@ print(json.dumps(results))"""
     async def clipboard_paste(_: bool = Depends(verify_auth)):
         """Paste clipboard content"""
         try:
-            saved_messages = interpreter.messages.copy()
-            interpreter.messages = []
-            result_chunks = []
-            
-            for chunk in interpreter.chat("```python\ncomputer.clipboard.paste()\n```", stream=True, display=False):
-                if isinstance(chunk, dict) and chunk.get("type") == "console" and "content" in chunk:
-                    result_chunks.append(chunk["content"])
-            
-            interpreter.messages = saved_messages
+            await run_in_threadpool(interpreter.computer.clipboard.paste)
             return {"status": "success", "message": "Clipboard content pasted"}
         except Exception as e:
             return {"status": "error", "message": str(e)}
     
     # JavaScript Execution Tool Endpoint
     @app.post("/javascript/execute")
-    async def javascript_execute(request: ExecuteCodeRequest, _: bool = Depends(verify_auth)):
+    async def javascript_execute(request: ExecuteCodeRequest, _: bool = Depends(verify_auth), runtime=Depends(tool_runtime)):
         """Execute JavaScript code"""
         try:
-            saved_messages = interpreter.messages.copy()
-            interpreter.messages = []
-            result_chunks = []
-            
-            for chunk in interpreter.chat(f"```javascript\n{request.code}\n```", stream=True, display=False):
-                if isinstance(chunk, dict) and chunk.get("type") == "console" and "content" in chunk:
-                    result_chunks.append(chunk["content"])
-            
-            interpreter.messages = saved_messages
-            output = "".join(result_chunks)
-            return {"status": "success", "output": output, "error": None}
+            result = await run_in_threadpool(run_code, runtime, "javascript", request.code)
+            return {"status": "error" if result["error"] else "success", **result}
         except Exception as e:
-            return {"status": "error", "output": "", "error": str(e)}
+            return {"status": "error", "output": "", "images": [], "error": str(e)}
     
     # R Programming Tool Endpoint
     @app.post("/r/execute")
-    async def r_execute(request: ExecuteCodeRequest, _: bool = Depends(verify_auth)):
+    async def r_execute(request: ExecuteCodeRequest, _: bool = Depends(verify_auth), runtime=Depends(tool_runtime)):
         """Execute R code"""
         try:
-            saved_messages = interpreter.messages.copy()
-            interpreter.messages = []
-            result_chunks = []
-            
-            for chunk in interpreter.chat(f"```r\n{request.code}\n```", stream=True, display=False):
-                if isinstance(chunk, dict) and chunk.get("type") == "console" and "content" in chunk:
-                    result_chunks.append(chunk["content"])
-            
-            interpreter.messages = saved_messages
-            output = "".join(result_chunks)
-            return {"status": "success", "output": output, "error": None}
+            result = await run_in_threadpool(run_code, runtime, "r", request.code)
+            return {"status": "error" if result["error"] else "success", **result}
         except Exception as e:
-            return {"status": "error", "output": "", "error": str(e)}
+            return {"status": "error", "output": "", "images": [], "error": str(e)}
     
     # AppleScript Tool Endpoint
     @app.post("/applescript/execute")
-    async def applescript_execute(request: ExecuteCodeRequest, _: bool = Depends(verify_auth)):
+    async def applescript_execute(request: ExecuteCodeRequest, _: bool = Depends(verify_auth), runtime=Depends(tool_runtime)):
         """Execute AppleScript code"""
         try:
-            saved_messages = interpreter.messages.copy()
-            interpreter.messages = []
-            result_chunks = []
-            
-            for chunk in interpreter.chat(f"```applescript\n{request.code}\n```", stream=True, display=False):
-                if isinstance(chunk, dict) and chunk.get("type") == "console" and "content" in chunk:
-                    result_chunks.append(chunk["content"])
-            
-            interpreter.messages = saved_messages
-            output = "".join(result_chunks)
-            return {"status": "success", "output": output, "error": None}
+            result = await run_in_threadpool(run_code, runtime, "applescript", request.code)
+            return {"status": "error" if result["error"] else "success", **result}
         except Exception as e:
-            return {"output": "", "error": str(e)}
+            return {"status": "error", "output": "", "images": [], "error": str(e)}
     
     # SMS/Messages Tool Endpoints
     @app.post("/sms/send")
-    async def sms_send(request: SMSSendRequest, _: bool = Depends(verify_auth)):
+    async def sms_send(request: SMSSendRequest, _: bool = Depends(verify_auth), runtime=Depends(tool_runtime)):
         """Send SMS/iMessage"""
         try:
-            saved_messages = interpreter.messages.copy()
-            interpreter.messages = []
-            result_chunks = []
-            
             code = f"""result = computer.sms.send('{request.to}', '''{request.message}''')
 print(result)"""
             
-            for chunk in interpreter.chat(f"```python\n{code}\n```", stream=True, display=False):
-                if isinstance(chunk, dict) and chunk.get("type") == "console" and "content" in chunk:
-                    result_chunks.append(chunk["content"])
-            
-            interpreter.messages = saved_messages
-            output = "".join(result_chunks)
+            result = await run_in_threadpool(run_code, runtime, "python", code, computer_api=True)
+            output = result["output"]
             return {"status": "success", "message": output}
         except Exception as e:
             return {"status": "error", "message": str(e)}
     
     @app.post("/sms/get")
-    async def sms_get(request: SMSGetRequest, _: bool = Depends(verify_auth)):
+    async def sms_get(request: SMSGetRequest, _: bool = Depends(verify_auth), runtime=Depends(tool_runtime)):
         """Get SMS/iMessage history"""
         try:
-            saved_messages = interpreter.messages.copy()
-            interpreter.messages = []
-            result_chunks = []
-            
             contact_param = f"'{request.contact}'" if request.contact else "None"
             substring_param = f"'{request.substring}'" if request.substring else "None"
             
@@ -1641,12 +1383,8 @@ print(result)"""
 messages = computer.sms.get(contact={contact_param}, limit={request.limit}, substring={substring_param})
 print(json.dumps(messages, default=str))"""
             
-            for chunk in interpreter.chat(f"```python\n{code}\n```", stream=True, display=False):
-                if isinstance(chunk, dict) and chunk.get("type") == "console" and "content" in chunk:
-                    result_chunks.append(chunk["content"])
-            
-            interpreter.messages = saved_messages
-            output = "".join(result_chunks)
+            result = await run_in_threadpool(run_code, runtime, "python", code, computer_api=True)
+            output = result["output"]
             
             try:
                 messages = json.loads(output)
@@ -1659,13 +1397,9 @@ print(json.dumps(messages, default=str))"""
     
     # Vision & OCR Tool Endpoints
     @app.post("/vision/analyze")
-    async def vision_analyze(request: VisionAnalyzeRequest, _: bool = Depends(verify_auth)):
+    async def vision_analyze(request: VisionAnalyzeRequest, _: bool = Depends(verify_auth), runtime=Depends(tool_runtime)):
         """Analyze image with AI"""
         try:
-            saved_messages = interpreter.messages.copy()
-            interpreter.messages = []
-            result_chunks = []
-            
             if request.image_path:
                 code = f"""result = computer.vision.analyze('{request.image_path}', '{request.prompt}')
 print(result)"""
@@ -1676,24 +1410,16 @@ print(result)"""
             else:
                 return {"status": "error", "analysis": "No image provided"}
             
-            for chunk in interpreter.chat(f"```python\n{code}\n```", stream=True, display=False):
-                if isinstance(chunk, dict) and chunk.get("type") == "console" and "content" in chunk:
-                    result_chunks.append(chunk["content"])
-            
-            interpreter.messages = saved_messages
-            analysis = "".join(result_chunks)
+            result = await run_in_threadpool(run_code, runtime, "python", code, computer_api=True)
+            analysis = result["output"]
             return {"status": "success", "analysis": analysis}
         except Exception as e:
             return {"status": "error", "analysis": str(e)}
     
     @app.post("/vision/ocr")
-    async def vision_ocr(request: VisionOCRRequest, _: bool = Depends(verify_auth)):
+    async def vision_ocr(request: VisionOCRRequest, _: bool = Depends(verify_auth), runtime=Depends(tool_runtime)):
         """Extract text from image"""
         try:
-            saved_messages = interpreter.messages.copy()
-            interpreter.messages = []
-            result_chunks = []
-            
             if request.image_path:
                 code = f"""result = computer.vision.ocr('{request.image_path}')
 print(result)"""
@@ -1704,36 +1430,24 @@ print(result)"""
             else:
                 return {"status": "error", "text": "No image provided"}
             
-            for chunk in interpreter.chat(f"```python\n{code}\n```", stream=True, display=False):
-                if isinstance(chunk, dict) and chunk.get("type") == "console" and "content" in chunk:
-                    result_chunks.append(chunk["content"])
-            
-            interpreter.messages = saved_messages
-            text = "".join(result_chunks)
+            result = await run_in_threadpool(run_code, runtime, "python", code, computer_api=True)
+            text = result["output"]
             return {"status": "success", "text": text}
         except Exception as e:
             return {"status": "error", "text": str(e)}
     
     @app.post("/vision/screenshot_analyze")
-    async def vision_screenshot_analyze(request: VisionScreenshotAnalyzeRequest, _: bool = Depends(verify_auth)):
+    async def vision_screenshot_analyze(request: VisionScreenshotAnalyzeRequest, _: bool = Depends(verify_auth), runtime=Depends(tool_runtime)):
         """Take screenshot and analyze"""
         try:
-            saved_messages = interpreter.messages.copy()
-            interpreter.messages = []
-            result_chunks = []
-            
             code = f"""import base64
 screenshot = computer.display.screenshot()
 analysis = computer.vision.analyze_screenshot('{request.prompt}')
 print(f"screenshot:{screenshot}")
 print(f"analysis:{analysis}")"""
             
-            for chunk in interpreter.chat(f"```python\n{code}\n```", stream=True, display=False):
-                if isinstance(chunk, dict) and chunk.get("type") == "console" and "content" in chunk:
-                    result_chunks.append(chunk["content"])
-            
-            interpreter.messages = saved_messages
-            output = "".join(result_chunks)
+            result = await run_in_threadpool(run_code, runtime, "python", code, computer_api=True)
+            output = result["output"]
             
             # Parse screenshot and analysis from output
             screenshot = ""
@@ -1765,57 +1479,45 @@ print(f"analysis:{analysis}")"""
         top_k: int = 5
 
     @app.post("/memory/structured/save")
-    async def save_structured_memory(request: StructuredMemorySaveRequest, _: bool = Depends(verify_auth)):
+    async def save_structured_memory(request: StructuredMemorySaveRequest, _: bool = Depends(verify_auth), runtime=Depends(tool_runtime)):
         """Save structured memory."""
         try:
             code = f"interpreter.memory.save_structured_memory(key={repr(request.key)}, value={repr(request.value)})"
-            result_chunks = []
-            for chunk in interpreter.chat(f"```python\n{code}\n```", stream=True, display=False):
-                if isinstance(chunk, dict) and chunk.get("type") == "console" and "content" in chunk:
-                    result_chunks.append(chunk["content"])
-            output = "".join(result_chunks)
+            result = await run_in_threadpool(run_code, runtime, "python", code, computer_api=True)
+            output = result["output"]
             return {"output": output, "error": None}
         except Exception as e:
             return {"output": "", "error": str(e)}
 
     @app.post("/memory/structured/get")
-    async def get_structured_memory(request: StructuredMemoryGetRequest, _: bool = Depends(verify_auth)):
+    async def get_structured_memory(request: StructuredMemoryGetRequest, _: bool = Depends(verify_auth), runtime=Depends(tool_runtime)):
         """Get structured memory."""
         try:
             code = f"print(interpreter.memory.get_structured_memory(key={repr(request.key)}))"
-            result_chunks = []
-            for chunk in interpreter.chat(f"```python\n{code}\n```", stream=True, display=False):
-                if isinstance(chunk, dict) and chunk.get("type") == "console" and "content" in chunk:
-                    result_chunks.append(chunk["content"])
-            output = "".join(result_chunks)
+            result = await run_in_threadpool(run_code, runtime, "python", code, computer_api=True)
+            output = result["output"]
             return {"output": output, "error": None}
         except Exception as e:
             return {"output": "", "error": str(e)}
 
     @app.post("/memory/semantic/add")
-    async def add_semantic_memory(request: SemanticMemoryAddRequest, _: bool = Depends(verify_auth)):
+    async def add_semantic_memory(request: SemanticMemoryAddRequest, _: bool = Depends(verify_auth), runtime=Depends(tool_runtime)):
         """Add semantic memory."""
         try:
             code = f"interpreter.memory.add_semantic_memory(text_chunk={repr(request.text_chunk)}, embedding={request.embedding})"
-            result_chunks = []
-            for chunk in interpreter.chat(f"```python\n{code}\n```", stream=True, display=False):
-                if isinstance(chunk, dict) and chunk.get("type") == "console" and "content" in chunk:
-                    result_chunks.append(chunk["content"])
-            output = "".join(result_chunks)
+            result = await run_in_threadpool(run_code, runtime, "python", code, computer_api=True)
+            output = result["output"]
             return {"output": output, "error": None}
         except Exception as e:
             return {"output": "", "error": str(e)}
 
     @app.post("/memory/semantic/search")
-    async def search_semantic_memory(request: SemanticMemorySearchRequest, _: bool = Depends(verify_auth)):
+    async def search_semantic_memory(request: SemanticMemorySearchRequest, _: bool = Depends(verify_auth), runtime=Depends(tool_runtime)):
         """Search semantic memory."""
         try:
             code = f"print(interpreter.memory.search_semantic_memory(query_embedding={request.query_embedding}, top_k={request.top_k}))"
-            result_chunks = []
-            for chunk in interpreter.chat(f"```python\n{code}\n```", stream=True, display=False):
-                if isinstance(chunk, dict) and chunk.get("type") == "console" and "content" in chunk:
-                    result_chunks.append(chunk["content"])
-            output = "".join(result_chunks)
+            result = await run_in_threadpool(run_code, runtime, "python", code, computer_api=True)
+            output = result["output"]
             return {"output": output, "error": None}
         except Exception as e:
             return {"output": "", "error": str(e)}
@@ -1830,30 +1532,24 @@ print(f"analysis:{analysis}")"""
         top_k: int = 5
 
     @app.post("/file_indexing/index_directory")
-    async def index_directory(request: FileIndexDirectoryRequest, _: bool = Depends(verify_auth)):
+    async def index_directory(request: FileIndexDirectoryRequest, _: bool = Depends(verify_auth), runtime=Depends(tool_runtime)):
         """Index a directory for file content search."""
         try:
             extensions_str = f", extensions={request.extensions}" if request.extensions else ""
             code = f"interpreter.file_indexer.index_directory(directory_path={repr(request.directory_path)}{extensions_str})"
-            result_chunks = []
-            for chunk in interpreter.chat(f"```python\n{code}\n```", stream=True, display=False):
-                if isinstance(chunk, dict) and chunk.get("type") == "console" and "content" in chunk:
-                    result_chunks.append(chunk["content"])
-            output = "".join(result_chunks)
+            result = await run_in_threadpool(run_code, runtime, "python", code, computer_api=True)
+            output = result["output"]
             return {"output": output, "error": None}
         except Exception as e:
             return {"output": "", "error": str(e)}
 
     @app.post("/file_indexing/search_indexed_files")
-    async def search_indexed_files(request: FileIndexSearchRequest, _: bool = Depends(verify_auth)):
+    async def search_indexed_files(request: FileIndexSearchRequest, _: bool = Depends(verify_auth), runtime=Depends(tool_runtime)):
         """Search indexed files semantically."""
         try:
             code = f"print(interpreter.file_indexer.search_indexed_files(query={repr(request.query)}, top_k={request.top_k}))"
-            result_chunks = []
-            for chunk in interpreter.chat(f"```python\n{code}\n```", stream=True, display=False):
-                if isinstance(chunk, dict) and chunk.get("type") == "console" and "content" in chunk:
-                    result_chunks.append(chunk["content"])
-            output = "".join(result_chunks)
+            result = await run_in_threadpool(run_code, runtime, "python", code, computer_api=True)
+            output = result["output"]
             return {"output": output, "error": None}
         except Exception as e:
             return {"output": "", "error": str(e)}
@@ -1,4 +1,5 @@
-from concurrent.futures import ThreadPoolExecutor
+import copy
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 import tiktoken
 
@@ -77,46 +78,107 @@ def chunk_responses(responses, tokens, llm):
     return chunked_responses
 
 
-def fast_llm(llm, system_message, user_message):
-    old_messages = llm.interpreter.messages
-    old_system_message = llm.interpreter.system_message
-    try:
-        llm.interpreter.system_message = system_message
-        llm.interpreter.messages = []
-        response = llm.interpreter.chat(user_message)
-    finally:
-        llm.interpreter.messages = old_messages
-        llm.interpreter.system_message = old_system_message
-        return response[-1].get("content")
+def isolated_llm(llm):
+    """
+    A copy of `llm` for one request, so parallel requests don't overwrite each other's settings.
+    """
+    if not llm._is_loaded:
+        llm.load()  # Once, instead of in every copy
+    llm_copy = copy.copy(llm)
+    # Shares the cached token counts, but keeps its own context size
+    llm_copy.token_ledger = copy.copy(llm.token_ledger)
+    return llm_copy
 
 
-def query_map_chunks(chunks, llm, query):
+def fast_llm(llm, system_message, user_message):
+    """
+    One request with its own messages. It never touches the interpreter's conversation.
+    """
+    messages = [
+        {"role": "system", "type": "message", "content": system_message},
+        {"role": "user", "type": "message", "content": user_message},
+    ]
+    response = ""
+    for chunk in isolated_llm(llm).run(messages):
+        if chunk.get("type") == "message":
+            response += chunk.get("content", "")
+    return response
+
+
+def parallel_map(function, items, max_concurrency=8, progress=None, stage="map"):
+    """
+    Runs `function` on each item, at most `max_concurrency` at a time. Returns results in order.
+    Calls `progress(stage, completed, total)` as each one finishes.
+    """
+    if not items:
+        return []
+    with ThreadPoolExecutor(max_workers=max(1, max_concurrency)) as executor:
+        futures = [executor.submit(function, item) for item in items]
+        for completed, _ in enumerate(as_completed(futures), start=1):
+            if progress:
+                progress(stage, completed, len(futures))
+        return [future.result() for future in futures]
+
+
+def query_map_chunks(chunks, llm, query, max_concurrency=8, progress=None):
     """Query the chunks of text using query_chunk_map."""
-    with ThreadPoolExecutor() as executor:
-        responses = list(
-            executor.map(lambda chunk: fast_llm(llm, query, chunk), chunks)
+    return parallel_map(
+        lambda chunk: fast_llm(llm, query, chunk),
+        chunks,
+        max_concurrency=max_concurrency,
+        progress=progress,
+    )
+
+
+def query_reduce_chunks(
+    responses, llm, chunk_size, query, max_concurrency=8, max_levels=4, progress=None
+):
+    """
+    Reduces query responses as a tree: each level packs responses into groups of up to
+    `chunk_size` tokens and reduces every group in parallel, until one response is left.
+    """
+    if not responses:
+        return ""
+
+    level = 0
+    while len(responses) > 1 and level < max_levels:
+        level += 1
+        groups = chunk_responses(responses, chunk_size, llm)
+        if len(groups) >= len(responses):
+            # Every response is too big to pack with another, so merge them in pairs
+            groups = [
+                "\n\n".join(responses[i : i + 2])
+                for i in range(0, len(responses), 2)
+            ]
+
+        responses = parallel_map(
+            lambda group: fast_llm(llm, query, group),
+            groups,
+            max_concurrency=max_concurrency,
+            progress=progress,
+            stage=f"reduce {level}",
         )
-    return responses
 
+    if len(responses) > 1:
+        # Out of levels. One last request over everything that's left
+        responses = [fast_llm(llm, query, "\n\n".join(responses))]
+        if progress:
+            progress("reduce final", 1, 1)
 
-def query_reduce_chunks(responses, llm, chunk_size, query):
-    """Reduce query responses in a while loop."""
-    while len(responses) > 1:
-        chunks = chunk_responses(responses, chunk_size, llm)
-
-        # Use multithreading to summarize each chunk simultaneously
-        with ThreadPoolExecutor() as executor:
-            summaries = list(
-                executor.map(lambda chunk: fast_llm(llm, query, chunk), chunks)
-            )
-
-    return summaries[0]
+    return responses[0]
 
 
 class Ai:
     def __init__(self, computer):
         self.computer = computer
 
+        # Map-reduce settings for query() and summarize()
+        self.chunk_size = 2000  # Tokens per chunk
+        self.chunk_overlap = 50
+        self.max_concurrency = 8  # Requests in flight at once
+        self.max_reduce_levels = 4
+        self.progress_callback = None  # Called with (stage, completed, total)
+
     def chat(self, text, base64=None):
         messages = [
             {
@@ -164,29 +226,40 @@ class Ai:
 
             return response[-1].get("content")
 
-    def query(self, text, query, custom_reduce_query=None):
+    def query(self, text, query, custom_reduce_query=None, progress=None):
         if custom_reduce_query == None:
             custom_reduce_query = query
+        if progress is None:
+            progress = self.progress_callback
 
-        chunk_size = 2000
-        overlap = 50
+        llm = self.computer.interpreter.llm
 
         # Split the text into chunks
-        chunks = split_into_chunks(
-            text, chunk_size, self.computer.interpreter.llm, overlap
-        )
+        chunks = split_into_chunks(text, self.chunk_size, llm, self.chunk_overlap)
 
         # (Map) Query each chunk
-        responses = query_map_chunks(chunks, self.computer.interpreter.llm, query)
+        responses = query_map_chunks(
+            chunks,
+            llm,
+            query,
+            max_concurrency=self.max_concurrency,
+            progress=progress,
+        )
 
         # (Reduce) Compress the responses
         response = query_reduce_chunks(
-            responses, self.computer.interpreter.llm, chunk_size, custom_reduce_query
+            responses,
+            llm,
+            self.chunk_size,
+            custom_reduce_query,
+            max_concurrency=self.max_concurrency,
+            max_levels=self.max_reduce_levels,
+            progress=progress,
         )
 
         return response
 
-    def summarize(self, text):
+    def summarize(self, text, progress=None):
         query = "You are a highly skilled AI trained in language comprehension and summarization. I would like you to read the following text and summarize it into a concise abstract paragraph. Aim to retain the most important points, providing a coherent and readable summary that could help a person understand the main points of the discussion without needing to read the entire text. Please avoid unnecessary details or tangential points."
         custom_reduce_query = "You are tasked with taking multiple summarized texts and merging them into one unified and concise summary. Maintain the core essence of the content and provide a clear and comprehensive summary that encapsulates all the main points from the individual summaries."
-        return self.query(text, query, custom_reduce_query)
+        return self.query(text, query, custom_reduce_query, progress=progress)
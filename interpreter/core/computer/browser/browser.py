@@ -2,13 +2,14 @@ import threading
 import time
 
 import html2text
-import requests
 from selenium import webdriver
 from selenium.webdriver.chrome.service import Service
 from selenium.webdriver.common.by import By
 from selenium.webdriver.common.keys import Keys
 from webdriver_manager.chrome import ChromeDriverManager
 
+from ...utils.http_pool import http_pool
+
 
 class Browser:
     def __init__(self, computer):
@@ -29,7 +30,7 @@ class Browser:
         """
         Searches the web for the specified query and returns the results.
         """
-        response = requests.get(
+        response = http_pool.get(
             f'{self.computer.api_base.strip("/")}/browser/search',
             params={"query": query},
         )
@@ -45,7 +46,7 @@ class Browser:
             target=lambda: setattr(
                 threading.current_thread(),
                 "response",
-                requests.get(
+                http_pool.get(
                     f'{self.computer.api_base.strip("/")}/browser/search',
                     params={"query": query},
                 ),
@@ -0,0 +1,203 @@
+import atexit
+import json
+import os
+import shutil
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+
+from ..base_language import BaseLanguage
+
+TEMPLATE_SCRIPT = os.path.join(os.path.dirname(__file__), "fork_server_process.py")
+
+
+def fork_server_supported():
+    return hasattr(os, "fork") and hasattr(socket, "AF_UNIX")
+
+
+class ForkServer:
+    """
+    A template Python process that imports heavy libraries once, then fork()s a copy-on-write child
+    for every session. A fresh session (with numpy, pandas... already imported) takes milliseconds,
+    and costs almost no extra memory until it starts writing to it. POSIX only.
+
+    Configured with INTERPRETER_FORK_SERVER_PRELOAD (comma-separated modules).
+    """
+
+    def __init__(self, preload_modules=None):
+        if preload_modules is None:
+            preload_modules = os.environ.get(
+                "INTERPRETER_FORK_SERVER_PRELOAD", "numpy,pandas,matplotlib.pyplot"
+            ).split(",")
+        self.preload_modules = [
+            module.strip() for module in preload_modules if module.strip()
+        ]
+        self.startup_timeout = 120
+
+        self._process = None
+        self._directory = None
+        self._socket_path = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        """
+        Starts the template process, if it isn't running. Blocks until it has imported everything.
+        """
+        with self._lock:
+            if self._process is not None and self._process.poll() is None:
+                return
+            if not fork_server_supported():
+                raise OSError("The fork server needs os.fork() and Unix sockets.")
+
+            self._directory = tempfile.mkdtemp(prefix="oi-fork-server-")
+            self._socket_path = os.path.join(self._directory, "server.sock")
+            self._process = subprocess.Popen(
+                [
+                    sys.executable,
+                    TEMPLATE_SCRIPT,
+                    self._socket_path,
+                    ",".join(self.preload_modules),
+                ],
+                stdin=subprocess.DEVNULL,
+                stdout=subprocess.PIPE,
+                text=True,
+                start_new_session=True,  # So a Ctrl-C in our terminal doesn't reach it
+            )
+
+            # It prints "ready" once it's listening
+            timer = threading.Timer(self.startup_timeout, self._process.kill)
+            timer.start()
+            try:
+                ready = any(line.strip() == "ready" for line in self._process.stdout)
+            finally:
+                timer.cancel()
+            if not ready:
+                self._process.kill()
+                raise RuntimeError("The fork server failed to start.")
+
+    def session(self):
+        """
+        Forks a fresh Python session. Returns a ForkSession.
+        """
+        self.start()
+        connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        connection.connect(self._socket_path)
+        return ForkSession(connection)
+
+    def close(self):
+        with self._lock:
+            process, self._process = self._process, None
+            directory, self._directory = self._directory, None
+        if process is not None and process.poll() is None:
+            process.terminate()
+            try:
+                process.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                process.kill()
+        if directory is not None:
+            shutil.rmtree(directory, ignore_errors=True)
+
+
+class ForkSession:
+    """
+    One forked child. Sends it code, and reads back the LMC chunks it streams.
+    """
+
+    def __init__(self, connection):
+        self.connection = connection
+        self._reader = connection.makefile("r", encoding="utf-8")
+        self._writer = connection.makefile("w", encoding="utf-8")
+        self._running = False
+        self.exited = False
+        self.pid = self._read()["pid"]
+
+    def _read(self):
+        line = self._reader.readline()
+        if not line:
+            self.exited = True
+            raise EOFError("The Python session exited.")
+        return json.loads(line)
+
+    def run(self, code):
+        # A run that was abandoned part way still sends the rest of its output. Skip it
+        while self._running:
+            if self._read().get("done"):
+                self._running = False
+
+        self._writer.write(json.dumps({"cwd": os.getcwd(), "code": code}) + "\n")
+        self._writer.flush()
+        self._running = True
+        while True:
+            message = self._read()
+            if message.get("done"):
+                self._running = False
+                return
+            yield message
+
+    def interrupt(self):
+        try:
+            os.kill(self.pid, signal.SIGINT)
+        except OSError:
+            pass
+
+    @property
+    def alive(self):
+        if self.exited:
+            return False
+        try:
+            os.kill(self.pid, 0)
+            return True
+        except OSError:
+            return False
+
+    def close(self):
+        try:
+            self.connection.close()  # The child exits when its connection closes
+        except OSError:
+            pass
+
+
+# One template per process, started the first time a session is needed
+fork_server = ForkServer()
+atexit.register(fork_server.close)
+
+
+class ForkPython(BaseLanguage):
+    """
+    Python, run in a session forked from the fork server instead of a Jupyter kernel.
+    Yields the same chunks as JupyterLanguage. Use it with INTERPRETER_PYTHON_BACKEND=fork.
+    """
+
+    file_extension = "py"
+    name = "Python"
+    aliases = ["py"]
+
+    def __init__(self, computer=None):
+        self.computer = computer
+        self.session = fork_server.session()
+
+    def run(self, code):
+        if not self.session.alive:
+            # The code called exit() or crashed the session. Start a fresh one, like a restarted kernel
+            self.session.close()
+            self.session = fork_server.session()
+        try:
+            yield from self.session.run(code)
+        except EOFError:
+            yield {
+                "type": "console",
+                "format": "output",
+                "content": "The Python session exited.",
+            }
+        except GeneratorExit:
+            self.stop()
+            raise
+
+    def stop(self):
+        self.session.interrupt()
+
+    def terminate(self):
+        self.session.close()
@@ -0,0 +1,215 @@
+"""
+The template process of the fork server (see fork_server.py). Run as a script, not imported:
+
+    python fork_server_process.py <socket path> <comma-separated modules to preload>
+
+It imports the modules once, then fork()s a copy-on-write child for every connection.
+Each child is a fresh Python session that runs code sent to it as JSON lines, and streams back
+LMC chunks (the same ones JupyterLanguage.run() yields), followed by {"done": true}.
+
+This file must not import anything from `interpreter`, so the template stays small.
+"""
+
+import os
+import sys
+
+# Running this file puts its directory first on sys.path, where our language modules
+# (html.py, shell.py...) would shadow the standard library for code run in the sessions
+_directory = os.path.dirname(os.path.abspath(__file__))
+if sys.path and os.path.abspath(sys.path[0]) == _directory:
+    del sys.path[0]
+
+import ast
+import base64
+import io
+import json
+import signal
+import socket
+import time
+import traceback
+
+ACTIVE_LINE_INTERVAL = 0.05  # Report the active line at most 20 times per second
+CELL_FILENAME = "<cell>"
+
+
+class ChunkWriter:
+    """
+    Stands in for stdout and stderr, sending everything written to it as output chunks.
+    """
+
+    def __init__(self, send):
+        self.send = send
+
+    def write(self, text):
+        if text:
+            self.send({"type": "console", "format": "output", "content": text})
+        return len(text)
+
+    def flush(self):
+        pass
+
+    def isatty(self):
+        return False
+
+
+class Session:
+    def __init__(self, connection):
+        self.connection = connection
+        self.reader = connection.makefile("r", encoding="utf-8")
+        self.writer = connection.makefile("w", encoding="utf-8")
+        self.namespace = {"__name__": "__main__", "__builtins__": __builtins__}
+        self.last_active_line_time = 0.0
+        self.last_active_line = None
+
+    def send(self, message):
+        self.writer.write(json.dumps(message) + "\n")
+        self.writer.flush()
+
+    def serve(self):
+        self.send({"pid": os.getpid()})
+        sys.stdout = sys.stderr = ChunkWriter(self.send)
+
+        for line in self.reader:
+            request = json.loads(line)
+            if "cwd" in request:
+                try:
+                    os.chdir(request["cwd"])
+                except OSError:
+                    pass
+            if "code" in request:
+                self.run(request["code"])
+                self.send({"done": True})
+
+    def trace(self, frame, event, arg):
+        if frame.f_code.co_filename != CELL_FILENAME:
+            return None  # Only line-trace the cell itself, library code runs untouched
+        if event == "line":
+            now = time.monotonic()
+            if (
+                now - self.last_active_line_time >= ACTIVE_LINE_INTERVAL
+                and frame.f_lineno != self.last_active_line
+            ):
+                self.last_active_line_time = now
+                self.last_active_line = frame.f_lineno
+                self.send(
+                    {
+                        "type": "console",
+                        "format": "active_line",
+                        "content": frame.f_lineno,
+                    }
+                )
+        return self.trace
+
+    def run(self, code):
+        self.last_active_line_time = 0.0
+        self.last_active_line = None
+        try:
+            tree = ast.parse(code, CELL_FILENAME)
+
+            # Like Jupyter, show the value of a trailing expression
+            last_expression = None
+            if tree.body and isinstance(tree.body[-1], ast.Expr):
+                last_expression = ast.Expression(tree.body.pop().value)
+
+            sys.settrace(self.trace)
+            try:
+                exec(compile(tree, CELL_FILENAME, "exec"), self.namespace)
+                if last_expression is not None:
+                    code = compile(last_expression, CELL_FILENAME, "eval")
+                    value = eval(code, self.namespace)
+                    if value is not None:
+                        self.send(
+                            {
+                                "type": "console",
+                                "format": "output",
+                                "content": repr(value),
+                            }
+                        )
+            finally:
+                sys.settrace(None)
+        except BaseException as e:
+            if isinstance(e, SystemExit):
+                raise
+            self.send(
+                {"type": "console", "format": "output", "content": format_error(e)}
+            )
+
+        self.send_figures()
+
+    def send_figures(self):
+        pyplot = sys.modules.get("matplotlib.pyplot")
+        if pyplot is None:
+            return
+        for number in pyplot.get_fignums():
+            buffer = io.BytesIO()
+            pyplot.figure(number).savefig(buffer, format="png")
+            self.send(
+                {
+                    "type": "image",
+                    "format": "base64.png",
+                    "content": base64.b64encode(buffer.getvalue()).decode("ascii"),
+                }
+            )
+        pyplot.close("all")
+
+
+def format_error(error):
+    """
+    A traceback that starts at the user's code, leaving out the frames of this file.
+    """
+    tb = error.__traceback__
+    while tb is not None and tb.tb_frame.f_code.co_filename != CELL_FILENAME:
+        tb = tb.tb_next
+    if tb is None:
+        return "".join(traceback.format_exception_only(type(error), error))
+    return "".join(traceback.format_exception(type(error), error, tb))
+
+
+def preload(modules):
+    if any(module.split(".")[0] == "matplotlib" for module in modules):
+        try:
+            import matplotlib
+
+            matplotlib.use("Agg")  # No windows. Figures are sent back as images
+        except ImportError:
+            pass
+
+    for module in modules:
+        try:
+            __import__(module)
+        except Exception:
+            pass
+
+
+def main():
+    socket_path = sys.argv[1]
+    modules = [module for module in sys.argv[2].split(",") if module]
+    preload(modules)
+
+    listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    listener.bind(socket_path)
+    listener.listen(64)
+
+    signal.signal(signal.SIGCHLD, signal.SIG_IGN)  # Children are reaped automatically
+
+    sys.stdout.write("ready\n")
+    sys.stdout.flush()
+    # Nobody reads our stdout after this, so make sure writing to it can never block
+    devnull = os.open(os.devnull, os.O_WRONLY)
+    os.dup2(devnull, 1)
+
+    while True:
+        connection, _ = listener.accept()
+        if os.fork() == 0:
+            listener.close()
+            signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+            signal.signal(signal.SIGINT, signal.default_int_handler)
+            try:
+                Session(connection).serve()
+            finally:
+                os._exit(0)
+        connection.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -13,14 +13,59 @@ import threading
 import time
 import traceback
 
-os.environ["LITELLM_LOCAL_MODEL_COST_MAP"] = "True"
-import litellm
-from jupyter_client import KernelManager
-
 from ..base_language import BaseLanguage
+from .kernel_pool import kernel_pool
 
 DEBUG_MODE = False
 
+# Installed in the kernel for active_line_mode = "sample". Instead of a print before every statement,
+# a trace hook reports the line the cell is on, at most once per `interval` seconds.
+# Only frames from the running cell are line-traced, so library code runs untouched.
+ACTIVE_LINE_SAMPLER_CODE = """
+import sys as _oi_sys
+import time as _oi_time
+
+def _oi_install_active_line_sampler(interval):
+    ip = get_ipython()
+    user_ns = ip.user_ns
+    state = {"enabled": True, "filename": None, "last_time": 0.0, "last_line": None}
+
+    def local_trace(frame, event, arg):
+        if event == "line":
+            now = _oi_time.monotonic()
+            if now - state["last_time"] >= interval and frame.f_lineno != state["last_line"]:
+                state["last_time"] = now
+                state["last_line"] = frame.f_lineno
+                _oi_sys.stdout.write("##active_line%d##\\n" % frame.f_lineno)
+        return local_trace
+
+    def global_trace(frame, event, arg):
+        code = frame.f_code
+        if code.co_name == "<module>" and frame.f_globals is user_ns:
+            state["filename"] = code.co_filename
+            return local_trace
+        if code.co_filename == state["filename"]:
+            return local_trace
+        return None
+
+    def pre_run_cell(*args):
+        if state["enabled"]:
+            state.update(filename=None, last_time=0.0, last_line=None)
+            _oi_sys.settrace(global_trace)
+
+    def post_run_cell(*args):
+        _oi_sys.settrace(None)
+
+    def set_enabled(enabled):
+        state["enabled"] = enabled
+
+    ip.events.register("pre_run_cell", pre_run_cell)
+    ip.events.register("post_run_cell", post_run_cell)
+    return set_enabled
+
+_oi_set_active_line_sampler = _oi_install_active_line_sampler({interval})
+""".strip()
+
 # When running from an executable, ipykernel calls itself infinitely
 # This is a workaround to detect it and launch it manually
 if "ipykernel_launcher" in sys.argv:
@@ -41,48 +86,33 @@ class JupyterLanguage(BaseLanguage):
     def __init__(self, computer):
         self.computer = computer
 
-        self.km = KernelManager(kernel_name="python3")
-        self.km.start_kernel()
-        self.kc = self.km.client()
-        self.kc.start_channels()
-        while not self.kc.is_alive():
-            time.sleep(0.1)
-        time.sleep(0.5)
+        # A kernel that's already started, with matplotlib set up (see kernel_pool.py)
+        self.km, self.kc = kernel_pool.acquire()
 
-        self.listener_thread = None
         self.finish_flag = False
 
-        # DISABLED because sometimes this bypasses sending it up to us for some reason!
-        # Give it our same matplotlib backend
-        # backend = matplotlib.get_backend()
-
-        # Use Agg, which bubbles everything up as an image.
-        # Not perfect (I want interactive!) but it works.
-        backend = "Agg"
-
-        code = f"""
-import matplotlib
-matplotlib.use('{backend}')
-        """.strip()
-
-        # Use Inline actually, it's better I think
-        code = """
-%matplotlib inline
-import matplotlib.pyplot as plt
-""".strip()
-
-        for _ in self.run(code):
-            pass
-
-        # DISABLED because it doesn't work??
-        # Disable color outputs in the terminal, which don't look good in OI and aren't useful
-        # code = """
-        # from IPython.core.getipython import get_ipython
-        # get_ipython().colors = 'NoColor'
-        # """
-        # self.run(code)
+        # "sample" reports the active line at most `active_line_sample_rate` times per second, via a trace hook.
+        # "print" inserts a print before every statement (exact, but slow for tight loops).
+        self.active_line_mode = os.environ.get(
+            "INTERPRETER_ACTIVE_LINE_MODE", "sample"
+        ).lower()
+        self.active_line_sample_rate = 20
+        self._active_line_sampler_enabled = None  # None = not installed in the kernel
+
+        # (code, preprocessed code) for code that was prepared while the LLM was still writing it
+        self._prepared = None
+
+        # One iopub reader per kernel, which routes messages to the execution that caused them
+        self._execution_queues = {}  # parent msg_id -> queue.Queue of iopub messages
+        self._execution_queues_lock = threading.Lock()
+        self._dispatcher_stop = threading.Event()
+        self._dispatcher_thread = threading.Thread(
+            target=self._dispatch_iopub_messages, daemon=True
+        )
+        self._dispatcher_thread.start()
 
     def terminate(self):
+        self._dispatcher_stop.set()
         self.kc.stop_channels()
         self.km.shutdown_kernel()
 
@@ -113,6 +143,8 @@ import matplotlib.pyplot as plt
         #         with open(f"{skill_library_path}/{filename}.py", "w") as file:
         #             file.write(function_code)
 
+        self._sync_active_line_sampler()
+
         self.finish_flag = False
         try:
             try:
@@ -121,187 +153,200 @@ import matplotlib.pyplot as plt
                 # Any errors produced here are our fault.
                 # Also, for python, you don't need them! It's just for active_line and stuff. Just looks pretty.
                 preprocessed_code = code
-            message_queue = queue.Queue()
-            self._execute_code(preprocessed_code, message_queue)
-            yield from self._capture_output(message_queue)
+            msg_id, message_queue = self._execute_code(preprocessed_code)
+            try:
+                yield from self._capture_output(message_queue)
+            finally:
+                with self._execution_queues_lock:
+                    self._execution_queues.pop(msg_id, None)
         except GeneratorExit:
             raise  # gotta pass this up!
         except:
             content = traceback.format_exc()
             yield {"type": "console", "format": "output", "content": content}
 
-    def _execute_code(self, code, message_queue):
-        def iopub_message_listener():
-            max_retries = 100
-            while True:
-                # If self.finish_flag = True, and we didn't set it (we do below), we need to stop. That's our "stop"
-                if self.finish_flag == True:
-                    if DEBUG_MODE:
-                        print("interrupting kernel!!!!!")
-                    self.km.interrupt_kernel()
-                    return
-                # For async usage
-                if (
-                    hasattr(self.computer.interpreter, "stop_event")
-                    and self.computer.interpreter.stop_event.is_set()
-                ):
-                    self.km.interrupt_kernel()
-                    self.finish_flag = True
-                    return
-                try:
-                    input_patience = int(
-                        os.environ.get("INTERPRETER_TERMINAL_INPUT_PATIENCE", 15)
-                    )
-                    if (
-                        time.time() - self.last_output_time > input_patience
-                        and time.time() - self.last_output_message_time > input_patience
-                    ):
-                        self.last_output_message_time = time.time()
-
-                        text = f"{self.computer.interpreter.messages}\n\nThe program above has been running for over 15 seconds. It might require user input. Are there keystrokes that the user should type in, to proceed after the last command?"
-                        if time.time() - self.last_output_time > 500:
-                            text += f" If you think the process is frozen, or that the user wasn't expect it to run for this long (it has been {time.time() - self.last_output_time} seconds since last output) then say <input>CTRL-C</input>."
-
-                        messages = [
-                            {
-                                "role": "system",
-                                "type": "message",
-                                "content": "You are an expert programming assistant. You will help the user determine if they should enter input into the terminal, per the user's requests. If you think the user would want you to type something into stdin, enclose it in <input></input> XML tags, like <input>y</input> to type 'y'.",
-                            },
-                            {"role": "user", "type": "message", "content": text},
-                        ]
-                        params = {
-                            "messages": messages,
-                            "model": self.computer.interpreter.llm.model,
-                            "stream": True,
-                            "temperature": 0,
-                        }
-                        if self.computer.interpreter.llm.api_key:
-                            params["api_key"] = self.computer.interpreter.llm.api_key
-
-                        response = ""
-                        for chunk in litellm.completion(**params):
-                            content = chunk.choices[0].delta.content
-                            if type(content) == str:
-                                response += content
-
-                        # Parse the response for input tags
-                        input_match = re.search(r"<input>(.*?)</input>", response)
-                        if input_match:
-                            user_input = input_match.group(1)
-                            # Check if the user input is CTRL-C
-                            self.finish_flag = True
-                            if user_input.upper() == "CTRL-C":
-                                self.finish_flag = True
-                            else:
-                                self.kc.input(user_input)
-
-                    msg = self.kc.iopub_channel.get_msg(timeout=0.05)
-                    self.last_output_time = time.time()
-                except queue.Empty:
-                    continue
-                except Exception as e:
-                    max_retries -= 1
-                    if max_retries < 0:
-                        raise
-                    print("Jupyter error, retrying:", str(e))
-                    continue
+    def _sync_active_line_sampler(self):
+        """
+        Installs (or toggles) the kernel-side active line sampler to match active_line_mode.
+        """
+        enabled = (
+            self.active_line_mode == "sample"
+            and os.environ.get("INTERPRETER_ACTIVE_LINE_DETECTION", "True").lower()
+            == "true"
+        )
+        if enabled == bool(self._active_line_sampler_enabled):
+            return
 
-                if DEBUG_MODE:
-                    print("-----------" * 10)
-                    print("Message received:", msg["content"])
-                    print("-----------" * 10)
-
-                if (
-                    msg["header"]["msg_type"] == "status"
-                    and msg["content"]["execution_state"] == "idle"
-                ):
-                    # Set finish_flag and return when the kernel becomes idle
-                    if DEBUG_MODE:
-                        print("from thread: kernel is idle")
-                    self.finish_flag = True
-                    return
+        if self._active_line_sampler_enabled is None:
+            code = ACTIVE_LINE_SAMPLER_CODE.replace(
+                "{interval}", str(1 / self.active_line_sample_rate)
+            )
+        else:
+            code = f"_oi_set_active_line_sampler({enabled})"
 
-                content = msg["content"]
-
-                if msg["msg_type"] == "stream":
-                    line, active_line = self.detect_active_line(content["text"])
-                    if active_line:
-                        message_queue.put(
-                            {
-                                "type": "console",
-                                "format": "active_line",
-                                "content": active_line,
-                            }
-                        )
-                    message_queue.put(
-                        {"type": "console", "format": "output", "content": line}
-                    )
-                elif msg["msg_type"] == "error":
-                    content = "\n".join(content["traceback"])
-                    # Remove color codes
-                    ansi_escape = re.compile(r"\x1B\[[0-?]*[ -/]*[@-~]")
-                    content = ansi_escape.sub("", content)
-                    message_queue.put(
-                        {
-                            "type": "console",
-                            "format": "output",
-                            "content": content,
-                        }
-                    )
-                elif msg["msg_type"] in ["display_data", "execute_result"]:
-                    data = content["data"]
-                    if "image/png" in data:
-                        message_queue.put(
-                            {
-                                "type": "image",
-                                "format": "base64.png",
-                                "content": data["image/png"],
-                            }
-                        )
-                    elif "image/jpeg" in data:
-                        message_queue.put(
-                            {
-                                "type": "image",
-                                "format": "base64.jpeg",
-                                "content": data["image/jpeg"],
-                            }
-                        )
-                    elif "text/html" in data:
-                        message_queue.put(
-                            {
-                                "type": "code",
-                                "format": "html",
-                                "content": data["text/html"],
-                            }
-                        )
-                    elif "text/plain" in data:
-                        message_queue.put(
-                            {
-                                "type": "console",
-                                "format": "output",
-                                "content": data["text/plain"],
-                            }
-                        )
-                    elif "application/javascript" in data:
-                        message_queue.put(
-                            {
-                                "type": "code",
-                                "format": "javascript",
-                                "content": data["application/javascript"],
-                            }
-                        )
+        # Set this first, as self.run() calls this method
+        self._active_line_sampler_enabled = enabled
+        for _ in self.run(code):
+            pass
 
-        self.listener_thread = threading.Thread(target=iopub_message_listener)
-        # self.listener_thread.daemon = True
-        self.listener_thread.start()
+    def _dispatch_iopub_messages(self):
+        """
+        Runs for the lifetime of the kernel. Reads every iopub message and hands it to
+        the queue of the execution it belongs to (by parent_header.msg_id).
+        """
+        max_retries = 100
+        while not self._dispatcher_stop.is_set():
+            try:
+                msg = self.kc.iopub_channel.get_msg(timeout=0.5)
+            except queue.Empty:
+                continue
+            except Exception as e:
+                if self._dispatcher_stop.is_set():
+                    return
+                max_retries -= 1
+                if max_retries < 0:
+                    raise
+                print("Jupyter error, retrying:", str(e))
+                continue
 
-        if DEBUG_MODE:
-            print(
-                "thread is on:", self.listener_thread.is_alive(), self.listener_thread
-            )
+            if DEBUG_MODE:
+                print("-----------" * 10)
+                print("Message received:", msg["content"])
+                print("-----------" * 10)
+
+            parent_msg_id = msg.get("parent_header", {}).get("msg_id")
+            with self._execution_queues_lock:
+                message_queue = self._execution_queues.get(parent_msg_id)
+            if message_queue is not None:
+                message_queue.put(msg)
+
+    def _execute_code(self, code):
+        """
+        Sends code to the kernel. Returns its msg_id and the queue its iopub messages will arrive on.
+        """
+        message_queue = queue.Queue()
+        # Hold the lock while sending, so the dispatcher can't route (and drop) a reply
+        # before we've registered the queue for it
+        with self._execution_queues_lock:
+            msg_id = self.kc.execute(code)
+            self._execution_queues[msg_id] = message_queue
+        return msg_id, message_queue
+
+    def _check_input_patience(self):
+        """
+        If the program has been quiet for a while, it might be waiting for input.
+        Asks the LLM whether there are keystrokes the user would want to type.
+        """
+        input_patience = int(os.environ.get("INTERPRETER_TERMINAL_INPUT_PATIENCE", 15))
+        if not (
+            time.time() - self.last_output_time > input_patience
+            and time.time() - self.last_output_message_time > input_patience
+        ):
+            return
 
-        self.kc.execute(code)
+        self.last_output_message_time = time.time()
+
+        text = f"{self.computer.interpreter.messages}\n\nThe program above has been running for over 15 seconds. It might require user input. Are there keystrokes that the user should type in, to proceed after the last command?"
+        if time.time() - self.last_output_time > 500:
+            text += f" If you think the process is frozen, or that the user wasn't expect it to run for this long (it has been {time.time() - self.last_output_time} seconds since last output) then say <input>CTRL-C</input>."
+
+        messages = [
+            {
+                "role": "system",
+                "type": "message",
+                "content": "You are an expert programming assistant. You will help the user determine if they should enter input into the terminal, per the user's requests. If you think the user would want you to type something into stdin, enclose it in <input></input> XML tags, like <input>y</input> to type 'y'.",
+            },
+            {"role": "user", "type": "message", "content": text},
+        ]
+        llm = self.computer.interpreter.llm
+        params = {
+            "messages": messages,
+            "model": llm.model,
+            "stream": True,
+            "temperature": 0,
+        }
+        if llm.api_key:
+            params["api_key"] = llm.api_key
+
+        # Through the response cache (so a replay never reaches the provider) and the router, like the main LLM
+        response = ""
+        for chunk in llm.response_cache.completions(
+            llm.router.route(llm.completions), **params
+        ):
+            if not chunk.choices:
+                continue
+            content = chunk.choices[0].delta.content
+            if type(content) == str:
+                response += content
+
+        # Parse the response for input tags
+        input_match = re.search(r"<input>(.*?)</input>", response)
+        if input_match:
+            user_input = input_match.group(1)
+            # Check if the user input is CTRL-C
+            self.finish_flag = True
+            if user_input.upper() == "CTRL-C":
+                self.finish_flag = True
+            else:
+                self.kc.input(user_input)
+
+    def _message_to_lmc(self, msg):
+        """
+        Converts an iopub message into LMC chunks.
+        """
+        content = msg["content"]
+
+        if msg["msg_type"] == "stream":
+            line, active_line = self.detect_active_line(content["text"])
+            if active_line:
+                yield {
+                    "type": "console",
+                    "format": "active_line",
+                    "content": active_line,
+                }
+            yield {"type": "console", "format": "output", "content": line}
+        elif msg["msg_type"] == "error":
+            content = "\n".join(content["traceback"])
+            # Remove color codes
+            ansi_escape = re.compile(r"\x1B\[[0-?]*[ -/]*[@-~]")
+            content = ansi_escape.sub("", content)
+            yield {
+                "type": "console",
+                "format": "output",
+                "content": content,
+            }
+        elif msg["msg_type"] in ["display_data", "execute_result"]:
+            data = content["data"]
+            if "image/png" in data:
+                yield {
+                    "type": "image",
+                    "format": "base64.png",
+                    "content": data["image/png"],
+                }
+            elif "image/jpeg" in data:
+                yield {
+                    "type": "image",
+                    "format": "base64.jpeg",
+                    "content": data["image/jpeg"],
+                }
+            elif "text/html" in data:
+                yield {
+                    "type": "code",
+                    "format": "html",
+                    "content": data["text/html"],
+                }
+            elif "text/plain" in data:
+                yield {
+                    "type": "console",
+                    "format": "output",
+                    "content": data["text/plain"],
+                }
+            elif "application/javascript" in data:
+                yield {
+                    "type": "code",
+                    "format": "javascript",
+                    "content": data["application/javascript"],
+                }
 
     def detect_active_line(self, line):
         if "##active_line" in line:
@@ -319,45 +364,74 @@ import matplotlib.pyplot as plt
 
     def _capture_output(self, message_queue):
         while True:
-            time.sleep(0.1)
+            # If self.finish_flag = True, and we didn't set it (the idle status does), we need to stop. That's our "stop"
+            if self.finish_flag:
+                if DEBUG_MODE:
+                    print("interrupting kernel!!!!!")
+                self.km.interrupt_kernel()
+                break
 
             # For async usage
             if (
                 hasattr(self.computer.interpreter, "stop_event")
                 and self.computer.interpreter.stop_event.is_set()
             ):
+                self.km.interrupt_kernel()
                 self.finish_flag = True
                 break
 
-            if self.listener_thread:
-                try:
-                    output = message_queue.get(timeout=0.1)
-                    if DEBUG_MODE:
-                        print(output)
-                    yield output
-
-                except queue.Empty:
-                    if self.finish_flag:
-                        time.sleep(0.1)
-
-                        try:
-                            output = message_queue.get(timeout=0.1)
-                            if DEBUG_MODE:
-                                print(output)
-                            yield output
-                        except queue.Empty:
-                            if DEBUG_MODE:
-                                print("we're done")
-                            break
+            try:
+                msg = message_queue.get(timeout=0.1)
+            except queue.Empty:
+                self._check_input_patience()
+                continue
+
+            self.last_output_time = time.time()
+
+            if (
+                msg["header"]["msg_type"] == "status"
+                and msg["content"]["execution_state"] == "idle"
+            ):
+                # The kernel is done with our code. Everything it produced came before this
+                if DEBUG_MODE:
+                    print("kernel is idle, we're done")
+                self.finish_flag = True
+                break
+
+            for output in self._message_to_lmc(msg):
+                if DEBUG_MODE:
+                    print(output)
+                yield output
 
     def stop(self):
         self.finish_flag = True
 
+    def prepare(self, code):
+        """
+        Preprocesses a code block that's still being written. If it's finished by the time it runs,
+        run() can skip preprocessing it.
+        """
+        if self.active_line_mode == "sample":
+            return  # Nothing to do, sample mode runs the code as-is
+        code = code.strip()
+        if self._prepared is not None and self._prepared[0] == code:
+            return
+        try:
+            self._prepared = (
+                code,
+                preprocess_python(code, active_line_mode=self.active_line_mode),
+            )
+        except Exception:
+            pass  # The block so far might not parse yet
+
     def preprocess_code(self, code):
-        return preprocess_python(code)
+        prepared = self._prepared
+        if prepared is not None and prepared[0] == code.strip():
+            return prepared[1]
+        return preprocess_python(code, active_line_mode=self.active_line_mode)
 
 
-def preprocess_python(code):
+def preprocess_python(code, active_line_mode="print"):
     """
     Add active line markers
     Wrap in a try except
@@ -365,6 +439,10 @@ def preprocess_python(code):
 
     code = code.strip()
 
+    if active_line_mode == "sample":
+        # The kernel's trace hook reports active lines, so leave the code (and its line numbers) alone
+        return code
+
     # Add print commands that tell us what the active line is
     # but don't do this if any line starts with ! or %
     if (
@@ -3,11 +3,13 @@ import queue
 import re
 import subprocess
 import threading
-import time
 import traceback
 
 from ..base_language import BaseLanguage
 
+# Put on the output queue (after the last line of output) when execution ends
+END_OF_EXECUTION = object()
+
 
 class SubprocessLanguage(BaseLanguage):
     def __init__(self):
@@ -16,6 +18,8 @@ class SubprocessLanguage(BaseLanguage):
         self.verbose = False
         self.output_queue = queue.Queue()
         self.done = threading.Event()
+        # After END_OF_EXECUTION, how long to wait for stderr lines that were written before it
+        self.output_grace_period = 0.02
 
     def detect_active_line(self, line):
         return None
@@ -87,6 +91,13 @@ class SubprocessLanguage(BaseLanguage):
             }
             return
 
+        # Anything left over from a previous (stopped) run is stale
+        while True:
+            try:
+                self.output_queue.get_nowait()
+            except queue.Empty:
+                break
+
         while retry_count <= max_retries:
             if self.verbose:
                 print(f"(after processing) Running processed code:\n{code}\n---")
@@ -119,23 +130,29 @@ class SubprocessLanguage(BaseLanguage):
                     }
                     return
 
+        # Block until output arrives. The reader threads put END_OF_EXECUTION on the queue
+        # right after the end marker, so there's no polling delay on fast commands.
         while True:
-            if not self.output_queue.empty():
-                yield self.output_queue.get()
-            else:
-                time.sleep(0.1)
             try:
-                output = self.output_queue.get(timeout=0.3)  # Waits for 0.3 seconds
-                yield output
+                output = self.output_queue.get(timeout=0.5)
             except queue.Empty:
-                if self.done.is_set():
-                    # Try to yank 3 more times from it... maybe there's something in there...
-                    # (I don't know if this actually helps. Maybe we just need to yank 1 more time)
-                    for _ in range(3):
-                        if not self.output_queue.empty():
-                            yield self.output_queue.get()
-                        time.sleep(0.2)
-                    break
+                if self.process is None or self.process.poll() is not None:
+                    break  # The process died, so no end marker is coming
+                continue
+
+            if output is END_OF_EXECUTION:
+                break
+            yield output
+
+        # stdout and stderr are read by separate threads, so stderr written just before
+        # the end marker can land right after it. Give it a moment
+        while True:
+            try:
+                output = self.output_queue.get(timeout=self.output_grace_period)
+            except queue.Empty:
+                break
+            if output is not END_OF_EXECUTION:
+                yield output
 
     def handle_stream_output(self, stream, is_error_stream):
         try:
@@ -171,6 +188,7 @@ class SubprocessLanguage(BaseLanguage):
                             {"type": "console", "format": "output", "content": line}
                         )
                     self.done.set()
+                    self.output_queue.put(END_OF_EXECUTION)
                 elif is_error_stream and "KeyboardInterrupt" in line:
                     self.output_queue.put(
                         {
@@ -179,8 +197,8 @@ class SubprocessLanguage(BaseLanguage):
                             "content": "KeyboardInterrupt",
                         }
                     )
-                    time.sleep(0.1)
                     self.done.set()
+                    self.output_queue.put(END_OF_EXECUTION)
                 else:
                     self.output_queue.put(
                         {"type": "console", "format": "output", "content": line}
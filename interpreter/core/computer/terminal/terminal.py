@@ -1,11 +1,12 @@
-import json
 import os
 import time
 import subprocess
 import getpass
+import threading
 
 from ..utils.recipient_utils import parse_for_recipient
 from .languages.applescript import AppleScript
+from .languages.fork_server import ForkPython, fork_server_supported
 from .languages.html import HTML
 from .languages.java import Java
 from .languages.javascript import JavaScript
@@ -30,12 +31,50 @@ computer = interpreter.computer
 """.strip()
 
 
+class StreamedCode:
+    """
+    A code block the LLM is still writing. Collects its chunks, and hands it to `terminal.warm_up`:
+    the language as soon as the block starts, then the code so far at the end of a line, at most
+    every `interval` seconds. That way long blocks aren't re-joined and re-prepared for every token.
+    """
+
+    def __init__(self, terminal, language, interval=0.25):
+        self.terminal = terminal
+        self.language = language
+        self.interval = interval
+        self.parts = []
+        self._last_prepared = time.monotonic()
+        terminal.warm_up(language)
+
+    def append(self, content):
+        if not content:
+            return
+        self.parts.append(content)
+        now = time.monotonic()
+        if "\n" in content and now - self._last_prepared >= self.interval:
+            self._last_prepared = now
+            self.terminal.warm_up(self.language, self.code)
+
+    @property
+    def code(self):
+        return "".join(self.parts)
+
+
 class Terminal:
     def __init__(self, computer):
         self.computer = computer
+        # INTERPRETER_PYTHON_BACKEND=fork runs Python in sessions forked from a pre-imported template
+        if (
+            os.environ.get("INTERPRETER_PYTHON_BACKEND", "jupyter").lower() == "fork"
+            and fork_server_supported()
+        ):
+            python = ForkPython
+        else:
+            python = Python
+
         self.languages = [
             Ruby,
-            Python,
+            python,
             Shell,
             JavaScript,
             HTML,
@@ -47,6 +86,13 @@ class Terminal:
         ]
         self._active_languages = {}
 
+        # Start a language's runtime while the LLM is still writing code in it (see warm_up)
+        self.speculative_warm_up = True
+        self._languages_lock = threading.Lock()
+        self._starting_languages = {}  # language -> thread starting it
+        self._pending_warm_up = None  # (language, code so far), for the warm-up thread
+        self._warm_up_thread = None
+
     def sudo_install(self, package):
         try:
             # First, try to install without sudo
@@ -108,30 +154,23 @@ class Terminal:
                 self.computer._has_imported_skills = True
                 self.computer.skills.import_skills()
 
-            # This won't work because truncated code is stored in interpreter.messages :/
-            # If the full code was stored, we could do this:
-            if False and "get_last_output()" in code:
+            # Truncated outputs tell the LLM to page through the full output with get_last_output(),
+            # which reads it back from the file the interpreter spilled it to
+            if "get_last_output()" in code:
                 if "# We wouldn't want to have maximum recursion depth!" in code:
                     # We just tried to run this, in a moment.
                     pass
                 else:
-                    code_outputs = [
-                        m
-                        for m in self.computer.interpreter.messages
-                        if m["role"] == "computer"
-                        and "content" in m
-                        and m["content"] != ""
-                    ]
-                    if len(code_outputs) > 0:
-                        last_output = code_outputs[-1]["content"]
-                    else:
-                        last_output = ""
-                    last_output = json.dumps(last_output)
-
-                    self.computer.run(
-                        "python",
-                        f"# We wouldn't want to have maximum recursion depth!\nimport json\ndef get_last_output():\n    return '''{last_output}'''",
+                    output_buffer = getattr(
+                        self.computer.interpreter, "_output_buffer", None
                     )
+                    last_output_path = getattr(output_buffer, "path", None)
+                    if last_output_path:
+                        output_buffer.close()  # Flush it to disk
+                        self.computer.run(
+                            "python",
+                            f"# We wouldn't want to have maximum recursion depth!\ndef get_last_output():\n    with open({last_output_path!r}, encoding='utf-8') as f:\n        return f.read()",
+                        )
 
         if stream == False:
             # If stream == False, *pull* from _streaming_run.
@@ -153,17 +192,106 @@ class Terminal:
             # If stream == True, replace this with _streaming_run.
             return self._streaming_run(language, code, display=display)
 
+    def _create_language(self, language):
+        # Get the language. Pass in self.computer *if it takes a single argument*
+        # but pass in nothing if not. This makes custom languages easier to add / understand.
+        lang_class = self.get_language(language)
+        if lang_class.__init__.__code__.co_argcount > 1:
+            return lang_class(self.computer)
+        else:
+            return lang_class()
+
+    def _start_language(self, language):
+        try:
+            instance = self._create_language(language)
+        except Exception:
+            # Starting it again in the foreground will raise this where someone can see it
+            instance = None
+        with self._languages_lock:
+            if instance is not None:
+                self._active_languages[language] = instance
+            del self._starting_languages[language]
+
+    def _get_active_language(self, language, wait=True):
+        """
+        Returns the running instance of `language`, starting it if it isn't running yet.
+        If it's already starting in the background, waits for that (or returns None if `wait` is False).
+        """
+        with self._languages_lock:
+            if language in self._active_languages:
+                return self._active_languages[language]
+            thread = self._starting_languages.get(language)
+            if thread is None:
+                thread = threading.Thread(
+                    target=self._start_language, args=(language,), daemon=True
+                )
+                self._starting_languages[language] = thread
+                thread.start()
+
+        if not wait:
+            return None
+        thread.join()
+
+        with self._languages_lock:
+            if language in self._active_languages:
+                return self._active_languages[language]
+        instance = self._create_language(language)
+        with self._languages_lock:
+            return self._active_languages.setdefault(language, instance)
+
+    def warm_up(self, language, code=None):
+        """
+        Speculatively starts `language`'s runtime (like a Jupyter kernel), so a code block the LLM is
+        still writing can run as soon as it's finished. `code` is the block so far, which languages with
+        a `prepare(code)` method can get ready ahead of time. Returns immediately.
+        """
+        if not self.speculative_warm_up or not language:
+            return
+        language = language.lower().strip()
+        if self.get_language(language) is None:
+            return
+
+        with self._languages_lock:
+            if language in self._active_languages and code is None:
+                return
+            self._pending_warm_up = (language, code)
+            if self._warm_up_thread is None:
+                self._warm_up_thread = threading.Thread(
+                    target=self._warm_up_worker, daemon=True
+                )
+                self._warm_up_thread.start()
+
+    def _warm_up_worker(self):
+        while True:
+            with self._languages_lock:
+                if self._pending_warm_up is None:
+                    self._warm_up_thread = None
+                    return
+                # Only the latest code matters, anything older has already been superseded
+                language, code = self._pending_warm_up
+                self._pending_warm_up = None
+
+            self._get_active_language(language, wait=False)
+            if code is None:
+                continue
+
+            with self._languages_lock:
+                thread = self._starting_languages.get(language)
+            if thread is not None:
+                thread.join()
+            with self._languages_lock:
+                instance = self._active_languages.get(language)
+            prepare = getattr(instance, "prepare", None)
+            if prepare is not None:
+                try:
+                    prepare(code)
+                except Exception:
+                    pass  # It's only speculative
+
     def _streaming_run(self, language, code, display=False):
-        if language not in self._active_languages:
-            # Get the language. Pass in self.computer *if it takes a single argument*
-            # but pass in nothing if not. This makes custom languages easier to add / understand.
-            lang_class = self.get_language(language)
-            if lang_class.__init__.__code__.co_argcount > 1:
-                self._active_languages[language] = lang_class(self.computer)
-            else:
-                self._active_languages[language] = lang_class()
+        active_language = self._get_active_language(language)
         try:
-            for chunk in self._active_languages[language].run(code):
+            for chunk in active_language.run(code):
                 # self.format_to_recipient can format some messages as having a certain recipient.
                 # Here we add that to the LMC messages:
                 if chunk["type"] == "console" and chunk.get("format") == "output":
@@ -198,6 +326,12 @@ class Terminal:
             language.stop()
 
     def terminate(self):
+        # Let languages that are still starting finish, so they don't outlive us
+        with self._languages_lock:
+            starting = list(self._starting_languages.values())
+        for thread in starting:
+            thread.join()
+
         for language_name in list(self._active_languages.keys()):
             language = self._active_languages[language_name]
             if (
@@ -1,8 +1,9 @@
 import base64
 import contextlib
+import hashlib
 import io
 import os
-import tempfile
+from collections import OrderedDict
 
 from PIL import Image
 
@@ -19,6 +20,11 @@ class Vision:
         self.tokenizer = None  # Will load upon first use
         self.easyocr = None
 
+        # Results by image hash, so identical screenshots aren't processed twice
+        self.cache_size = 128
+        self._ocr_cache = OrderedDict()
+        self._query_cache = OrderedDict()  # (image hash, query) -> answer
+
     def load(self, load_moondream=True, load_easyocr=True):
         # print("Loading vision models (Moondream, EasyOCR)...\n")
 
@@ -56,6 +62,44 @@ class Vision:
                 )
                 return True
 
+    def _open_image(self, base_64=None, path=None, lmc=None, pil_image=None):
+        """
+        Returns the image as a PIL Image, and a hash of its contents (for the caches).
+        """
+        if lmc:
+            if "base64" in lmc["format"]:
+                base_64 = lmc["content"]
+            elif lmc["format"] == "path":
+                path = lmc["content"]
+
+        if base_64:
+            data = base64.b64decode(base_64)
+        elif path:
+            with open(path, "rb") as image_file:
+                data = image_file.read()
+        elif pil_image:
+            digest = hashlib.blake2b(
+                f"{pil_image.mode}{pil_image.size}".encode() + pil_image.tobytes(),
+                digest_size=16,
+            ).digest()
+            return pil_image, digest
+        else:
+            raise ValueError("Provide an image as base_64, path, lmc or pil_image.")
+
+        digest = hashlib.blake2b(data, digest_size=16).digest()
+        return Image.open(io.BytesIO(data)), digest
+
+    def _cached(self, cache, key):
+        if key in cache:
+            cache.move_to_end(key)
+            return cache[key]
+        return None
+
+    def _remember(self, cache, key, value):
+        cache[key] = value
+        while len(cache) > self.cache_size:
+            cache.popitem(last=False)
+
     def ocr(
         self,
         base_64=None,
@@ -67,58 +111,30 @@ class Vision:
         Gets OCR of image.
         """
 
-        if lmc:
-            if "base64" in lmc["format"]:
-                # # Extract the extension from the format, default to 'png' if not specified
-                # if "." in lmc["format"]:
-                #     extension = lmc["format"].split(".")[-1]
-                # else:
-                #     extension = "png"
-                # Save the base64 content as a temporary file
-                img_data = base64.b64decode(lmc["content"])
-                with tempfile.NamedTemporaryFile(
-                    delete=False, suffix=".png"
-                ) as temp_file:
-                    temp_file.write(img_data)
-                    temp_file_path = temp_file.name
-
-                # Set path to the path of the temporary file
-                path = temp_file_path
-
-            elif lmc["format"] == "path":
-                # Convert to base64
-                path = lmc["content"]
-        elif base_64:
-            # Save the base64 content as a temporary file
-            img_data = base64.b64decode(base_64)
-            with tempfile.NamedTemporaryFile(delete=False, suffix=".png") as temp_file:
-                temp_file.write(img_data)
-                temp_file_path = temp_file.name
-
-            # Set path to the path of the temporary file
-            path = temp_file_path
-        elif path:
-            pass
-        elif pil_image:
-            with tempfile.NamedTemporaryFile(delete=False, suffix=".png") as temp_file:
-                pil_image.save(temp_file, format="PNG")
-                temp_file_path = temp_file.name
+        img, digest = self._open_image(base_64, path, lmc, pil_image)
 
-            # Set path to the path of the temporary file
-            path = temp_file_path
+        text = self._cached(self._ocr_cache, digest)
+        if text is not None:
+            return text
 
         try:
             if not self.easyocr:
                 self.load(load_moondream=False)
-            result = self.easyocr.readtext(path)
-            text = " ".join([item[1] for item in result])
-            return text.strip()
+            import numpy as np
+
+            # EasyOCR takes arrays directly (BGR, like it reads files), so nothing touches the disk
+            pixels = np.asarray(img.convert("RGB"))[:, :, ::-1]
+            result = self.easyocr.readtext(pixels)
+            text = " ".join([item[1] for item in result]).strip()
         except ImportError:
             print(
                 "\nTo use local vision, run `pip install 'open-interpreter[local]'`.\n"
             )
             return ""
 
+        self._remember(self._ocr_cache, digest, text)
+        return text
+
     def query(
         self,
         query="Describe this image. Also tell me what text is in the image, if any.",
@@ -131,6 +147,12 @@ class Vision:
         Uses Moondream to ask query of the image (which can be a base64, path, or lmc message)
         """
 
+        img, digest = self._open_image(base_64, path, lmc, pil_image)
+
+        answer = self._cached(self._query_cache, (digest, query))
+        if answer is not None:
+            return answer
+
         if self.model == None and self.tokenizer == None:
             try:
                 success = self.load(load_easyocr=False)
@@ -142,34 +164,11 @@ class Vision:
             if not success:
                 return ""
 
-        if lmc:
-            if "base64" in lmc["format"]:
-                # # Extract the extension from the format, default to 'png' if not specified
-                # if "." in lmc["format"]:
-                #     extension = lmc["format"].split(".")[-1]
-                # else:
-                #     extension = "png"
-
-                # Decode the base64 image
-                img_data = base64.b64decode(lmc["content"])
-                img = Image.open(io.BytesIO(img_data))
-
-            elif lmc["format"] == "path":
-                # Convert to base64
-                image_path = lmc["content"]
-                img = Image.open(image_path)
-        elif base_64:
-            img_data = base64.b64decode(base_64)
-            img = Image.open(io.BytesIO(img_data))
-        elif path:
-            img = Image.open(path)
-        elif pil_image:
-            img = pil_image
-
         with contextlib.redirect_stdout(open(os.devnull, "w")):
             enc_image = self.model.encode_image(img)
             answer = self.model.answer_question(
                 enc_image, query, self.tokenizer, max_length=400
             )
 
+        self._remember(self._query_cache, (digest, query), answer)
         return answer
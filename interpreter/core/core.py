@@ -11,14 +11,19 @@ from datetime import datetime
 from .computer.computer import Computer
 from .default_system_message import default_system_message
 from .llm.llm import Llm
+from .render_message import RenderCache
 from .respond import respond
 from .utils.telemetry import send_telemetry
-from ..memory import MemoryManager
+from ..memory import MemoryManager, MemoryPipeline
 from ..file_indexing import FileIndexer
-from .utils.truncate_output import truncate_output
+from .utils.output_buffer import OutputBuffer
 from ..terminal_interface.utils.local_storage_path import get_storage_path
 
 
+def is_console_output(chunk):
+    return chunk.get("type") == "console" and chunk.get("format") == "output"
+
+
 class OpenInterpreter:
     """
     This class (one instance is called an `interpreter`) is the "grand central station" of this project.
@@ -47,6 +52,7 @@ class OpenInterpreter:
         max_output=2800,
         safe_mode="off",
         shrink_images=True,
+        image_format=None,
         loop=False,
         loop_message="""Proceed. You CAN run code on my machine. If the entire task I asked for is done, say exactly 'The task is done.' If you need some specific information (like username or password) say EXACTLY 'Please provide more information.' If it's impossible, say 'The task is impossible.' (If I haven't provided a task, say exactly 'Let me know what you'd like to do next.') Otherwise keep going.""",
         loop_breakers=[
@@ -65,6 +71,7 @@ class OpenInterpreter:
         llm=None,
         system_message=default_system_message,
         custom_instructions="",
+        cache_system_message=True,
         user_message_template="{content}",
         always_apply_user_message_template=False,
         code_output_template="Code output: {content}\n\nWhat does this output mean / what's next (if anything, or are we done)?",
@@ -84,9 +91,12 @@ class OpenInterpreter:
         self.messages = [] if messages is None else messages
         self.responding = False
         self.last_messages_count = 0
+        self._output_buffer = None  # Holds the full output of the last code run (see get_last_output())
+        self._previous_output_buffer = None
 
         # Memory
         self.memory = MemoryManager(backend=memory_backend)
+        self.memory_pipeline = MemoryPipeline(self)  # Recall and extraction, off the critical path
 
         # Settings
         self.offline = offline
@@ -96,6 +106,7 @@ class OpenInterpreter:
         self.max_output = max_output
         self.safe_mode = safe_mode
         self.shrink_images = shrink_images
+        self.image_format = image_format  # "jpeg" or "webp" re-encodes images (like screenshots) sent to the LLM
         self.disable_telemetry = disable_telemetry
         self.in_terminal_interface = in_terminal_interface
         self.multi_line = multi_line
@@ -137,6 +148,8 @@ class OpenInterpreter:
         # These are LLM related
         self.system_message = system_message
         self.custom_instructions = custom_instructions
+        self.cache_system_message = cache_system_message  # Rebuild only when the system message's inputs change (blocks re-run unless they declare a `# ttl:`)
+        self._system_message_cache = RenderCache()
         self.user_message_template = user_message_template
         self.always_apply_user_message_template = always_apply_user_message_template
         self.code_output_template = code_output_template
@@ -261,11 +274,9 @@ class OpenInterpreter:
             # This is where it all happens!
 
             # Retrieve relevant memories
+            # (This runs while respond() renders the system message, which then inserts the results)
             if len(self.messages) > 0:
-                last_message = self.messages[-1]["content"]
-                recalled_memories = self.memory.search_semantic_memory(self.llm.embed(last_message), top_k=3)
-                if recalled_memories:
-                    self.messages.insert(-1, {"role": "system", "type": "message", "content": "Relevant memories:\n" + "\n".join(recalled_memories)})
+                self.memory_pipeline.prefetch_recall(self.messages[-1]["content"])
 
             yield from self._respond_and_store()
 
@@ -314,9 +325,8 @@ class OpenInterpreter:
                     last_exchange_messages = self.messages[last_user_message_index:]
                     last_exchange_content = "\n".join([m["content"] for m in last_exchange_messages if "content" in m])
                     
-                    extracted_memories = self.llm.extract_memories(last_exchange_content)
-                    for memory in extracted_memories:
-                        self.memory.add_semantic_memory(memory, self.llm.embed(memory))
+                    # Extracted and embedded in the background, so we can return right away
+                    self.memory_pipeline.submit_extraction(last_exchange_content)
 
             return
 
@@ -418,7 +428,11 @@ class OpenInterpreter:
                                 for property in ["role", "type", "format"]
                             ]
                         ):
-                            self.messages.append(chunk)
+                            # A copy, so the buffer's truncation doesn't reach the chunk we yield
+                            self.messages.append({**chunk})
+                            self._start_output_buffer(self.messages[-1])
+                        elif is_console_output(chunk):
+                            self._append_to_output_buffer(chunk)
                         else:
                             self.messages[-1]["content"] += chunk["content"]
                 else:
@@ -436,28 +450,75 @@ class OpenInterpreter:
 
                     # Add the chunk as a new message
                     if not is_ephemeral(chunk):
-                        self.messages.append(chunk)
+                        self.messages.append({**chunk})
+                        self._start_output_buffer(self.messages[-1])
 
                 # Yield the chunk itself
                 yield chunk
 
-                # Truncate output if it's console output
-                if chunk["type"] == "console" and chunk["format"] == "output":
-                    self.messages[-1]["content"] = truncate_output(
-                        self.messages[-1]["content"],
-                        self.max_output,
-                        add_scrollbars=self.computer.import_computer_api,  # I consider scrollbars to be a computer API thing
-                    )
-
             # Yield a final end flag
             if last_flag_base:
                 yield {**last_flag_base, "end": True}
         except GeneratorExit:
             raise  # gotta pass this up!
+        finally:
+            if self._output_buffer:
+                self._output_buffer.close()
+            # Nothing can be reading the run before the last one anymore
+            if self._previous_output_buffer:
+                self._previous_output_buffer.cleanup()
+                self._previous_output_buffer = None
+
+    def _start_output_buffer(self, chunk):
+        """
+        Console output goes through an OutputBuffer, which keeps only the last `max_output` characters
+        (so huge outputs stay cheap) and spills the full output to disk for get_last_output().
+        """
+        if not is_console_output(chunk):
+            return
+        # Keep the full output of the last run, plus the one before it (which a running get_last_output() may be reading)
+        if self._previous_output_buffer:
+            self._previous_output_buffer.cleanup()
+        self._previous_output_buffer = self._output_buffer
+        self._output_buffer = OutputBuffer(
+            self.max_output,
+            add_scrollbars=self.computer.import_computer_api,  # I consider scrollbars to be a computer API thing
+        )
+        self._output_buffer.message = self.messages[-1]
+        self._output_buffer.append(self.messages[-1]["content"])
+        self.messages[-1]["content"] = self._output_buffer.value()
+
+    def _append_to_output_buffer(self, chunk):
+        if (
+            self._output_buffer is None
+            or self._output_buffer.message is not self.messages[-1]
+        ):
+            # This message wasn't started through the buffer, so seed one with what it has so far
+            self._start_output_buffer(self.messages[-1])
+        self._output_buffer.append(chunk["content"])
+        self.messages[-1]["content"] = self._output_buffer.value()
+
+    def get_last_output(self):
+        """
+        Returns the full (untruncated) output of the last code run.
+        """
+        if self._output_buffer is None or self._output_buffer.path is None:
+            return ""
+        self._output_buffer.close()
+        with open(self._output_buffer.path, encoding="utf-8") as f:
+            return f.read()
 
     def reset(self):
         self.computer.terminate()  # Terminates all languages
+        self.memory_pipeline.close()  # Stops its worker (queued extractions still get stored)
         self.computer._has_imported_computer_api = False  # Flag reset
+        for output_buffer in [self._output_buffer, self._previous_output_buffer]:
+            if output_buffer:
+                output_buffer.cleanup()
+        self._output_buffer = None
+        self._previous_output_buffer = None
+        self._system_message_cache.clear()  # Rendered blocks came from the old kernel
+        self.llm.token_ledger.total_tokens = 0  # Cached counts stay valid, the context doesn't
         self.messages = []
         self.last_messages_count = 0
 
@@ -14,15 +14,17 @@ import subprocess
 import time
 import uuid
 
-import requests
-import tokentrim as tt
-from sentence_transformers import SentenceTransformer
-
+from ..utils.http_pool import http_pool
 from .run_text_llm import run_text_llm
 
 # from .run_function_calling_llm import run_function_calling_llm
 from .run_tool_calling_llm import run_tool_calling_llm
+from .utils.completion_router import CompletionRouter
 from .utils.convert_to_openai_messages import convert_to_openai_messages
+from .utils.embedding_service import DEFAULT_EMBEDDING_MODEL, get_embedding_service
+from .utils.model_cache import ModelCache
+from .utils.response_cache import ResponseCache
+from .utils.token_ledger import TokenLedger
 
 # Create or get the logger
 logger = logging.getLogger("LiteLLM")
@@ -74,7 +76,22 @@ class Llm:
         # Budget manager powered by LiteLLM
         self.max_budget = None
 
-        self.embedding_model = SentenceTransformer('all-MiniLM-L6-v2')
+        # Loaded on first use, and shared with every other Llm in this process
+        self.embedding_model_name = DEFAULT_EMBEDDING_MODEL
+
+        # Remembers per-message token counts so trimming only tokenizes new messages
+        self.token_ledger = TokenLedger()
+
+        # Capabilities and limits we've detected before, so new Llms don't have to probe again
+        self.model_cache = ModelCache()
+
+        # Retries with backoff, deadlines, time-to-first-token timeouts, hedging and fallback models
+        self.router = CompletionRouter()
+
+        # Optional on-disk cache of streamed responses. Set `response_cache.mode` to "cache", "record" or "replay"
+        self.response_cache = ResponseCache(
+            mode=os.environ.get("INTERPRETER_RESPONSE_CACHE") or None
+        )
 
     def run(self, messages):
         """
@@ -126,25 +143,40 @@ class Llm:
                 self.api_base = "https://api.openinterpreter.com/v0"
                 self.interpreter.conversation_id = str(uuid.uuid4())
 
-        # Detect function support
-        if self.supports_functions == None:
-            try:
-                if litellm.supports_function_calling(model):
-                    self.supports_functions = True
+        if self.supports_functions == None or self.supports_vision == None:
+            cached = self.model_cache.get(model, self.api_base)
+            detected = {}
+
+            # Detect function support
+            if self.supports_functions == None:
+                if "supports_functions" in cached:
+                    self.supports_functions = cached["supports_functions"]
                 else:
-                    self.supports_functions = False
-            except:
-                self.supports_functions = False
-
-        # Detect vision support
-        if self.supports_vision == None:
-            try:
-                if litellm.supports_vision(model):
-                    self.supports_vision = True
+                    try:
+                        if litellm.supports_function_calling(model):
+                            self.supports_functions = True
+                        else:
+                            self.supports_functions = False
+                    except:
+                        self.supports_functions = False
+                    detected["supports_functions"] = self.supports_functions
+
+            # Detect vision support
+            if self.supports_vision == None:
+                if "supports_vision" in cached:
+                    self.supports_vision = cached["supports_vision"]
                 else:
-                    self.supports_vision = False
-            except:
-                self.supports_vision = False
+                    try:
+                        if litellm.supports_vision(model):
+                            self.supports_vision = True
+                        else:
+                            self.supports_vision = False
+                    except:
+                        self.supports_vision = False
+                    detected["supports_vision"] = self.supports_vision
+
+            if detected:
+                self.model_cache.update(model, self.api_base, **detected)
 
         # Trim image messages if they're there
         image_messages = [msg for msg in messages if msg["type"] == "image"]
@@ -208,6 +240,7 @@ class Llm:
             function_calling=self.supports_functions,
             vision=self.supports_vision,
             shrink_images=self.interpreter.shrink_images,
+            image_format=getattr(self.interpreter, "image_format", None),
             interpreter=self.interpreter,
         )
 
@@ -220,21 +253,21 @@ class Llm:
                 trim_to_be_this_many_tokens = (
                     self.context_window - self.max_tokens - 25
                 )  # arbitrary buffer
-                messages = tt.trim(
+                messages = self.token_ledger.trim(
                     messages,
                     system_message=system_message,
                     max_tokens=trim_to_be_this_many_tokens,
                 )
             elif self.context_window and not self.max_tokens:
                 # Just trim to the context window if max_tokens not set
-                messages = tt.trim(
+                messages = self.token_ledger.trim(
                     messages,
                     system_message=system_message,
                     max_tokens=self.context_window,
                 )
             else:
                 try:
-                    messages = tt.trim(
+                    messages = self.token_ledger.trim(
                         messages, system_message=system_message, model=model
                     )
                 except:
@@ -261,7 +294,7 @@ Also please set `self.max_tokens = {max tokens per response}`.
 Continuing...
                             """
                             )
-                    messages = tt.trim(
+                    messages = self.token_ledger.trim(
                         messages, system_message=system_message, max_tokens=8000
                     )
         except:
@@ -345,79 +378,119 @@ Continuing...
 
         self._is_loaded = True
 
+        cached = self.model_cache.get(self.model, self.api_base)
+
         if self.model.startswith("ollama/"):
             model_name = self.model.replace("ollama/", "")
             api_base = getattr(self, "api_base", None) or os.getenv(
                 "OLLAMA_HOST", "http://localhost:11434"
             )
-            names = []
-            try:
-                # List out all downloaded ollama models. Will fail if ollama isn't installed
-                response = requests.get(f"{api_base}/api/tags")
-                if response.ok:
-                    data = response.json()
-                    names = [
-                        model["name"]
-                        for model in data["models"]
-                        if "name" in model and model["name"]
-                    ]
-
-            except Exception as e:
-                print(str(e))
-                self.interpreter.display_message(
-                    f"> Ollama not found\n\nPlease download Ollama from [ollama.com](https://ollama.com/) to use `{model_name}`.\n"
-                )
-                exit()
 
-            # Download model if not already installed
-            if model_name not in names:
-                self.interpreter.display_message(f"\nDownloading {model_name}...\n")
-                requests.post(f"{api_base}/api/pull", json={"name": model_name})
+            # We've seen this model installed recently, so skip asking Ollama again
+            if not cached.get("downloaded"):
+                names = []
+                try:
+                    # List out all downloaded ollama models. Will fail if ollama isn't installed
+                    response = http_pool.get(f"{api_base}/api/tags")
+                    if response.ok:
+                        data = response.json()
+                        names = [
+                            model["name"]
+                            for model in data["models"]
+                            if "name" in model and model["name"]
+                        ]
+
+                except Exception as e:
+                    print(str(e))
+                    self.interpreter.display_message(
+                        f"> Ollama not found\n\nPlease download Ollama from [ollama.com](https://ollama.com/) to use `{model_name}`.\n"
+                    )
+                    exit()
+
+                # Download model if not already installed
+                if model_name not in names:
+                    self.interpreter.display_message(f"\nDownloading {model_name}...\n")
+                    http_pool.post(f"{api_base}/api/pull", json={"name": model_name})
+
+                self.model_cache.update(self.model, self.api_base, downloaded=True)
 
             # Get context window if not set
             if self.context_window == None:
-                response = requests.post(
-                    f"{api_base}/api/show", json={"name": model_name}
-                )
-                model_info = response.json().get("model_info", {})
-                context_length = None
-                for key in model_info:
-                    if "context_length" in key:
-                        context_length = model_info[key]
-                        break
-                if context_length is not None:
-                    self.context_window = context_length
+                if cached.get("context_window"):
+                    self.context_window = cached["context_window"]
+                else:
+                    response = http_pool.post(
+                        f"{api_base}/api/show", json={"name": model_name}
+                    )
+                    model_info = response.json().get("model_info", {})
+                    context_length = None
+                    for key in model_info:
+                        if "context_length" in key:
+                            context_length = model_info[key]
+                            break
+                    if context_length is not None:
+                        self.context_window = context_length
+                        self.model_cache.update(
+                            self.model, self.api_base, context_window=context_length
+                        )
             if self.max_tokens == None:
                 if self.context_window != None:
                     self.max_tokens = int(self.context_window * 0.2)
 
-            # Send a ping, which will actually load the model
-            model_name = model_name.replace(":latest", "")
-            print(f"Loading {model_name}...\n")
+            # Send a ping, which will actually load the model (unless Ollama should still have it loaded)
+            if not self.model_cache.recently_warmed_up(self.model, self.api_base):
+                model_name = model_name.replace(":latest", "")
+                print(f"Loading {model_name}...\n")
 
-            old_max_tokens = self.max_tokens
-            self.max_tokens = 1
-            self.interpreter.computer.ai.chat("ping")
-            self.max_tokens = old_max_tokens
+                old_max_tokens = self.max_tokens
+                self.max_tokens = 1
+                self.interpreter.computer.ai.chat("ping")
+                self.max_tokens = old_max_tokens
+
+                self.model_cache.update(
+                    self.model, self.api_base, warmed_up_at=time.time()
+                )
 
-            self.interpreter.display_message("*Model loaded.*\n")
+                self.interpreter.display_message("*Model loaded.*\n")
 
         # Validate LLM should be moved here!!
 
         if self.context_window == None:
-            try:
-                model_info = litellm.get_model_info(model=self.model)
-                self.context_window = model_info["max_input_tokens"]
+            if cached.get("context_window"):
+                self.context_window = cached["context_window"]
                 if self.max_tokens == None:
-                    self.max_tokens = min(
+                    self.max_tokens = cached.get("max_tokens")
+            else:
+                try:
+                    model_info = litellm.get_model_info(model=self.model)
+                    self.context_window = model_info["max_input_tokens"]
+                    max_tokens = min(
                         int(self.context_window * 0.2), model_info["max_output_tokens"]
                     )
-            except:
-                pass
+                    if self.max_tokens == None:
+                        self.max_tokens = max_tokens
+                    self.model_cache.update(
+                        self.model,
+                        self.api_base,
+                        context_window=self.context_window,
+                        max_tokens=max_tokens,
+                    )
+                except:
+                    pass
 
+    @property
+    def context_tokens(self):
+        """
+        Tokens in the (trimmed) context sent with the last request.
+        """
+        return self.token_ledger.total_tokens
+
+    @property
+    def embedding_model(self):
+        return get_embedding_service(self.embedding_model_name)
 
     def embed(self, text):
-        return self.embedding_model.encode(text).tolist()
+        return self.embedding_model.embed(text)
 
     def extract_memories(self, text):
         # Use the LLM to extract key facts from the text.
@@ -431,8 +504,8 @@ Extracted Memories:"""
         
         # Create a temporary message list for the LLM call
         messages = [
-            {"role": "system", "content": "You are a helpful assistant that extracts key information from conversations."},
-            {"role": "user", "content": prompt}
+            {"role": "system", "type": "message", "content": "You are a helpful assistant that extracts key information from conversations."},
+            {"role": "user", "type": "message", "content": prompt}
         ]
 
         # Make the LLM call
@@ -450,8 +523,8 @@ Extracted Memories:"""
 def fixed_litellm_completions(**params):
 
     """
-    Just uses a dummy API key, since we use litellm without an API key sometimes.
-    Hopefully they will fix this!
+    A single litellm completion, with a few fixes for particular models.
+    (`llm.router` retries it, and falls back to other models.)
     """
 
     if "local" in params.get("model"):
@@ -467,35 +540,10 @@ def fixed_litellm_completions(**params):
 
     params["model"] = params["model"].replace(":latest", "")
 
-    # Run completion
-    attempts = 4
-    first_error = None
-
+    # Retries, timeouts and fallbacks are up to `llm.router`
     params["num_retries"] = 0
 
-    for attempt in range(attempts):
-        try:
-            yield from litellm.completion(**params)
-            return  # If the completion is successful, exit the function
-        except KeyboardInterrupt:
-            print("Exiting...")
-            sys.exit(0)
-        except Exception as e:
-            if attempt == 0:
-                # Store the first error
-                first_error = e
-            if (
-                isinstance(e, litellm.exceptions.AuthenticationError)
-                and "api_key" not in params
-            ):
-                print(
-                    "LiteLLM requires an API key. Trying again with a dummy API key. In the future, if this fixes it, please set a dummy API key to prevent this message. (e.g `interpreter --api_key x` or `self.api_key = 'x'`)"
-                )
-                # So, let's try one more time with a dummy API key:
-                params["api_key"] = "x"
-            if attempt == 1:
-                # Try turning up the temperature?
-                params["temperature"] = params.get("temperature", 0.0) + 0.1
-
-    if first_error is not None:
-        raise first_error  # If all attempts fail, raise the first error
+    # Reuse keep-alive connections across requests instead of letting litellm build new ones
+    http_pool.use_for_litellm()
+
+    yield from litellm.completion(**params)
@@ -17,7 +17,9 @@ def run_text_llm(llm, params):
     accumulated_block = ""
     language = None
 
-    for chunk in llm.completions(**params):
+    for chunk in llm.response_cache.completions(
+        llm.router.route(llm.completions), **params
+    ):
         if llm.interpreter.verbose:
             print("Chunk in coding_llm", chunk)
 
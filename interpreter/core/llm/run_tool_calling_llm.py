@@ -2,7 +2,7 @@ import os
 import re
 
 from .utils.merge_deltas import merge_deltas
-from .utils.parse_partial_json import parse_partial_json
+from .utils.streaming_json_parser import StreamingJsonParser
 
 tool_schema = {
     "type": "function",
@@ -168,6 +168,7 @@ def run_tool_calling_llm(llm, request_params):
     ## Convert output to LMC format
 
     accumulated_deltas = {}
+    arguments_parser = StreamingJsonParser()
     language = None
     code = ""
     function_call_detected = False
@@ -175,7 +176,9 @@ def run_tool_calling_llm(llm, request_params):
     review_category = None
     buffer = ""
 
-    for chunk in llm.completions(**request_params):
+    for chunk in llm.response_cache.completions(
+        llm.router.route(llm.completions), **request_params
+    ):
         if "choices" not in chunk or len(chunk["choices"]) == 0:
             # This happens sometimes
             continue
@@ -270,40 +273,33 @@ def run_tool_calling_llm(llm, request_params):
                     "content": code_delta,
                 }
 
-        if (
-            accumulated_deltas.get("function_call")
-            and "arguments" in accumulated_deltas["function_call"]
-            and accumulated_deltas["function_call"]["arguments"]
-        ):
-            if "arguments" in accumulated_deltas["function_call"]:
-                arguments = accumulated_deltas["function_call"]["arguments"]
-                arguments = parse_partial_json(arguments)
-
-                if arguments:
-                    if (
-                        language is None
-                        and "language" in arguments
-                        and "code"
-                        in arguments  # <- This ensures we're *finished* typing language, as opposed to partially done
-                        and arguments["language"]
-                    ):
-                        language = arguments["language"]
-
-                    if language is not None and "code" in arguments:
-                        # Calculate the delta (new characters only)
-                        code_delta = arguments["code"][len(code) :]
-                        # Update the code
-                        code = arguments["code"]
-                        # Yield the delta
-                        if code_delta:
-                            yield {
-                                "type": "code",
-                                "format": language,
-                                "content": code_delta,
-                            }
-                else:
-                    if llm.interpreter.verbose:
-                        print("Arguments not a dict.")
+        if "function_call" in delta and delta["function_call"]:
+            # Only parse the new part of the arguments, not everything streamed so far
+            new_code = arguments_parser.feed(
+                dict(delta["function_call"]).get("arguments") or ""
+            ).get("code", "")
+
+            if (
+                language is None
+                and "language" in arguments_parser.complete_keys
+                and "code"
+                in arguments_parser  # <- This ensures we're *finished* typing language, as opposed to partially done
+                and arguments_parser.get("language")
+            ):
+                language = arguments_parser.get("language")
+                # Anything typed before we knew the language hasn't been sent yet
+                new_code = arguments_parser.get("code")
+
+            if language is not None and new_code:
+                code += new_code
+                yield {
+                    "type": "code",
+                    "format": language,
+                    "content": new_code,
+                }
+
+            if arguments_parser.failed and llm.interpreter.verbose:
+                print("Arguments not a dict.")
 
     if os.getenv("INTERPRETER_REQUIRE_AUTHENTICATION", "False").lower() == "true":
         print("function_call_detected", function_call_detected)
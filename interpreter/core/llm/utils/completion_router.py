@@ -0,0 +1,293 @@
+import queue
+import random
+import sys
+import threading
+import time
+
+import litellm
+
+# Errors that will fail the same way again, so we move on to the next fallback instead of retrying
+NON_RETRYABLE_ERRORS = (
+    litellm.exceptions.BadRequestError,  # Includes context window and content policy errors
+    litellm.exceptions.AuthenticationError,
+    litellm.exceptions.PermissionDeniedError,
+    litellm.exceptions.NotFoundError,
+)
+
+# Params that belong to a model's endpoint, so a fallback model doesn't inherit them
+ENDPOINT_PARAMS = ("model", "api_base", "api_key", "api_version")
+
+
+class CompletionTimeout(TimeoutError):
+    pass
+
+
+class _Attempt:
+    """
+    One streamed request, read on a background thread so the router can stop waiting for it.
+    Everything it receives is put on the router's event queue as (attempt, kind, payload).
+    """
+
+    def __init__(self, completions, params, route, retries, events):
+        self.params = params
+        self.route = route  # Index into the fallback chain
+        self.retries = retries
+        self.started_at = time.monotonic()
+        self.cancelled = threading.Event()
+        self._completions = completions
+        self._events = events
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        stream = None
+        try:
+            stream = self._completions(**self.params)
+            for chunk in stream:
+                if self.cancelled.is_set():
+                    break
+                self._events.put((self, "chunk", chunk))
+            else:
+                self._events.put((self, "done", None))
+        except BaseException as e:
+            self._events.put((self, "error", e))
+        finally:
+            if self.cancelled.is_set():
+                # Closes the provider's connection, if the stream supports it
+                close = getattr(stream, "close", None)
+                if close is not None:
+                    try:
+                        close()
+                    except Exception:
+                        pass
+
+    def cancel(self):
+        self.cancelled.set()
+
+
+class CompletionRouter:
+    """
+    Sends a streamed completion through an ordered chain of models, with retries, timeouts and hedging.
+
+    Settings (all optional, and configurable per profile under `llm.router`):
+        fallbacks            Models to try, in order, after the main one fails. Each is a model name,
+                             or a dict like {"model": ..., "api_base": ..., "api_key": ...}.
+        max_retries          Retries per model, with exponential backoff and full jitter.
+        backoff              Base delay in seconds. Retry n waits up to `backoff * 2**n` (capped at `max_backoff`).
+        deadline             Seconds the whole request may take, across every attempt and the stream itself.
+        first_token_timeout  Seconds an attempt may go without streaming anything before we give up on it.
+        hedge_after          Seconds without a first token before the next model in the chain is started
+                             alongside the current one. Whichever streams first is used, the other is cancelled.
+
+    Once a chunk has been yielded, the stream is never retried (that would repeat output), so errors after
+    that point are raised.
+    """
+
+    def __init__(
+        self,
+        fallbacks=None,
+        max_retries=3,
+        backoff=0.5,
+        max_backoff=8.0,
+        deadline=None,
+        first_token_timeout=None,
+        hedge_after=None,
+    ):
+        self.fallbacks = fallbacks or []
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.deadline = deadline
+        self.first_token_timeout = first_token_timeout
+        self.hedge_after = hedge_after
+
+    def routes(self, params):
+        """
+        The params for each model in the chain, main model first.
+        """
+        routes = [params]
+        for fallback in self.fallbacks:
+            if isinstance(fallback, str):
+                fallback = {"model": fallback}
+            route = {
+                name: value
+                for name, value in params.items()
+                if name not in ENDPOINT_PARAMS
+            }
+            route.update(fallback)
+            routes.append(route)
+        return routes
+
+    def backoff_delay(self, retries):
+        return random.uniform(0, min(self.max_backoff, self.backoff * 2**retries))
+
+    def route(self, completions):
+        """
+        Wraps a completions function (like `llm.completions`) so every call goes through the router.
+        """
+
+        def routed_completions(**params):
+            return self.completions(completions, **params)
+
+        return routed_completions
+
+    def completions(self, completions, **params):
+        started_at = time.monotonic()
+        deadline = started_at + self.deadline if self.deadline else None
+
+        routes = self.routes(params)
+        next_route = 0  # The next fallback that hasn't been started yet
+        events = queue.Queue()
+        active = []  # Attempts that haven't streamed anything yet
+        scheduled = (
+            []
+        )  # (start time, route, retries, params) for retries waiting out their backoff
+        errors = []
+        winner = None
+
+        def start(route, retries, route_params):
+            active.append(_Attempt(completions, route_params, route, retries, events))
+
+        def start_next_route():
+            nonlocal next_route
+            if next_route < len(routes):
+                start(next_route, 0, routes[next_route])
+                next_route += 1
+                return True
+            return False
+
+        def failed(attempt, error):
+            errors.append(error)
+            if attempt in active:
+                active.remove(attempt)
+            now = time.monotonic()
+
+            if (
+                isinstance(error, litellm.exceptions.AuthenticationError)
+                and "api_key" not in attempt.params
+            ):
+                print(
+                    "LiteLLM requires an API key. Trying again with a dummy API key. In the future, if this fixes it, please set a dummy API key to prevent this message. (e.g `interpreter --api_key x` or `self.api_key = 'x'`)"
+                )
+                # So, let's try one more time with a dummy API key:
+                params_with_key = {**attempt.params, "api_key": "x"}
+                scheduled.append((now, attempt.route, attempt.retries, params_with_key))
+                return
+
+            if (
+                not isinstance(error, NON_RETRYABLE_ERRORS)
+                and attempt.retries < self.max_retries
+            ):
+                start_at = now + self.backoff_delay(attempt.retries)
+                if deadline is None or start_at < deadline:
+                    scheduled.append(
+                        (start_at, attempt.route, attempt.retries + 1, attempt.params)
+                    )
+                    return
+
+            # This model is out of retries
+            if not active and not scheduled:
+                start_next_route()
+
+        def cancel_all():
+            for attempt in active:
+                attempt.cancel()
+            active.clear()
+            scheduled.clear()
+
+        start_next_route()
+        hedge_at = started_at + self.hedge_after if self.hedge_after else None
+
+        try:
+            # Wait for the first chunk from any attempt
+            while winner is None:
+                if not active and not scheduled:
+                    raise errors[0]  # Every model failed, raise the first error
+
+                now = time.monotonic()
+                if deadline is not None and now >= deadline:
+                    raise CompletionTimeout(
+                        f"No response from {params.get('model')} within {self.deadline} seconds."
+                        + (f" Last error: {errors[-1]}" if errors else "")
+                    )
+
+                for attempt in list(active):
+                    if (
+                        self.first_token_timeout
+                        and now - attempt.started_at >= self.first_token_timeout
+                    ):
+                        attempt.cancel()
+                        failed(
+                            attempt,
+                            CompletionTimeout(
+                                f"{attempt.params.get('model')} didn't start responding within {self.first_token_timeout} seconds."
+                            ),
+                        )
+
+                for item in sorted(scheduled, key=lambda item: item[0]):
+                    if item[0] <= now:
+                        scheduled.remove(item)
+                        start(*item[1:])
+
+                if hedge_at is not None and now >= hedge_at:
+                    if active and start_next_route():
+                        hedge_at = now + self.hedge_after
+                    else:
+                        hedge_at = None
+
+                # Sleep until something arrives, or the next timer is due
+                timers = [deadline, hedge_at]
+                timers += [item[0] for item in scheduled]
+                if self.first_token_timeout:
+                    timers += [
+                        attempt.started_at + self.first_token_timeout
+                        for attempt in active
+                    ]
+                timers = [timer for timer in timers if timer is not None]
+                timeout = max(0, min(timers) - now) if timers else None
+
+                try:
+                    attempt, kind, payload = events.get(timeout=timeout)
+                except queue.Empty:
+                    continue
+
+                if attempt.cancelled.is_set() or attempt not in active:
+                    continue  # A loser, or an attempt we already gave up on
+
+                if kind == "error":
+                    failed(attempt, payload)
+                    continue
+
+                winner = attempt
+                active.remove(winner)
+                cancel_all()
+                if kind == "done":
+                    return  # An empty stream
+                yield payload
+
+            # Stream the winner
+            while True:
+                timeout = None
+                if deadline is not None:
+                    timeout = max(0, deadline - time.monotonic())
+                try:
+                    attempt, kind, payload = events.get(timeout=timeout)
+                except queue.Empty:
+                    raise CompletionTimeout(
+                        f"{winner.params.get('model')} didn't finish responding within {self.deadline} seconds."
+                    )
+                if attempt is not winner:
+                    continue
+                if kind == "done":
+                    return
+                if kind == "error":
+                    raise payload
+                yield payload
+
+        except KeyboardInterrupt:
+            print("Exiting...")
+            sys.exit(0)
+        finally:
+            cancel_all()
+            if winner is not None:
+                winner.cancel()
@@ -1,9 +1,15 @@
-import base64
-import io
 import json
-import sys
+import os
+import threading
+from collections import OrderedDict
 
-from PIL import Image
+from .image_encoder import image_data_url
+
+# Data URLs of `format: "path"` images, keyed by the file's path and stat and the encoding settings,
+# so an image that stays in the conversation isn't read from disk again on every turn
+PATH_IMAGE_CACHE_SIZE = 64
+_path_image_cache = OrderedDict()
+_path_image_cache_lock = threading.Lock()
 
 
 def convert_to_openai_messages(
@@ -12,6 +18,7 @@ def convert_to_openai_messages(
     vision=False,
     shrink_images=True,
     interpreter=None,
+    image_format=None,
 ):
     """
     Converts LMC messages into OpenAI messages
@@ -31,226 +38,41 @@ def convert_to_openai_messages(
 
     #     messages = [message for message in messages if message.get("type") != "code"]
 
-    for message in messages:
+    last_user_index = None
+    for i, message in enumerate(messages):
+        if message["role"] == "user":
+            last_user_index = i
+
+    for i, message in enumerate(messages):
         # Is this for thine eyes?
         if "recipient" in message and message["recipient"] != "assistant":
             continue
 
-        new_message = {}
-
-        if message["type"] == "message":
-            new_message["role"] = message[
-                "role"
-            ]  # This should never be `computer`, right?
-
-            if message["role"] == "user" and (
-                message == [m for m in messages if m["role"] == "user"][-1]
-                or interpreter.always_apply_user_message_template
-            ):
-                # Only add the template for the last message?
-                new_message["content"] = interpreter.user_message_template.replace(
-                    "{content}", message["content"]
-                )
-            else:
-                new_message["content"] = message["content"]
-
-        elif message["type"] == "code":
-            new_message["role"] = "assistant"
-            if function_calling:
-                new_message["function_call"] = {
-                    "name": "execute",
-                    "arguments": json.dumps(
-                        {"language": message["format"], "code": message["content"]}
-                    ),
-                    # parsed_arguments isn't actually an OpenAI thing, it's an OI thing.
-                    # but it's soo useful!
-                    # "parsed_arguments": {
-                    #     "language": message["format"],
-                    #     "code": message["content"],
-                    # },
-                }
-                # Add empty content to avoid error "openai.error.InvalidRequestError: 'content' is a required property - 'messages.*'"
-                # especially for the OpenAI service hosted on Azure
-                new_message["content"] = ""
-            else:
-                new_message[
-                    "content"
-                ] = f"""```{message["format"]}\n{message["content"]}\n```"""
-
-        elif message["type"] == "console" and message["format"] == "output":
-            if function_calling:
-                new_message["role"] = "function"
-                new_message["name"] = "execute"
-                if "content" not in message:
-                    print("What is this??", content)
-                if type(message["content"]) != str:
-                    if interpreter.debug:
-                        print("\n\n\nStrange chunk found:", message, "\n\n\n")
-                    message["content"] = str(message["content"])
-                if message["content"].strip() == "":
-                    new_message[
-                        "content"
-                    ] = "No output"  # I think it's best to be explicit, but we should test this.
-                else:
-                    new_message["content"] = message["content"]
-
-            else:
-                # This should be experimented with.
-                if interpreter.code_output_sender == "user":
-                    if message["content"].strip() == "":
-                        content = interpreter.empty_code_output_template
-                    else:
-                        content = interpreter.code_output_template.replace(
-                            "{content}", message["content"]
-                        )
-
-                    new_message["role"] = "user"
-                    new_message["content"] = content
-                elif interpreter.code_output_sender == "assistant":
-                    new_message["role"] = "assistant"
-                    new_message["content"] = (
-                        "\n```output\n" + message["content"] + "\n```"
-                    )
-
-        elif message["type"] == "image":
-            if message.get("format") == "description":
-                new_message["role"] = message["role"]
-                new_message["content"] = message["content"]
-            else:
-                if vision == False:
-                    # If no vision, we only support the format of "description"
-                    continue
-
-                if "base64" in message["format"]:
-                    # Extract the extension from the format, default to 'png' if not specified
-                    if "." in message["format"]:
-                        extension = message["format"].split(".")[-1]
-                    else:
-                        extension = "png"
-
-                    encoded_string = message["content"]
-
-                elif message["format"] == "path":
-                    # Convert to base64
-                    image_path = message["content"]
-                    extension = image_path.split(".")[-1]
-
-                    with open(image_path, "rb") as image_file:
-                        encoded_string = base64.b64encode(image_file.read()).decode(
-                            "utf-8"
-                        )
-
-                else:
-                    # Probably would be better to move this to a validation pass
-                    # Near core, through the whole messages object
-                    if "format" not in message:
-                        raise Exception("Format of the image is not specified.")
-                    else:
-                        raise Exception(
-                            f"Unrecognized image format: {message['format']}"
-                        )
-
-                content = f"data:image/{extension};base64,{encoded_string}"
-
-                if shrink_images:
-                    # Shrink to less than 5mb
-
-                    # Calculate size
-                    content_size_bytes = sys.getsizeof(str(content))
-
-                    # Convert the size to MB
-                    content_size_mb = content_size_bytes / (1024 * 1024)
-
-                    # If the content size is greater than 5 MB, resize the image
-                    if content_size_mb > 5:
-                        # Decode the base64 image
-                        img_data = base64.b64decode(encoded_string)
-                        img = Image.open(io.BytesIO(img_data))
-
-                        # Run in a loop to make SURE it's less than 5mb
-                        for _ in range(10):
-                            # Calculate the scale factor needed to reduce the image size to 4.9 MB
-                            scale_factor = (4.9 / content_size_mb) ** 0.5
-
-                            # Calculate the new dimensions
-                            new_width = int(img.width * scale_factor)
-                            new_height = int(img.height * scale_factor)
-
-                            # Resize the image
-                            img = img.resize((new_width, new_height))
-
-                            # Convert the image back to base64
-                            buffered = io.BytesIO()
-                            img.save(buffered, format=extension)
-                            encoded_string = base64.b64encode(
-                                buffered.getvalue()
-                            ).decode("utf-8")
-
-                            # Set the content
-                            content = f"data:image/{extension};base64,{encoded_string}"
-
-                            # Recalculate the size of the content in bytes
-                            content_size_bytes = sys.getsizeof(str(content))
-
-                            # Convert the size to MB
-                            content_size_mb = content_size_bytes / (1024 * 1024)
-
-                            if content_size_mb < 5:
-                                break
-                        else:
-                            print(
-                                "Attempted to shrink the image but failed. Sending to the LLM anyway."
-                            )
-
-                new_message = {
-                    "role": "user",
-                    "content": [
-                        {
-                            "type": "image_url",
-                            "image_url": {"url": content, "detail": "low"},
-                        }
-                    ],
-                }
-
-                if message["role"] == "computer":
-                    new_message["content"].append(
-                        {
-                            "type": "text",
-                            "text": "This image is the result of the last tool output. What does it mean / are we done?",
-                        }
-                    )
-                if message.get("format") == "path":
-                    if any(
-                        content.get("type") == "text"
-                        for content in new_message["content"]
-                    ):
-                        for content in new_message["content"]:
-                            if content.get("type") == "text":
-                                content["text"] += (
-                                    "\nThis image is at this path: "
-                                    + message["content"]
-                                )
-                    else:
-                        new_message["content"].append(
-                            {
-                                "type": "text",
-                                "text": "This image is at this path: "
-                                + message["content"],
-                            }
-                        )
-
-        elif message["type"] == "file":
-            new_message = {"role": "user", "content": message["content"]}
-        elif message["type"] == "error":
+        if message["type"] == "error":
             print("Ignoring 'type' == 'error' messages.")
             continue
-        else:
-            raise Exception(f"Unable to convert this message type: {message}")
 
-        if isinstance(new_message["content"], str):
-            new_message["content"] = new_message["content"].strip()
+        # Only add the template for the last message?
+        apply_user_template = (
+            message["type"] == "message"
+            and message["role"] == "user"
+            and (
+                i == last_user_index or interpreter.always_apply_user_message_template
+            )
+        )
+
+        new_message = convert_message(
+            message,
+            apply_user_template=apply_user_template,
+            function_calling=function_calling,
+            vision=vision,
+            shrink_images=shrink_images,
+            interpreter=interpreter,
+            image_format=image_format,
+        )
 
-        new_messages.append(new_message)
+        if new_message is not None:
+            new_messages.append(new_message)
 
     if function_calling == False:
         combined_messages = []
@@ -287,3 +109,217 @@ def convert_to_openai_messages(
         new_messages = combined_messages
 
     return new_messages
+
+
+def convert_message(
+    message,
+    apply_user_template=False,
+    function_calling=True,
+    vision=False,
+    shrink_images=True,
+    interpreter=None,
+    image_format=None,
+):
+    """
+    Converts a single LMC message into an OpenAI message.
+    Returns None if the message shouldn't be sent to the LLM.
+    """
+    new_message = {}
+
+    if message["type"] == "message":
+        new_message["role"] = message[
+            "role"
+        ]  # This should never be `computer`, right?
+
+        if apply_user_template:
+            # Only add the template for the last message?
+            new_message["content"] = interpreter.user_message_template.replace(
+                "{content}", message["content"]
+            )
+        else:
+            new_message["content"] = message["content"]
+
+    elif message["type"] == "code":
+        new_message["role"] = "assistant"
+        if function_calling:
+            new_message["function_call"] = {
+                "name": "execute",
+                "arguments": json.dumps(
+                    {"language": message["format"], "code": message["content"]}
+                ),
+                # parsed_arguments isn't actually an OpenAI thing, it's an OI thing.
+                # but it's soo useful!
+                # "parsed_arguments": {
+                #     "language": message["format"],
+                #     "code": message["content"],
+                # },
+            }
+            # Add empty content to avoid error "openai.error.InvalidRequestError: 'content' is a required property - 'messages.*'"
+            # especially for the OpenAI service hosted on Azure
+            new_message["content"] = ""
+        else:
+            new_message[
+                "content"
+            ] = f"""```{message["format"]}\n{message["content"]}\n```"""
+
+    elif message["type"] == "console" and message["format"] == "output":
+        if function_calling:
+            new_message["role"] = "function"
+            new_message["name"] = "execute"
+            if "content" not in message:
+                print("What is this??", content)
+            if type(message["content"]) != str:
+                if interpreter.debug:
+                    print("\n\n\nStrange chunk found:", message, "\n\n\n")
+                message["content"] = str(message["content"])
+            if message["content"].strip() == "":
+                new_message[
+                    "content"
+                ] = "No output"  # I think it's best to be explicit, but we should test this.
+            else:
+                new_message["content"] = message["content"]
+
+        else:
+            # This should be experimented with.
+            if interpreter.code_output_sender == "user":
+                if message["content"].strip() == "":
+                    content = interpreter.empty_code_output_template
+                else:
+                    content = interpreter.code_output_template.replace(
+                        "{content}", message["content"]
+                    )
+
+                new_message["role"] = "user"
+                new_message["content"] = content
+            elif interpreter.code_output_sender == "assistant":
+                new_message["role"] = "assistant"
+                new_message["content"] = (
+                    "\n```output\n" + message["content"] + "\n```"
+                )
+
+    elif message["type"] == "image":
+        if message.get("format") == "description":
+            new_message["role"] = message["role"]
+            new_message["content"] = message["content"]
+        else:
+            if vision == False:
+                # If no vision, we only support the format of "description"
+                return None
+
+            if "base64" in message["format"]:
+                # Extract the extension from the format, default to 'png' if not specified
+                if "." in message["format"]:
+                    extension = message["format"].split(".")[-1]
+                else:
+                    extension = "png"
+
+                image = message["content"]
+
+            elif message["format"] == "path":
+                image_path = message["content"]
+                extension = image_path.split(".")[-1]
+                image = None
+
+            else:
+                # Probably would be better to move this to a validation pass
+                # Near core, through the whole messages object
+                if "format" not in message:
+                    raise Exception("Format of the image is not specified.")
+                else:
+                    raise Exception(
+                        f"Unrecognized image format: {message['format']}"
+                    )
+
+            if image is None:
+                content = _path_image_data_url(
+                    image_path, extension, shrink_images, image_format
+                )
+            else:
+                # Shrunk to less than 5mb (if shrink_images), and cached by content
+                content = image_data_url(
+                    image, extension, shrink=shrink_images, image_format=image_format
+                )
+
+            new_message = {
+                "role": "user",
+                "content": [
+                    {
+                        "type": "image_url",
+                        "image_url": {"url": content, "detail": "low"},
+                    }
+                ],
+            }
+
+            if message["role"] == "computer":
+                new_message["content"].append(
+                    {
+                        "type": "text",
+                        "text": "This image is the result of the last tool output. What does it mean / are we done?",
+                    }
+                )
+            if message.get("format") == "path":
+                if any(
+                    content.get("type") == "text"
+                    for content in new_message["content"]
+                ):
+                    for content in new_message["content"]:
+                        if content.get("type") == "text":
+                            content["text"] += (
+                                "\nThis image is at this path: "
+                                + message["content"]
+                            )
+                else:
+                    new_message["content"].append(
+                        {
+                            "type": "text",
+                            "text": "This image is at this path: "
+                            + message["content"],
+                        }
+                    )
+
+    elif message["type"] == "file":
+        new_message = {"role": "user", "content": message["content"]}
+    else:
+        raise Exception(f"Unable to convert this message type: {message}")
+
+    if isinstance(new_message["content"], str):
+        new_message["content"] = new_message["content"].strip()
+
+    return new_message
+
+
+def _path_image_data_url(image_path, extension, shrink_images, image_format):
+    """
+    Like image_data_url(), but only re-reads the file if it changed on disk.
+    """
+    stat = os.stat(image_path)
+    key = (
+        image_path,
+        stat.st_mtime_ns,
+        stat.st_size,
+        extension,
+        shrink_images,
+        image_format,
+    )
+    with _path_image_cache_lock:
+        if key in _path_image_cache:
+            _path_image_cache.move_to_end(key)
+            return _path_image_cache[key]
+
+    with open(image_path, "rb") as image_file:
+        image = image_file.read()
+    content = image_data_url(
+        image, extension, shrink=shrink_images, image_format=image_format
+    )
+
+    with _path_image_cache_lock:
+        _path_image_cache[key] = content
+        while len(_path_image_cache) > PATH_IMAGE_CACHE_SIZE:
+            _path_image_cache.popitem(last=False)
+
+    return content
+
+
+def clear_path_image_cache():
+    with _path_image_cache_lock:
+        _path_image_cache.clear()
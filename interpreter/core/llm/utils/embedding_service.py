@@ -0,0 +1,147 @@
+import hashlib
+import threading
+from collections import OrderedDict
+
+DEFAULT_EMBEDDING_MODEL = "all-MiniLM-L6-v2"
+
+_services = {}
+_services_lock = threading.Lock()
+
+
+def get_embedding_service(model_name=DEFAULT_EMBEDDING_MODEL):
+    """
+    Returns the process-wide EmbeddingService for `model_name`, so every interpreter
+    (and the GUI's RAGManager) shares one copy of the model.
+    """
+    with _services_lock:
+        if model_name not in _services:
+            _services[model_name] = EmbeddingService(model_name)
+        return _services[model_name]
+
+
+class _EmbeddingRequest:
+    def __init__(self, texts):
+        self.texts = texts
+        self.vectors = None
+        self.error = None
+        self.done = threading.Event()
+
+
+class EmbeddingService:
+    """
+    A lazily loaded SentenceTransformer with an LRU cache of embeddings (keyed by a hash of the text).
+
+    Concurrent calls are batched: whichever caller finds the model idle encodes everything that's waiting
+    in a single `encode()` call, and everyone else just waits for their results.
+    """
+
+    def __init__(self, model_name=DEFAULT_EMBEDDING_MODEL, cache_size=4096):
+        self.model_name = model_name
+        self.cache_size = cache_size
+
+        self._model = None
+        self._model_lock = threading.Lock()
+
+        self._cache = OrderedDict()  # sha256(text) -> vector
+        self._cache_lock = threading.Lock()
+
+        self._pending = []
+        self._pending_lock = threading.Lock()
+        self._batch_running = False
+
+    @property
+    def model(self):
+        if self._model is None:
+            with self._model_lock:
+                if self._model is None:
+                    from sentence_transformers import SentenceTransformer
+
+                    self._model = SentenceTransformer(self.model_name)
+        return self._model
+
+    def embed(self, text):
+        """
+        Like SentenceTransformer.encode(text).tolist(). Accepts a string or a list of strings.
+        """
+        return self.encode(text).tolist()
+
+    def encode(self, texts):
+        """
+        Drop-in for SentenceTransformer.encode(). Returns a numpy array.
+        """
+        import numpy as np
+
+        if isinstance(texts, str):
+            return self.encode([texts])[0]
+
+        texts = list(texts)
+        keys = [self._key(text) for text in texts]
+
+        vectors = {}
+        with self._cache_lock:
+            for key in keys:
+                if key in self._cache:
+                    self._cache.move_to_end(key)
+                    vectors[key] = self._cache[key]
+
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in vectors:
+                missing[key] = text
+
+        if missing:
+            vectors.update(zip(missing, self._encode_batched(list(missing.values()))))
+
+        return np.array([vectors[key] for key in keys])
+
+    def _key(self, text):
+        return hashlib.sha256(text.encode("utf-8", errors="replace")).hexdigest()
+
+    def _encode_batched(self, texts):
+        request = _EmbeddingRequest(texts)
+
+        with self._pending_lock:
+            self._pending.append(request)
+            leader = not self._batch_running
+            if leader:
+                self._batch_running = True
+
+        if leader:
+            # Keep encoding until nobody is waiting, so requests that arrive mid-encode get picked up
+            while True:
+                with self._pending_lock:
+                    batch, self._pending = self._pending, []
+                    if not batch:
+                        self._batch_running = False
+                        break
+                self._run_batch(batch)
+
+        request.done.wait()
+        if request.error is not None:
+            raise request.error
+        return request.vectors
+
+    def _run_batch(self, batch):
+        texts = []
+        for request in batch:
+            texts.extend(request.texts)
+
+        try:
+            encoded = self.model.encode(texts)
+        except Exception as e:
+            for request in batch:
+                request.error = e
+                request.done.set()
+            return
+
+        with self._cache_lock:
+            for text, vector in zip(texts, encoded):
+                self._cache[self._key(text)] = vector
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+        i = 0
+        for request in batch:
+            request.vectors = list(encoded[i : i + len(request.texts)])
+            i += len(request.texts)
+            request.done.set()
@@ -0,0 +1,125 @@
+import base64
+import hashlib
+import io
+import threading
+from collections import OrderedDict
+
+from PIL import Image
+
+# Providers reject data URLs much bigger than this
+MAX_IMAGE_BYTES = 5 * 1024 * 1024
+
+# Data URLs, keyed by a hash of the image and the settings used to encode it
+IMAGE_CACHE_SIZE = 64
+_image_cache = OrderedDict()
+_image_cache_lock = threading.Lock()
+
+# Formats images can be re-encoded to, and what PIL calls them
+IMAGE_FORMATS = {"png": "PNG", "jpeg": "JPEG", "jpg": "JPEG", "webp": "WEBP"}
+
+
+def image_data_url(
+    image, extension="png", shrink=True, image_format=None, max_bytes=MAX_IMAGE_BYTES
+):
+    """
+    Returns a data URL for an image, given as base64 text or raw bytes.
+
+    With `image_format` ("jpeg" or "webp"), the image is re-encoded in that format, which makes
+    screenshots much smaller than PNG. With `shrink`, it's scaled down to fit in `max_bytes`.
+    Results are cached by the image's content, so an image that stays in the conversation is
+    only processed once.
+    """
+    if isinstance(image, str):
+        encoded_string, raw = image, None
+        digest = hashlib.blake2b(image.encode("ascii"), digest_size=16).digest()
+    else:
+        encoded_string, raw = None, image
+        digest = hashlib.blake2b(image, digest_size=16).digest()
+
+    if image_format is not None:
+        image_format = image_format.lower()
+        if image_format not in IMAGE_FORMATS:
+            raise ValueError(
+                f"Unsupported image format: {image_format}. Use one of {', '.join(IMAGE_FORMATS)}."
+            )
+        if IMAGE_FORMATS[image_format] == IMAGE_FORMATS.get(extension.lower()):
+            image_format = None  # It's already in that format
+        elif image_format == "jpg":
+            image_format = "jpeg"
+
+    key = (digest, extension, shrink, image_format, max_bytes)
+    with _image_cache_lock:
+        if key in _image_cache:
+            _image_cache.move_to_end(key)
+            return _image_cache[key]
+
+    if encoded_string is None:
+        encoded_string = base64.b64encode(raw).decode("utf-8")
+    content = f"data:image/{extension};base64,{encoded_string}"
+
+    if image_format is not None or (shrink and len(content) > max_bytes):
+        content = _reencode(
+            raw if raw is not None else base64.b64decode(encoded_string),
+            image_format or extension,
+            max_bytes if shrink else None,
+            content=None if image_format else content,
+        )
+
+    with _image_cache_lock:
+        _image_cache[key] = content
+        while len(_image_cache) > IMAGE_CACHE_SIZE:
+            _image_cache.popitem(last=False)
+
+    return content
+
+
+def clear_image_cache():
+    with _image_cache_lock:
+        _image_cache.clear()
+
+
+def _encode(image, extension):
+    pil_format = IMAGE_FORMATS.get(extension.lower(), extension.upper())
+    if pil_format == "JPEG" and image.mode not in ("RGB", "L"):
+        image = image.convert("RGB")  # JPEG has no alpha channel
+
+    buffered = io.BytesIO()
+    if pil_format in ("JPEG", "WEBP"):
+        image.save(buffered, format=pil_format, quality=85)
+    else:
+        image.save(buffered, format=pil_format)
+    encoded_string = base64.b64encode(buffered.getvalue()).decode("utf-8")
+    return f"data:image/{extension};base64,{encoded_string}"
+
+
+def _reencode(data, extension, max_bytes, content=None):
+    """
+    Encodes the image as `extension` (unless `content` is its current data URL, already in that format),
+    scaled down to fit in `max_bytes` if that's set.
+    The scale comes from the byte budget, so this is usually a single resize.
+    """
+    original = Image.open(io.BytesIO(data))
+    original.load()
+
+    if content is None:
+        content = _encode(original, extension)
+
+    if max_bytes is None:
+        return content
+
+    scale = 1.0
+    # Encoded size is roughly proportional to the number of pixels, so one pass almost always
+    # does it. The extra attempts are for images that compress unusually well at full size.
+    for _ in range(3):
+        if len(content) <= max_bytes:
+            return content
+        scale *= (0.9 * max_bytes / len(content)) ** 0.5
+        size = (
+            max(1, int(original.width * scale)),
+            max(1, int(original.height * scale)),
+        )
+        content = _encode(original.resize(size, Image.LANCZOS), extension)
+
+    if len(content) > max_bytes:
+        print("Attempted to shrink the image but failed. Sending to the LLM anyway.")
+    return content
@@ -0,0 +1,91 @@
+import json
+import os
+import threading
+import time
+
+from ....terminal_interface.utils.oi_dir import oi_dir
+
+
+class ModelCache:
+    """
+    Remembers what we learned about a (model, api_base) pair across processes: whether it supports
+    functions and vision, its context window and max tokens, and when it was last warmed up.
+
+    Stored as JSON in the Open Interpreter config directory. Entries older than `ttl` seconds are ignored.
+    """
+
+    def __init__(self, path=None, ttl=24 * 60 * 60, warmup_ttl=5 * 60):
+        self.path = path or os.path.join(oi_dir, "model_cache.json")
+        self.ttl = ttl
+        # Ollama unloads idle models after 5 minutes, so a warm-up older than that is worth repeating
+        self.warmup_ttl = warmup_ttl
+        self._lock = threading.Lock()
+
+    def _key(self, model, api_base):
+        return f"{model}|{api_base or ''}"
+
+    def _read(self):
+        try:
+            with open(self.path, "r") as f:
+                entries = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        return entries if isinstance(entries, dict) else {}
+
+    def _entry(self, entries, model, api_base):
+        entry = entries.get(self._key(model, api_base))
+        return dict(entry) if isinstance(entry, dict) else {}
+
+    def _is_expired(self, entry):
+        return time.time() - entry.get("updated_at", 0) > self.ttl
+
+    def get(self, model, api_base=None):
+        """
+        Returns the cached info for this model (an empty dict if there's none or it has expired).
+        """
+        with self._lock:
+            entry = self._entry(self._read(), model, api_base)
+        if self._is_expired(entry):
+            return {}
+        return entry
+
+    def update(self, model, api_base=None, **info):
+        """
+        Merges `info` into this model's entry and writes the cache back to disk.
+        """
+        with self._lock:
+            entries = self._read()
+            entry = self._entry(entries, model, api_base)
+            if self._is_expired(entry):
+                # Forget stale capabilities, but a warm-up timestamp is still accurate
+                entry = {
+                    key: value for key, value in entry.items() if key == "warmed_up_at"
+                }
+            if set(info) - {"warmed_up_at"}:
+                entry["updated_at"] = time.time()
+            entry.update(info)
+            entries[self._key(model, api_base)] = entry
+
+            try:
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+                temp_path = f"{self.path}.{os.getpid()}.tmp"
+                with open(temp_path, "w") as f:
+                    json.dump(entries, f, indent=2)
+                os.replace(temp_path, self.path)
+            except OSError:
+                # Non-essential, we'll just detect everything again next time
+                pass
+
+    def recently_warmed_up(self, model, api_base=None):
+        with self._lock:
+            warmed_up_at = self._entry(self._read(), model, api_base).get(
+                "warmed_up_at"
+            )
+        return warmed_up_at is not None and time.time() - warmed_up_at < self.warmup_ttl
+
+    def clear(self):
+        with self._lock:
+            try:
+                os.remove(self.path)
+            except OSError:
+                pass
@@ -0,0 +1,147 @@
+import hashlib
+import json
+import os
+import shutil
+import time
+
+import litellm
+
+from ....terminal_interface.utils.oi_dir import oi_dir
+
+# Params that don't change what the model says, so they're left out of the cache key
+IGNORED_PARAMS = {
+    "api_key",
+    "api_base",
+    "api_version",
+    "conversation_id",
+    "num_retries",
+    "stream",
+}
+
+MODES = (None, "cache", "record", "replay")
+
+
+class ResponseCacheMiss(Exception):
+    pass
+
+
+class ResponseCache:
+    """
+    An on-disk cache of streamed completions, keyed by a hash of the request (model, messages, tools, params).
+
+    Modes:
+        None      Disabled. Every request goes to the provider.
+        "cache"   Deterministic (temperature 0) requests are served from the cache, and recorded on a miss.
+        "record"  Every request goes to the provider, and every response is recorded.
+        "replay"  Every request is served from the cache. A miss raises `ResponseCacheMiss`, so nothing
+                  ever reaches a provider (for offline benchmarks and CI).
+
+    Chunks are stored with the delay that preceded them, so `replay_timing=True` reproduces the original stream.
+    """
+
+    def __init__(self, mode=None, path=None, replay_timing=False):
+        self.mode = mode
+        self.path = path or os.path.join(oi_dir, "llm_cache")
+        self.replay_timing = replay_timing
+
+    def key(self, params):
+        request = {
+            name: value for name, value in params.items() if name not in IGNORED_PARAMS
+        }
+        serialized = json.dumps(request, sort_keys=True, default=str)
+        return hashlib.sha256(serialized.encode("utf-8")).hexdigest()
+
+    def _file(self, key):
+        return os.path.join(self.path, key[:2], key + ".json")
+
+    def load(self, key):
+        try:
+            with open(self._file(key), "r") as f:
+                return json.load(f)["chunks"]
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def save(self, key, params, chunks):
+        file = self._file(key)
+        try:
+            os.makedirs(os.path.dirname(file), exist_ok=True)
+            temp_file = f"{file}.{os.getpid()}.tmp"
+            with open(temp_file, "w") as f:
+                json.dump(
+                    {
+                        "model": params.get("model"),
+                        "created": time.time(),
+                        "chunks": chunks,
+                    },
+                    f,
+                    default=str,
+                )
+            os.replace(temp_file, file)
+        except OSError:
+            pass
+
+    def completions(self, completions, **params):
+        """
+        Streams `completions(**params)` through the cache.
+        """
+        if self.mode not in MODES:
+            raise ValueError(
+                f"Unknown response cache mode: {self.mode}. Use one of {MODES}."
+            )
+
+        deterministic = not params.get("temperature")
+
+        if self.mode is None or (self.mode == "cache" and not deterministic):
+            yield from completions(**params)
+            return
+
+        key = self.key(params)
+
+        if self.mode in ("cache", "replay"):
+            chunks = self.load(key)
+            if chunks is not None:
+                yield from self.replay(chunks)
+                return
+            if self.mode == "replay":
+                raise ResponseCacheMiss(
+                    f"No cached response for this {params.get('model')} request (key {key}). "
+                    "Record it first with the response cache in 'record' or 'cache' mode."
+                )
+
+        # Only a stream that finishes gets saved, so an interrupted response is never replayed
+        chunks = []
+        last_chunk_time = time.monotonic()
+        for chunk in completions(**params):
+            now = time.monotonic()
+            chunks.append(
+                {"delay": now - last_chunk_time, "chunk": chunk_to_dict(chunk)}
+            )
+            last_chunk_time = now
+            yield chunk
+        self.save(key, params, chunks)
+
+    def replay(self, chunks):
+        for recorded in chunks:
+            if self.replay_timing:
+                time.sleep(recorded["delay"])
+            yield chunk_from_dict(recorded["chunk"])
+
+    def clear(self):
+        shutil.rmtree(self.path, ignore_errors=True)
+
+
+def chunk_to_dict(chunk):
+    if isinstance(chunk, dict):
+        return chunk
+    if hasattr(chunk, "model_dump"):
+        return chunk.model_dump()
+    return json.loads(chunk.json())
+
+
+def chunk_from_dict(data):
+    """
+    Rebuilds a litellm streaming chunk, so tool calls get their attribute access (`.function.name`) back.
+    """
+    if hasattr(litellm.types.utils, "ModelResponseStream"):
+        return litellm.types.utils.ModelResponseStream(**data)
+    return litellm.ModelResponse(stream=True, **data)
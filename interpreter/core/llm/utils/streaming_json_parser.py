@@ -0,0 +1,254 @@
+import json
+import re
+
+STRING_SPECIAL_CHARACTERS = re.compile(r'["\\]')
+WHITESPACE = " \t\r\n"
+
+
+class StreamingJsonParser:
+    """
+    Parses a JSON object (like a tool call's arguments) as it streams in, without re-reading what it has already seen.
+
+    String values are decoded as they arrive, so `feed()` can return just the newly decoded characters of each one.
+    Like `parse_partial_json()`, raw newlines inside strings are tolerated.
+    """
+
+    def __init__(self):
+        self.failed = False  # The input stopped looking like a JSON object
+        self.done = False  # The object's closing brace has been seen
+        self.complete_keys = []  # Keys whose values have been fully parsed, in order
+
+        self._values = (
+            {}
+        )  # key -> parsed value (None until a non-string value finishes)
+        self._string_parts = {}  # key -> decoded parts of a string value
+        self._state = "start"
+        self._key = None
+        self._string = None  # Parts of the key or string value being decoded
+        self._escape = ""  # An escape sequence that's been split across deltas
+        self._raw = []  # Text of a non-string value (number, true, nested object...)
+        self._raw_stack = []
+        self._raw_in_string = False
+        self._raw_escaped = False
+
+    def __contains__(self, key):
+        return key in self._values
+
+    def get(self, key, default=None):
+        if key not in self._values:
+            return default
+        if key in self._string_parts:
+            parts = self._string_parts[key]
+            if len(parts) > 1:
+                parts[:] = ["".join(parts)]
+            return parts[0] if parts else ""
+        return self._values[key]
+
+    @property
+    def value(self):
+        """
+        Everything parsed so far, as a dict (string values may be partial).
+        """
+        return {key: self.get(key) for key in self._values}
+
+    def feed(self, text):
+        """
+        Parses the next chunk of text. Returns {key: newly decoded text} for string values that grew.
+        """
+        new_text = {}
+        if self.failed or self.done or not text:
+            return new_text
+
+        i = 0
+        length = len(text)
+
+        while i < length:
+            state = self._state
+
+            if state in ("string", "key"):
+                i, piece, finished = self._read_string(text, i)
+                if state == "string":
+                    if piece:
+                        self._string_parts[self._key].append(piece)
+                        new_text[self._key] = new_text.get(self._key, "") + piece
+                    if finished:
+                        self.complete_keys.append(self._key)
+                        self._state = "comma_or_end"
+                else:
+                    if piece:
+                        self._string.append(piece)
+                    if finished:
+                        self._key = "".join(self._string)
+                        self._state = "colon"
+                continue
+
+            if state == "raw":
+                i = self._read_raw(text, i)
+                continue
+
+            char = text[i]
+            i += 1
+
+            if char in WHITESPACE:
+                continue
+
+            if state == "start":
+                if char != "{":
+                    self.failed = True
+                    break
+                self._state = "key_or_end"
+
+            elif state == "key_or_end":
+                if char == '"':
+                    self._string = []
+                    self._state = "key"
+                elif char == "}":
+                    self.done = True
+                    break
+                else:
+                    self.failed = True
+                    break
+
+            elif state == "colon":
+                if char != ":":
+                    self.failed = True
+                    break
+                self._state = "value"
+
+            elif state == "value":
+                if char == '"':
+                    self._values[self._key] = None
+                    self._string_parts[self._key] = []
+                    self._state = "string"
+                else:
+                    self._string_parts.pop(self._key, None)
+                    self._raw = [char]
+                    self._raw_stack = []
+                    if char in "{[":
+                        self._raw_stack.append("}" if char == "{" else "]")
+                    self._raw_in_string = False
+                    self._raw_escaped = False
+                    self._state = "raw"
+
+            elif state == "comma_or_end":
+                if char == ",":
+                    self._state = "key_or_end"
+                elif char == "}":
+                    self.done = True
+                    break
+                else:
+                    self.failed = True
+                    break
+
+        return new_text
+
+    def _read_string(self, text, i):
+        """
+        Decodes string characters starting at `i`. Returns (next index, decoded text, whether the string closed).
+        """
+        pieces = []
+        length = len(text)
+
+        while i < length:
+            if self._escape:
+                self._escape += text[i]
+                i += 1
+                while self._escape:
+                    escape_length = self._escape_length(self._escape)
+                    if escape_length is None:
+                        break
+                    pieces.append(self._decode_escape(self._escape[:escape_length]))
+                    # After a lone high surrogate we may have read into what comes next
+                    leftover = self._escape[escape_length:]
+                    if leftover.startswith("\\"):
+                        self._escape = leftover
+                    else:
+                        self._escape = ""
+                        i -= len(leftover)  # At most the character we just read
+                continue
+
+            match = STRING_SPECIAL_CHARACTERS.search(text, i)
+            if match is None:
+                pieces.append(text[i:])
+                i = length
+                break
+
+            pieces.append(text[i : match.start()])
+            i = match.end()
+            if match.group() == '"':
+                return i, "".join(pieces), True
+            self._escape = "\\"
+
+        return i, "".join(pieces), False
+
+    def _escape_length(self, escape):
+        """
+        How long this escape sequence is, or None if we need more characters to know.
+        """
+        if len(escape) < 2:
+            return None
+        if escape[1] != "u":
+            return 2
+        if len(escape) < 6:
+            return None
+        try:
+            code_point = int(escape[2:6], 16)
+        except ValueError:
+            return 6
+        if 0xD800 <= code_point <= 0xDBFF:
+            # A surrogate pair is written as two escapes, like \\ud83d\\ude00
+            if len(escape) < 7:
+                return None
+            if escape[6] != "\\":
+                return 6
+            if len(escape) < 8:
+                return None
+            if escape[7] != "u":
+                return 6
+            if len(escape) < 12:
+                return None
+            return 12
+        return 6
+
+    def _decode_escape(self, escape):
+        try:
+            return json.loads('"' + escape + '"')
+        except ValueError:
+            return escape
+
+    def _read_raw(self, text, i):
+        length = len(text)
+
+        while i < length:
+            char = text[i]
+
+            if self._raw_in_string:
+                if self._raw_escaped:
+                    self._raw_escaped = False
+                elif char == "\\":
+                    self._raw_escaped = True
+                elif char == '"':
+                    self._raw_in_string = False
+            elif char == '"':
+                self._raw_in_string = True
+            elif char in "{[":
+                self._raw_stack.append("}" if char == "{" else "]")
+            elif char in "}]" and self._raw_stack:
+                if char != self._raw_stack.pop():
+                    self.failed = True
+                    return length
+            elif char in ",}" and not self._raw_stack:
+                # The value ended. Leave the delimiter for the top level.
+                raw = "".join(self._raw).strip()
+                try:
+                    self._values[self._key] = json.loads(raw)
+                except ValueError:
+                    self._values[self._key] = raw
+                self.complete_keys.append(self._key)
+                self._state = "comma_or_end"
+                return i
+
+            self._raw.append(char)
+            i += 1
+
+        return i
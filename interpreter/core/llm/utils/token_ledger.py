@@ -0,0 +1,164 @@
+import hashlib
+import threading
+from collections import OrderedDict
+
+from tokentrim.model_map import MODEL_MAX_TOKENS
+from tokentrim.tokentrim import get_encoding, shorten_message_to_fit_limit
+
+# Models tokentrim counts with the gpt-*-0613 overheads (3 tokens per message, 1 per name)
+_0613_MODELS = {
+    "gpt-3.5-turbo-0613",
+    "gpt-3.5-turbo-16k-0613",
+    "gpt-4-0314",
+    "gpt-4-32k-0314",
+    "gpt-4-0613",
+    "gpt-4-32k-0613",
+}
+
+
+class TokenLedger:
+    """
+    A drop-in for `tokentrim.trim()` that remembers how many tokens each message costs.
+
+    Counts are cached by a hash of the message's content and the model's encoding, so on
+    every turn only the new (or changed) messages get tokenized. `total_tokens` holds the
+    size of the last trimmed request, which is what `%tokens` and the API report.
+    """
+
+    def __init__(self, cache_size=4096):
+        self.cache_size = cache_size
+        self.total_tokens = 0
+        self.max_tokens = None  # The budget the last request was trimmed to
+
+        self._counts = OrderedDict()  # (encoding, overheads, sha256(message)) -> tokens
+        self._counts_lock = threading.Lock()
+        self._counting_params = (
+            {}
+        )  # model -> (encoding, tokens_per_message, tokens_per_name)
+
+    def clear(self):
+        with self._counts_lock:
+            self._counts.clear()
+        self.total_tokens = 0
+        self.max_tokens = None
+
+    def counting_params(self, model=None):
+        """
+        Mirrors the per-model overheads `tokentrim.num_tokens_from_messages()` uses.
+        """
+        if model not in self._counting_params:
+            if model is None:
+                params = (get_encoding(None), 4, 2)
+            elif model in _0613_MODELS:
+                params = (get_encoding(model), 3, 1)
+            elif model == "gpt-3.5-turbo-0301":
+                params = (get_encoding(model), 4, -1)
+            elif "gpt-3.5-turbo" in model:
+                params = (get_encoding("gpt-3.5-turbo-0613"), 3, 1)
+            elif "gpt-4" in model:
+                params = (get_encoding("gpt-4-0613"), 3, 1)
+            else:
+                params = (get_encoding(model), 4, 2)
+            self._counting_params[model] = params
+        return self._counting_params[model]
+
+    def message_tokens(self, message, model=None):
+        """
+        Returns the tokens `message` adds to a request, without the 3-token reply primer.
+        """
+        encoding, tokens_per_message, tokens_per_name = self.counting_params(model)
+
+        digest = hashlib.sha256()
+        for key, value in message.items():
+            digest.update(str(key).encode("utf-8", errors="replace") + b"\0")
+            digest.update(str(value).encode("utf-8", errors="replace") + b"\0")
+        key = (encoding.name, tokens_per_message, tokens_per_name, digest.hexdigest())
+
+        with self._counts_lock:
+            if key in self._counts:
+                self._counts.move_to_end(key)
+                return self._counts[key]
+
+        tokens = tokens_per_message
+        for name, value in message.items():
+            tokens += len(encoding.encode(str(value), disallowed_special=()))
+            if name == "name":
+                tokens += tokens_per_name
+
+        with self._counts_lock:
+            self._counts[key] = tokens
+            while len(self._counts) > self.cache_size:
+                self._counts.popitem(last=False)
+
+        return tokens
+
+    def count(self, messages, model=None):
+        """
+        Same result as `tokentrim.num_tokens_from_messages()`.
+        """
+        return sum(self.message_tokens(message, model) for message in messages) + 3
+
+    def trim(
+        self,
+        messages,
+        system_message=None,
+        model=None,
+        max_tokens=None,
+        trim_ratio=0.75,
+    ):
+        """
+        Same behavior as `tokentrim.trim()`: keeps the newest messages that fit in `max_tokens`
+        (shortening the oldest one that doesn't, if it's not a function call) and puts the
+        system message in front. Messages passed in are never modified.
+        """
+        if max_tokens is None:
+            if model not in MODEL_MAX_TOKENS:
+                raise ValueError(f"Invalid model: {model}. Specify max_tokens instead")
+            max_tokens = int(MODEL_MAX_TOKENS[model] * trim_ratio)
+        self.max_tokens = max_tokens
+
+        if system_message:
+            system_message_event = {"role": "system", "content": system_message}
+            system_message_tokens = self.count([system_message_event], model)
+
+            if system_message_tokens > max_tokens:
+                print(
+                    "`tokentrim`: Warning, system message exceeds token limit, which is probably undesired. Trimming..."
+                )
+                shorten_message_to_fit_limit(system_message_event, max_tokens, model)
+                system_message_tokens = self.count([system_message_event], model)
+
+            # tokentrim reserves room for the system message twice; keep the same budget
+            max_tokens -= 2 * system_message_tokens
+
+        final_messages = []
+        final_messages_tokens = 3
+
+        for message in reversed(messages):
+            message_tokens = self.message_tokens(message, model)
+
+            if final_messages_tokens + message_tokens <= max_tokens:
+                final_messages.append(message)
+                final_messages_tokens += message_tokens
+                continue
+
+            if "function_call" not in message:
+                message = dict(message)
+                shorten_message_to_fit_limit(
+                    message, max_tokens - final_messages_tokens, model
+                )
+                message_tokens = self.message_tokens(message, model)
+
+            if message_tokens + 3 + final_messages_tokens <= max_tokens:
+                final_messages.append(message)
+                final_messages_tokens += message_tokens
+            break
+
+        final_messages.reverse()
+
+        if system_message:
+            final_messages = [system_message_event] + final_messages
+            final_messages_tokens += self.message_tokens(system_message_event, model)
+
+        self.total_tokens = final_messages_tokens
+        return final_messages
@@ -1,9 +1,12 @@
 import asyncio
 import json
+import logging
 import os
 import tempfile
+import threading
 import time
 import uuid
+import weakref
 from pathlib import Path
 from typing import Dict, List, Optional, Union
 
@@ -18,18 +21,26 @@ except ImportError:
     print("📝 python-dotenv not installed, using system environment variables only")
 
 from fastapi import FastAPI, HTTPException, Request, Response, UploadFile, File, Query, Depends
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from fastapi.responses import StreamingResponse, FileResponse
 from pydantic import BaseModel
 import uvicorn
 
+from ..terminal_interface.profiles.profile_registry import ProfileRegistry
 from .utils.lazy_import import lazy_import
+from .utils.session_pool import SessionPool, SessionPoolFull, session_key
+from .utils.sse_encoder import ChatCompletionStreamEncoder
+from .utils.stream_bridge import StreamBridge
+from .utils.tool_runtime import run_code, screenshot_base64
 
 # Lazy imports for dependencies
 uvicorn = lazy_import("uvicorn")
 fastapi = lazy_import("fastapi")
 
+logger = logging.getLogger(__name__)
+
 
 class ChatMessage(BaseModel):
     role: str
@@ -42,6 +53,7 @@ class ChatCompletionRequest(BaseModel):
     max_tokens: Optional[int] = None
     temperature: Optional[float] = None
     stream: bool = False
+    user: Optional[str] = None
 
 
 class ChatCompletionResponse(BaseModel):
@@ -144,6 +156,11 @@ def create_openwebui_server(interpreter, host="localhost", port=8264, auth_token
         allow_headers=["*"],
     )
     
+    # Each conversation gets its own copy of the interpreter (see SessionPool)
+    session_pool = SessionPool(interpreter)
+    app.state.session_pool = session_pool
+    app.add_event_handler("shutdown", session_pool.close)
+    
     # Security
     security = HTTPBearer(auto_error=False) if auth_token else None
     
@@ -155,53 +172,23 @@ def create_openwebui_server(interpreter, host="localhost", port=8264, auth_token
         if auth_token and (not credentials or credentials.credentials != auth_token):
             raise HTTPException(status_code=401, detail="Invalid authentication")
         return True
+
+    async def tool_runtime(http_request: Request):
+        """The conversation's own interpreter for running tool code, checked out for one call"""
+        key = session_key(http_request.headers)  # None (a one-off session) without a conversation header
+        if key is not None:
+            key = "tools|" + key
+        try:
+            session = await run_in_threadpool(session_pool.checkout, key)
+        except SessionPoolFull as e:
+            raise HTTPException(status_code=503, detail=str(e))
+        try:
+            yield session.interpreter
+        finally:
+            session_pool.release(session)
     
-    def load_profile(profile_name: Optional[str] = None):
-        """Load profile configuration (defaults to fast.yaml for gpt-4o-mini)"""
-        if not profile_name:
-            profile_name = "fast.yaml"  # Default to fast profile with gpt-4o-mini
-            
-        # Look for profile in profiles directory
-        profiles_dir = Path(__file__).parent.parent / "terminal_interface" / "profiles" / "defaults"
-        
-        # Try both .py and .yaml/.yml extensions
-        for ext in [".py", ".yaml", ".yml"]:
-            profile_file = profiles_dir / f"{profile_name.replace('.yaml', '').replace('.yml', '')}{ext}"
-            if profile_file.exists():
-                break
-        else:
-            # If no profile file found, try the built-in profile loading
-            try:
-                from interpreter.terminal_interface.profiles.profiles import profile
-                profile(interpreter, profile_name)
-                print(f"Loaded profile: {profile_name}")
-                return True
-            except Exception as e:
-                print(f"Error loading profile {profile_name}: {e}")
-                return None
-        
-        if profile_file.exists():
-            try:
-                # Import and return profile configuration
-                import importlib.util
-                spec = importlib.util.spec_from_file_location(profile_name, profile_file)
-                profile_module = importlib.util.module_from_spec(spec)
-                spec.loader.exec_module(profile_module)
-                
-                # Apply profile settings to interpreter
-                if hasattr(profile_module, 'interpreter'):
-                    profile_config = profile_module.interpreter
-                    for key, value in profile_config.items():
-                        if hasattr(interpreter, key):
-                            setattr(interpreter, key, value)
-                        elif hasattr(interpreter.llm, key):
-                            setattr(interpreter.llm, key, value)
-                            
-                return profile_config
-            except Exception as e:
-                print(f"Error loading profile {profile_name}: {e}")
-        
-        return None
+    # Profiles are compiled once, and re-read only when their file changes
+    profile_registry = ProfileRegistry()
     
     @app.get("/openapi.json")
     async def get_openapi():
@@ -801,48 +788,20 @@ def create_openwebui_server(interpreter, host="localhost", port=8264, auth_token
     
     # Individual tool endpoints
     @app.post("/python/execute")
-    async def python_tool_execute(request: ExecuteCodeRequest, _: bool = Depends(verify_auth)):
+    async def python_tool_execute(request: ExecuteCodeRequest, _: bool = Depends(verify_auth), runtime=Depends(tool_runtime)):
         """Python Code Executor - Execute Python code"""
         try:
-            # Save current state
-            saved_messages = interpreter.messages.copy()
-            interpreter.messages = []
-            result_chunks = []
-            
-            for chunk in interpreter.chat(f"```python\n{request.code}\n```", stream=True, display=False):
-                if isinstance(chunk, dict) and chunk.get("type") == "console" and "content" in chunk:
-                    result_chunks.append(chunk["content"])
-            
-            # Restore previous state
-            interpreter.messages = saved_messages
-            
-            output = "".join(result_chunks)
-            return {"output": output, "error": None}
-            
+            return await run_in_threadpool(run_code, runtime, "python", request.code)
         except Exception as e:
-            return {"output": "", "error": str(e)}
+            return {"output": "", "images": [], "error": str(e)}
     
     @app.post("/shell/execute")
-    async def shell_tool_execute(request: ExecuteShellRequest, _: bool = Depends(verify_auth)):
+    async def shell_tool_execute(request: ExecuteShellRequest, _: bool = Depends(verify_auth), runtime=Depends(tool_runtime)):
         """Shell Command Executor - Execute shell commands"""
         try:
-            # Save current state
-            saved_messages = interpreter.messages.copy()
-            interpreter.messages = []
-            result_chunks = []
-            
-            for chunk in interpreter.chat(f"```bash\n{request.command}\n```", stream=True, display=False):
-                if isinstance(chunk, dict) and chunk.get("type") == "console" and "content" in chunk:
-                    result_chunks.append(chunk["content"])
-            
-            # Restore previous state
-            interpreter.messages = saved_messages
-            
-            output = "".join(result_chunks)
-            return {"output": output, "error": None}
-            
+            return await run_in_threadpool(run_code, runtime, "shell", request.command)
         except Exception as e:
-            return {"output": "", "error": str(e)}
+            return {"output": "", "images": [], "error": str(e)}
     
     @app.post("/files/read")
     async def files_tool_read(request: FileReadRequest, _: bool = Depends(verify_auth)):
@@ -871,13 +830,8 @@ def create_openwebui_server(interpreter, host="localhost", port=8264, auth_token
     async def computer_tool_screenshot(_: bool = Depends(verify_auth)):
         """Screenshot Capture - Take a screenshot"""
         try:
-            result_chunks = []
-            for chunk in interpreter.chat("```python\ncomputer.display.screenshot()\n```", stream=True, display=False):
-                if isinstance(chunk, dict) and chunk.get("type") == "console" and "content" in chunk:
-                    result_chunks.append(chunk["content"])
-            
-            output = "".join(result_chunks)
-            return {"output": output, "error": None}
+            image = await run_in_threadpool(screenshot_base64, interpreter.computer)
+            return {"output": "", "image": image, "error": None}
         except Exception as e:
             return {"output": "", "error": str(e)}
     
@@ -890,13 +844,8 @@ def create_openwebui_server(interpreter, host="localhost", port=8264, auth_token
             if x is None or y is None:
                 return {"output": "", "error": "x and y coordinates required"}
             
-            result_chunks = []
-            for chunk in interpreter.chat(f"```python\ncomputer.mouse.click({x}, {y})\n```", stream=True, display=False):
-                if isinstance(chunk, dict) and chunk.get("type") == "console" and "content" in chunk:
-                    result_chunks.append(chunk["content"])
-            
-            output = "".join(result_chunks)
-            return {"output": output, "error": None}
+            await run_in_threadpool(interpreter.computer.mouse.click, x, y)
+            return {"output": "", "error": None}
         except Exception as e:
             return {"output": "", "error": str(e)}
     
@@ -904,15 +853,8 @@ def create_openwebui_server(interpreter, host="localhost", port=8264, auth_token
     async def computer_tool_type(request: dict, _: bool = Depends(verify_auth)):
         """Keyboard Input - Type text"""
         try:
-            text = request.get("text", "")
-            
-            result_chunks = []
-            for chunk in interpreter.chat(f"```python\ncomputer.keyboard.write({repr(text)})\n```", stream=True, display=False):
-                if isinstance(chunk, dict) and chunk.get("type") == "console" and "content" in chunk:
-                    result_chunks.append(chunk["content"])
-            
-            output = "".join(result_chunks)
-            return {"output": output, "error": None}
+            await run_in_threadpool(interpreter.computer.keyboard.write, request.get("text", ""))
+            return {"output": "", "error": None}
         except Exception as e:
             return {"output": "", "error": str(e)}
     
@@ -937,14 +879,53 @@ def create_openwebui_server(interpreter, host="localhost", port=8264, auth_token
     @app.post("/v1/chat/completions")
     async def create_chat_completion(
         request: ChatCompletionRequest,
+        http_request: Request,
         profile: Optional[str] = Query(None),
         _: bool = Depends(verify_auth)
     ):
         """OpenAI-compatible chat completion endpoint"""
         
-        # Load profile if specified
+        # Without X-OpenWebUI-Chat-Id or X-Session-Id, the request gets a session of its own
+        key = session_key(http_request.headers)
+        compiled_profile = None
         if profile:
-            load_profile(profile)
+            try:
+                # Only reads the file (or URL) the first time, or when it changes
+                compiled_profile = await run_in_threadpool(profile_registry.get, profile)
+                if key is not None:
+                    key += f"|profile:{compiled_profile.name}"
+            except Exception as e:
+                print(f"Error loading profile {profile}: {e}")
+        
+        # Waits (off the event loop) if another request is using this conversation's session
+        try:
+            session = await run_in_threadpool(session_pool.checkout, key)
+        except SessionPoolFull as e:
+            raise HTTPException(status_code=503, detail=str(e))
+        
+        try:
+            response = await chat_completion(session.interpreter, request, compiled_profile, session)
+        except BaseException:
+            session_pool.release(session)
+            raise
+        if not isinstance(response, StreamingResponse):
+            session_pool.release(session)  # Streams release it when they finish
+        return response
+    
+    async def chat_completion(interpreter, request, compiled_profile, session):
+        # Sessions outlive requests. Apply the profile once (again if its file changes),
+        # then start every request from the settings it left.
+        if session.defaults is None or session.profile is not compiled_profile:
+            interpreter.system_message = session_pool.interpreter.system_message
+            interpreter.custom_instructions = session_pool.interpreter.custom_instructions
+            if compiled_profile is not None:
+                await run_in_threadpool(compiled_profile.apply, interpreter)  # Python profiles run code
+            session.profile = compiled_profile
+            session.defaults = (interpreter.system_message, interpreter.custom_instructions)
+        interpreter.system_message, interpreter.custom_instructions = session.defaults
+        
+        # Set by StreamBridge when the client goes away, which stops the run
+        interpreter.stop_event = threading.Event()
         
         # Convert messages to interpreter format and filter system messages
         messages = []
@@ -985,21 +966,37 @@ def create_openwebui_server(interpreter, host="localhost", port=8264, auth_token
         created = int(time.time())
         
         if request.stream:
-            # Streaming response
+            # Streaming response. The interpreter runs in a worker thread, so other requests keep being served.
+            # The bridge releases the session once it's done, or when closed before it starts.
+            bridge = StreamBridge(
+                lambda: interpreter.chat(last_message, stream=True, display=False),
+                stop_event=interpreter.stop_event,
+                on_done=lambda: session_pool.release(session),
+            )
+            encoder = ChatCompletionStreamEncoder(completion_id, created, request.model)
+            
             async def generate():
-                yield f"data: {json.dumps({'id': completion_id, 'object': 'chat.completion.chunk', 'created': created, 'model': request.model, 'choices': [{'index': 0, 'delta': {'role': 'assistant'}, 'finish_reason': None}]})}\n\n"
-                
-                content_buffer = ""
                 try:
+                    yield encoder.role()
+                    
                     conversation_ended = False
                     in_code_block = False
                     in_console_block = False
                     
-                    for chunk in interpreter.chat(last_message, stream=True, display=False):
+                    while not conversation_ended:
+                        try:
+                            chunk = await bridge.next(timeout=encoder.flush_due())
+                        except asyncio.TimeoutError:
+                            # Nothing more arrived in the coalescing window, send what's held
+                            yield encoder.flush()
+                            continue
+                        except StopAsyncIteration:
+                            break
+                        
                         # Robust chunk processing to handle various formats
+                        content = None
                         try:
-                            # Debug logging
-                            print(f"🔍 Processing chunk: {type(chunk)} - {chunk}")
+                            logger.debug("Processing chunk: %r", chunk)
                             
                             # Handle different chunk types that can come from the interpreter
                             if isinstance(chunk, dict):
@@ -1010,201 +1007,89 @@ def create_openwebui_server(interpreter, host="localhost", port=8264, auth_token
                                 
                                 # Handle message chunks - primary text content
                                 if chunk_type == "message" and chunk_role == "assistant":
-                                    if chunk_content:
-                                        content_buffer += chunk_content
-                                        delta_data = {
-                                            'id': completion_id,
-                                            'object': 'chat.completion.chunk',
-                                            'created': created,
-                                            'model': request.model,
-                                            'choices': [{
-                                                'index': 0,
-                                                'delta': {'content': chunk_content},
-                                                'finish_reason': None
-                                            }]
-                                        }
-                                        yield f"data: {json.dumps(delta_data)}\n\n"
+                                    content = chunk_content
                                     
                                     # Check for conversation end
                                     if chunk.get("end"):
                                         conversation_ended = True
-                                        break
                                 
                                 # Handle code blocks
                                 elif chunk_type == "code":
                                     if chunk.get("start"):
                                         in_code_block = True
                                         code_format = chunk.get("format", "python")
-                                        delta_data = {
-                                            'id': completion_id,
-                                            'object': 'chat.completion.chunk',
-                                            'created': created,
-                                            'model': request.model,
-                                            'choices': [{
-                                                'index': 0,
-                                                'delta': {'content': f"\n```{code_format}\n"},
-                                                'finish_reason': None
-                                            }]
-                                        }
-                                        yield f"data: {json.dumps(delta_data)}\n\n"
+                                        content = f"\n```{code_format}\n"
                                     elif chunk_content and in_code_block:
-                                        delta_data = {
-                                            'id': completion_id,
-                                            'object': 'chat.completion.chunk',
-                                            'created': created,
-                                            'model': request.model,
-                                            'choices': [{
-                                                'index': 0,
-                                                'delta': {'content': chunk_content},
-                                                'finish_reason': None
-                                            }]
-                                        }
-                                        yield f"data: {json.dumps(delta_data)}\n\n"
+                                        content = chunk_content
                                     elif chunk.get("end") and in_code_block:
                                         in_code_block = False
-                                        delta_data = {
-                                            'id': completion_id,
-                                            'object': 'chat.completion.chunk',
-                                            'created': created,
-                                            'model': request.model,
-                                            'choices': [{
-                                                'index': 0,
-                                                'delta': {'content': "\n```\n"},
-                                                'finish_reason': None
-                                            }]
-                                        }
-                                        yield f"data: {json.dumps(delta_data)}\n\n"
+                                        content = "\n```\n"
                                 
                                 # Handle console output
                                 elif chunk_type == "console":
                                     if chunk.get("start"):
                                         in_console_block = True
-                                        delta_data = {
-                                            'id': completion_id,
-                                            'object': 'chat.completion.chunk',
-                                            'created': created,
-                                            'model': request.model,
-                                            'choices': [{
-                                                'index': 0,
-                                                'delta': {'content': "\nOutput:\n```\n"},
-                                                'finish_reason': None
-                                            }]
-                                        }
-                                        yield f"data: {json.dumps(delta_data)}\n\n"
+                                        content = "\nOutput:\n```\n"
                                     elif chunk_content and in_console_block:
-                                        delta_data = {
-                                            'id': completion_id,
-                                            'object': 'chat.completion.chunk',
-                                            'created': created,
-                                            'model': request.model,
-                                            'choices': [{
-                                                'index': 0,
-                                                'delta': {'content': str(chunk_content)},
-                                                'finish_reason': None
-                                            }]
-                                        }
-                                        yield f"data: {json.dumps(delta_data)}\n\n"
+                                        content = str(chunk_content)
                                     elif chunk.get("end") and in_console_block:
                                         in_console_block = False
-                                        delta_data = {
-                                            'id': completion_id,
-                                            'object': 'chat.completion.chunk',
-                                            'created': created,
-                                            'model': request.model,
-                                            'choices': [{
-                                                'index': 0,
-                                                'delta': {'content': "\n```\n"},
-                                                'finish_reason': None
-                                            }]
-                                        }
-                                        yield f"data: {json.dumps(delta_data)}\n\n"
+                                        content = "\n```\n"
                                 
                                 # Handle chunks that might not have a type but have content
                                 elif chunk_type == "unknown" and chunk_content:
                                     # This handles edge cases where chunks come without proper type
                                     if chunk_role == "assistant" or not chunk_role:
-                                        delta_data = {
-                                            'id': completion_id,
-                                            'object': 'chat.completion.chunk',
-                                            'created': created,
-                                            'model': request.model,
-                                            'choices': [{
-                                                'index': 0,
-                                                'delta': {'content': chunk_content},
-                                                'finish_reason': None
-                                            }]
-                                        }
-                                        yield f"data: {json.dumps(delta_data)}\n\n"
+                                        content = chunk_content
                                 
                                 # Skip chunks we don't recognize but log them
                                 elif chunk_type not in ["message", "code", "console", "confirmation", "active_line", "unknown"]:
-                                    print(f"⚠️ Unknown chunk type '{chunk_type}': {chunk}")
+                                    logger.warning("Unknown chunk type '%s': %r", chunk_type, chunk)
                             
                             elif isinstance(chunk, str):
                                 # Handle plain string chunks
                                 if chunk.strip():
-                                    delta_data = {
-                                        'id': completion_id,
-                                        'object': 'chat.completion.chunk',
-                                        'created': created,
-                                        'model': request.model,
-                                        'choices': [{
-                                            'index': 0,
-                                            'delta': {'content': chunk},
-                                            'finish_reason': None
-                                        }]
-                                    }
-                                    yield f"data: {json.dumps(delta_data)}\n\n"
+                                    content = chunk
                             
                             else:
                                 # Handle any other unexpected types
-                                print(f"⚠️ Unexpected chunk format: {type(chunk)} - {chunk}")
+                                logger.warning("Unexpected chunk format: %s - %r", type(chunk), chunk)
                         
                         except Exception as chunk_error:
-                            print(f"⚠️ Error processing chunk: {chunk_error}")
-                            print(f"   Problematic chunk: {chunk}")
+                            logger.warning("Error processing chunk %r: %s", chunk, chunk_error)
                             # Continue processing other chunks
+                        
+                        if content:
+                            events = encoder.delta(content)
+                            if events:
+                                yield events
                     
                     # Always send final chunk to end the stream properly
-                    if not conversation_ended:
-                        final_data = {
-                            'id': completion_id,
-                            'object': 'chat.completion.chunk',
-                            'created': created,
-                            'model': request.model,
-                            'choices': [{
-                                'index': 0,
-                                'delta': {},
-                                'finish_reason': 'stop'
-                            }]
-                        }
-                        yield f"data: {json.dumps(final_data)}\n\n"
+                    if conversation_ended:
+                        events = encoder.flush()
+                        if events:
+                            yield events
+                    else:
+                        yield encoder.finish("stop")
+                    yield "data: [DONE]\n\n"
                 except Exception as e:
-                    error_data = {
-                        'id': completion_id,
-                        'object': 'chat.completion.chunk',
-                        'created': created,
-                        'model': request.model,
-                        'choices': [{
-                            'index': 0,
-                            'delta': {'content': f"\n\nError: {str(e)}"},
-                            'finish_reason': 'error'
-                        }]
-                    }
-                    yield f"data: {json.dumps(error_data)}\n\n"
-                
-                yield "data: [DONE]\n\n"
-            
-            return StreamingResponse(generate(), media_type="text/event-stream")
+                    yield encoder.finish("error", f"\n\nError: {str(e)}")
+                    yield "data: [DONE]\n\n"
+                finally:
+                    bridge.close()
+            
+            stream = generate()
+            # Starlette never closes a body it didn't start (the client left before the first chunk)
+            weakref.finalize(stream, bridge.close)
+            return StreamingResponse(stream, media_type="text/event-stream")
         
         else:
             # Non-streaming response
-            try:
+            def collect_response():
                 full_response = ""
                 for chunk in interpreter.chat(last_message, stream=True, display=False):
                     try:
-                        # Debug logging
-                        print(f"🔍 Non-streaming chunk: {type(chunk)} - {chunk}")
+                        logger.debug("Non-streaming chunk: %r", chunk)
                         
                         if isinstance(chunk, dict):
                             chunk_type = chunk.get("type", "unknown")
@@ -1227,9 +1112,13 @@ def create_openwebui_server(interpreter, host="localhost", port=8264, auth_token
                             full_response += chunk
                     
                     except Exception as chunk_error:
-                        print(f"⚠️ Error processing non-streaming chunk: {chunk_error}")
+                        logger.warning("Error processing non-streaming chunk: %s", chunk_error)
                         continue
-                
+                return full_response
+            
+            try:
+                # In a worker thread, so other requests keep being served
+                full_response = await run_in_threadpool(collect_response)
                 response = ChatCompletionResponse(
                     id=completion_id,
                     object="chat.completion",
@@ -1249,50 +1138,20 @@ def create_openwebui_server(interpreter, host="localhost", port=8264, auth_token
                 raise HTTPException(status_code=500, detail=str(e))
     
     @app.post("/v1/tools/execute/python")
-    async def execute_python(request: ExecuteCodeRequest, _: bool = Depends(verify_auth)):
+    async def execute_python(request: ExecuteCodeRequest, _: bool = Depends(verify_auth), runtime=Depends(tool_runtime)):
         """Execute Python code"""
         try:
-            # Use interpreter's Python execution capability
-            # Save current state
-            saved_messages = interpreter.messages.copy()
-            interpreter.messages = []
-            result_chunks = []
-            
-            for chunk in interpreter.chat(f"```python\n{request.code}\n```", stream=True, display=False):
-                if isinstance(chunk, dict) and chunk.get("type") == "console" and "content" in chunk:
-                    result_chunks.append(chunk["content"])
-            
-            # Restore previous state
-            interpreter.messages = saved_messages
-            
-            output = "".join(result_chunks)
-            return {"output": output, "error": None}
-            
+            return await run_in_threadpool(run_code, runtime, "python", request.code)
         except Exception as e:
-            return {"output": "", "error": str(e)}
+            return {"output": "", "images": [], "error": str(e)}
     
     @app.post("/v1/tools/execute/shell")
-    async def execute_shell(request: ExecuteShellRequest, _: bool = Depends(verify_auth)):
+    async def execute_shell(request: ExecuteShellRequest, _: bool = Depends(verify_auth), runtime=Depends(tool_runtime)):
         """Execute shell command"""
         try:
-            # Use interpreter's shell execution capability
-            # Save current state
-            saved_messages = interpreter.messages.copy()
-            interpreter.messages = []
-            result_chunks = []
-            
-            for chunk in interpreter.chat(f"```bash\n{request.command}\n```", stream=True, display=False):
-                if isinstance(chunk, dict) and chunk.get("type") == "console" and "content" in chunk:
-                    result_chunks.append(chunk["content"])
-            
-            # Restore previous state
-            interpreter.messages = saved_messages
-            
-            output = "".join(result_chunks)
-            return {"output": output, "error": None}
-            
+            return await run_in_threadpool(run_code, runtime, "shell", request.command)
         except Exception as e:
-            return {"output": "", "error": str(e)}
+            return {"output": "", "images": [], "error": str(e)}
     
     @app.post("/v1/tools/files/read")
     async def read_file(request: FileReadRequest, _: bool = Depends(verify_auth)):
@@ -1358,13 +1217,8 @@ def create_openwebui_server(interpreter, host="localhost", port=8264, auth_token
     async def take_screenshot(_: bool = Depends(verify_auth)):
         """Take a screenshot"""
         try:
-            result_chunks = []
-            for chunk in interpreter.chat("```python\ncomputer.display.screenshot()\n```", stream=True, display=False):
-                if chunk.get("type") == "console" and "content" in chunk:
-                    result_chunks.append(chunk["content"])
-            
-            output = "".join(result_chunks)
-            return {"output": output, "error": None}
+            image = await run_in_threadpool(screenshot_base64, interpreter.computer)
+            return {"output": "", "image": image, "error": None}
         except Exception as e:
             return {"output": "", "error": str(e)}
 
@@ -1377,13 +1231,8 @@ def create_openwebui_server(interpreter, host="localhost", port=8264, auth_token
             if x is None or y is None:
                 return {"output": "", "error": "x and y coordinates required"}
             
-            result_chunks = []
-            for chunk in interpreter.chat(f"```python\ncomputer.mouse.click({x}, {y})\n```", stream=True, display=False):
-                if chunk.get("type") == "console" and "content" in chunk:
-                    result_chunks.append(chunk["content"])
-            
-            output = "".join(result_chunks)
-            return {"output": output, "error": None}
+            await run_in_threadpool(interpreter.computer.mouse.click, x, y)
+            return {"output": "", "error": None}
         except Exception as e:
             return {"output": "", "error": str(e)}
 
@@ -1391,15 +1240,8 @@ def create_openwebui_server(interpreter, host="localhost", port=8264, auth_token
     async def type_text(request: dict, _: bool = Depends(verify_auth)):
         """Type text"""
         try:
-            text = request.get("text", "")
-            
-            result_chunks = []
-            for chunk in interpreter.chat(f"```python\ncomputer.keyboard.write({repr(text)})\n```", stream=True, display=False):
-                if chunk.get("type") == "console" and "content" in chunk:
-                    result_chunks.append(chunk["content"])
-            
-            output = "".join(result_chunks)
-            return {"output": output, "error": None}
+            await run_in_threadpool(interpreter.computer.keyboard.write, request.get("text", ""))
+            return {"output": "", "error": None}
         except Exception as e:
             return {"output": "", "error": str(e)}
 
@@ -1407,49 +1249,30 @@ def create_openwebui_server(interpreter, host="localhost", port=8264, auth_token
     async def press_key(request: dict, _: bool = Depends(verify_auth)):
         """Press a key or key combination"""
         try:
-            key = request.get("key", "")
-            
-            result_chunks = []
-            for chunk in interpreter.chat(f"```python\ncomputer.keyboard.press({repr(key)})\n```", stream=True, display=False):
-                if chunk.get("type") == "console" and "content" in chunk:
-                    result_chunks.append(chunk["content"])
-            
-            output = "".join(result_chunks)
-            return {"output": output, "error": None}
+            await run_in_threadpool(interpreter.computer.keyboard.press, request.get("key", ""))
+            return {"output": "", "error": None}
         except Exception as e:
             return {"output": "", "error": str(e)}
     
     # Browser Automation Tool Endpoints
     @app.post("/browser/navigate")
-    async def browser_navigate(request: BrowserNavigateRequest, _: bool = Depends(verify_auth)):
+    async def browser_navigate(request: BrowserNavigateRequest, _: bool = Depends(verify_auth), runtime=Depends(tool_runtime)):
         """Navigate browser to URL"""
         try:
-            saved_messages = interpreter.messages.copy()
-            interpreter.messages = []
-            result_chunks = []
-            
             code = f"""browser.navigate('{request.url}')
 print(f"Navigated to: {{browser.get_url()}}")
 print(f"Page title: {{browser.get_title()}}")"""
             
-            for chunk in interpreter.chat(f"```python\n{code}\n```", stream=True, display=False):
-                if isinstance(chunk, dict) and chunk.get("type") == "console" and "content" in chunk:
-                    result_chunks.append(chunk["content"])
-            
-            interpreter.messages = saved_messages
-            output = "".join(result_chunks)
+            result = await run_in_threadpool(run_code, runtime, "python", code, computer_api=True)
+            output = result["output"]
             return {"status": "success", "url": request.url, "output": output}
         except Exception as e:
             return {"status": "error", "message": str(e)}
     
     @app.post("/browser/click")
-    async def browser_click(request: BrowserClickRequest, _: bool = Depends(verify_auth)):
+    async def browser_click(request: BrowserClickRequest, _: bool = Depends(verify_auth), runtime=Depends(tool_runtime)):
         """Click web element"""
         try:
-            saved_messages = interpreter.messages.copy()
-            interpreter.messages = []
-            result_chunks = []
-            
             if request.selector_type == "css":
                 code = f"browser.click('{request.selector}')"
             elif request.selector_type == "xpath":
@@ -1457,46 +1280,30 @@ print(f"Page title: {{browser.get_title()}}")"""
             else:
                 code = f"browser.click('{request.selector}')"
             
-            for chunk in interpreter.chat(f"```python\n{code}\n```", stream=True, display=False):
-                if isinstance(chunk, dict) and chunk.get("type") == "console" and "content" in chunk:
-                    result_chunks.append(chunk["content"])
-            
-            interpreter.messages = saved_messages
-            output = "".join(result_chunks)
+            result = await run_in_threadpool(run_code, runtime, "python", code, computer_api=True)
+            output = result["output"]
             return {"status": "success", "message": "Element clicked", "output": output}
         except Exception as e:
             return {"status": "error", "message": str(e)}
     
     @app.post("/browser/fill")
-    async def browser_fill(request: BrowserFillRequest, _: bool = Depends(verify_auth)):
+    async def browser_fill(request: BrowserFillRequest, _: bool = Depends(verify_auth), runtime=Depends(tool_runtime)):
         """Fill form field"""
         try:
-            saved_messages = interpreter.messages.copy()
-            interpreter.messages = []
-            result_chunks = []
-            
             clear_code = f"browser.clear('{request.selector}')" if request.clear_first else ""
             code = f"""{clear_code}
 browser.fill('{request.selector}', '''{request.text}''')"""
             
-            for chunk in interpreter.chat(f"```python\n{code}\n```", stream=True, display=False):
-                if isinstance(chunk, dict) and chunk.get("type") == "console" and "content" in chunk:
-                    result_chunks.append(chunk["content"])
-            
-            interpreter.messages = saved_messages
-            output = "".join(result_chunks)
+            result = await run_in_threadpool(run_code, runtime, "python", code, computer_api=True)
+            output = result["output"]
             return {"status": "success", "message": "Field filled", "output": output}
         except Exception as e:
             return {"status": "error", "message": str(e)}
     
     @app.post("/browser/extract")
-    async def browser_extract(request: BrowserExtractRequest, _: bool = Depends(verify_auth)):
+    async def browser_extract(request: BrowserExtractRequest, _: bool = Depends(verify_auth), runtime=Depends(tool_runtime)):
         """Extract content from page"""
         try:
-            saved_messages = interpreter.messages.copy()
-            interpreter.messages = []
-            result_chunks = []
-            
             if request.extract_type == "page_source":
                 code = "print(browser.get_page_source())"
             elif request.selector:
@@ -1511,35 +1318,23 @@ browser.fill('{request.selector}', '''{request.text}''')"""
             else:
                 code = "print(browser.get_page_source())"
             
-            for chunk in interpreter.chat(f"```python\n{code}\n```", stream=True, display=False):
-                if isinstance(chunk, dict) and chunk.get("type") == "console" and "content" in chunk:
-                    result_chunks.append(chunk["content"])
-            
-            interpreter.messages = saved_messages
-            content = "".join(result_chunks)
+            result = await run_in_threadpool(run_code, runtime, "python", code, computer_api=True)
+            content = result["output"]
             return {"status": "success", "content": content, "elements_found": 1 if content else 0}
         except Exception as e:
             return {"status": "error", "content": "", "elements_found": 0}
     
     @app.post("/browser/search")
-    async def web_search(request: WebSearchRequest, _: bool = Depends(verify_auth)):
+    async def web_search(request: WebSearchRequest, _: bool = Depends(verify_auth), runtime=Depends(tool_runtime)):
         """Perform web search"""
         try:
-            saved_messages = interpreter.messages.copy()
-            interpreter.messages = []
-            result_chunks = []
-            
             code = f"""import json
 browser.navigate('https://www.google.com/search?q={request.query.replace(' ', '+')}')
 results = browser.get_search_results({request.max_results})
 print(json.dumps(results))"""
             
-            for chunk in interpreter.chat(f"```python\n{code}\n```", stream=True, display=False):
-                if isinstance(chunk, dict) and chunk.get("type") == "console" and "content" in chunk:
-                    result_chunks.append(chunk["content"])
-            
-            interpreter.messages = saved_messages
-            output = "".join(result_chunks)
+            result = await run_in_threadpool(run_code, runtime, "python", code, computer_api=True)
+            output = result["output"]
             
             try:
                 results = json.loads(output)
@@ -1551,21 +1346,13 @@ print(json.dumps(results))"""
             return {"status": "error", "results": []}
     
     @app.post("/browser/screenshot")
-    async def browser_screenshot(_: bool = Depends(verify_auth)):
+    async def browser_screenshot(_: bool = Depends(verify_auth), runtime=Depends(tool_runtime)):
         """Take browser screenshot"""
         try:
-            saved_messages = interpreter.messages.copy()
-            interpreter.messages = []
-            result_chunks = []
-            
             code = "screenshot = browser.screenshot()\nprint(screenshot)"
             
-            for chunk in interpreter.chat(f"```python\n{code}\n```", stream=True, display=False):
-                if isinstance(chunk, dict) and chunk.get("type") == "console" and "content" in chunk:
-                    result_chunks.append(chunk["content"])
-            
-            interpreter.messages = saved_messages
-            screenshot_data = "".join(result_chunks)
+            result = await run_in_threadpool(run_code, runtime, "python", code, computer_api=True)
+            screenshot_data = result["output"]
             return {"status": "success", "screenshot": screenshot_data}
         except Exception as e:
             return {"status": "error", "screenshot": ""}
@@ -1575,16 +1362,7 @@ print(json.dumps(results))"""
     async def clipboard_read(_: bool = Depends(verify_auth)):
         """Read clipboard content"""
         try:
-            saved_messages = interpreter.messages.copy()
-            interpreter.messages = []
-            result_chunks = []
-            
-            for chunk in interpreter.chat("```python\nprint(computer.clipboard.view())\n```", stream=True, display=False):
-                if isinstance(chunk, dict) and chunk.get("type") == "console" and "content" in chunk:
-                    result_chunks.append(chunk["content"])
-            
-            interpreter.messages = saved_messages
-            content = "".join(result_chunks)
+            content = await run_in_threadpool(interpreter.computer.clipboard.view)
             return {"status": "success", "content": content}
         except Exception as e:
             return {"status": "error", "content": ""}
@@ -1593,15 +1371,7 @@ print(json.dumps(results))"""
     async def clipboard_write(request: ClipboardWriteRequest, _: bool = Depends(verify_auth)):
         """Write to clipboard"""
         try:
-            saved_messages = interpreter.messages.copy()
-            interpreter.messages = []
-            result_chunks = []
-            
-            for chunk in interpreter.chat(f"```python\ncomputer.clipboard.copy({repr(request.text)})\n```", stream=True, display=False):
-                if isinstance(chunk, dict) and chunk.get("type") == "console" and "content" in chunk:
-                    result_chunks.append(chunk["content"])
-            
-            interpreter.messages = saved_messages
+            await run_in_threadpool(interpreter.computer.clipboard.copy, request.text)
             return {"status": "success", "message": "Text copied to clipboard"}
         except Exception as e:
             return {"status": "error", "message": str(e)}
@@ -1610,106 +1380,59 @@ print(json.dumps(results))"""
     async def clipboard_paste(_: bool = Depends(verify_auth)):
         """Paste clipboard content"""
         try:
-            saved_messages = interpreter.messages.copy()
-            interpreter.messages = []
-            result_chunks = []
-            
-            for chunk in interpreter.chat("```python\ncomputer.clipboard.paste()\n```", stream=True, display=False):
-                if isinstance(chunk, dict) and chunk.get("type") == "console" and "content" in chunk:
-                    result_chunks.append(chunk["content"])
-            
-            interpreter.messages = saved_messages
+            await run_in_threadpool(interpreter.computer.clipboard.paste)
             return {"status": "success", "message": "Clipboard content pasted"}
         except Exception as e:
             return {"status": "error", "message": str(e)}
     
     # JavaScript Execution Tool Endpoint
     @app.post("/javascript/execute")
-    async def javascript_execute(request: ExecuteCodeRequest, _: bool = Depends(verify_auth)):
+    async def javascript_execute(request: ExecuteCodeRequest, _: bool = Depends(verify_auth), runtime=Depends(tool_runtime)):
         """Execute JavaScript code"""
         try:
-            saved_messages = interpreter.messages.copy()
-            interpreter.messages = []
-            result_chunks = []
-            
-            for chunk in interpreter.chat(f"```javascript\n{request.code}\n```", stream=True, display=False):
-                if isinstance(chunk, dict) and chunk.get("type") == "console" and "content" in chunk:
-                    result_chunks.append(chunk["content"])
-            
-            interpreter.messages = saved_messages
-            output = "".join(result_chunks)
-            return {"status": "success", "output": output, "error": None}
+            result = await run_in_threadpool(run_code, runtime, "javascript", request.code)
+            return {"status": "error" if result["error"] else "success", **result}
         except Exception as e:
-            return {"status": "error", "output": "", "error": str(e)}
+            return {"status": "error", "output": "", "images": [], "error": str(e)}
     
     # R Programming Tool Endpoint
     @app.post("/r/execute")
-    async def r_execute(request: ExecuteCodeRequest, _: bool = Depends(verify_auth)):
+    async def r_execute(request: ExecuteCodeRequest, _: bool = Depends(verify_auth), runtime=Depends(tool_runtime)):
         """Execute R code"""
         try:
-            saved_messages = interpreter.messages.copy()
-            interpreter.messages = []
-            result_chunks = []
-            
-            for chunk in interpreter.chat(f"```r\n{request.code}\n```", stream=True, display=False):
-                if isinstance(chunk, dict) and chunk.get("type") == "console" and "content" in chunk:
-                    result_chunks.append(chunk["content"])
-            
-            interpreter.messages = saved_messages
-            output = "".join(result_chunks)
-            return {"status": "success", "output": output, "error": None}
+            result = await run_in_threadpool(run_code, runtime, "r", request.code)
+            return {"status": "error" if result["error"] else "success", **result}
         except Exception as e:
-            return {"status": "error", "output": "", "error": str(e)}
+            return {"status": "error", "output": "", "images": [], "error": str(e)}
     
     # AppleScript Tool Endpoint
     @app.post("/applescript/execute")
-    async def applescript_execute(request: ExecuteCodeRequest, _: bool = Depends(verify_auth)):
+    async def applescript_execute(request: ExecuteCodeRequest, _: bool = Depends(verify_auth), runtime=Depends(tool_runtime)):
         """Execute AppleScript code"""
         try:
-            saved_messages = interpreter.messages.copy()
-            interpreter.messages = []
-            result_chunks = []
-            
-            for chunk in interpreter.chat(f"```applescript\n{request.code}\n```", stream=True, display=False):
-                if isinstance(chunk, dict) and chunk.get("type") == "console" and "content" in chunk:
-                    result_chunks.append(chunk["content"])
-            
-            interpreter.messages = saved_messages
-            output = "".join(result_chunks)
-            return {"status": "success", "output": output, "error": None}
+            result = await run_in_threadpool(run_code, runtime, "applescript", request.code)
+            return {"status": "error" if result["error"] else "success", **result}
         except Exception as e:
-            return {"status": "error", "output": "", "error": str(e)}
+            return {"status": "error", "output": "", "images": [], "error": str(e)}
     
     # SMS/Messages Tool Endpoints
     @app.post("/sms/send")
-    async def sms_send(request: SMSSendRequest, _: bool = Depends(verify_auth)):
+    async def sms_send(request: SMSSendRequest, _: bool = Depends(verify_auth), runtime=Depends(tool_runtime)):
         """Send SMS/iMessage"""
         try:
-            saved_messages = interpreter.messages.copy()
-            interpreter.messages = []
-            result_chunks = []
-            
             code = f"""result = computer.sms.send('{request.to}', '''{request.message}''')
 print(result)"""
             
-            for chunk in interpreter.chat(f"```python\n{code}\n```", stream=True, display=False):
-                if isinstance(chunk, dict) and chunk.get("type") == "console" and "content" in chunk:
-                    result_chunks.append(chunk["content"])
-            
-            interpreter.messages = saved_messages
-            output = "".join(result_chunks)
+            result = await run_in_threadpool(run_code, runtime, "python", code, computer_api=True)
+            output = result["output"]
             return {"status": "success", "message": output}
         except Exception as e:
             return {"status": "error", "message": str(e)}
     
     @app.post("/sms/get")
-    async def sms_get(request: SMSGetRequest, _: bool = Depends(verify_auth)):
+    async def sms_get(request: SMSGetRequest, _: bool = Depends(verify_auth), runtime=Depends(tool_runtime)):
         """Get SMS/iMessage history"""
         try:
-            saved_messages = interpreter.messages.copy()
-            interpreter.messages = []
-            result_chunks = []
-            
             contact_param = f"'{request.contact}'" if request.contact else "None"
             substring_param = f"'{request.substring}'" if request.substring else "None"
             
@@ -1717,12 +1440,8 @@ print(result)"""
 messages = computer.sms.get(contact={contact_param}, limit={request.limit}, substring={substring_param})
 print(json.dumps(messages, default=str))"""
             
-            for chunk in interpreter.chat(f"```python\n{code}\n```", stream=True, display=False):
-                if isinstance(chunk, dict) and chunk.get("type") == "console" and "content" in chunk:
-                    result_chunks.append(chunk["content"])
-            
-            interpreter.messages = saved_messages
-            output = "".join(result_chunks)
+            result = await run_in_threadpool(run_code, runtime, "python", code, computer_api=True)
+            output = result["output"]
             
             try:
                 messages = json.loads(output)
@@ -1735,13 +1454,9 @@ print(json.dumps(messages, default=str))"""
     
     # Vision & OCR Tool Endpoints
     @app.post("/vision/analyze")
-    async def vision_analyze(request: VisionAnalyzeRequest, _: bool = Depends(verify_auth)):
+    async def vision_analyze(request: VisionAnalyzeRequest, _: bool = Depends(verify_auth), runtime=Depends(tool_runtime)):
         """Analyze image with AI"""
         try:
-            saved_messages = interpreter.messages.copy()
-            interpreter.messages = []
-            result_chunks = []
-            
             if request.image_path:
                 code = f"""result = computer.vision.analyze('{request.image_path}', '{request.prompt}')
 print(result)"""
@@ -1752,24 +1467,16 @@ print(result)"""
             else:
                 return {"status": "error", "analysis": "No image provided"}
             
-            for chunk in interpreter.chat(f"```python\n{code}\n```", stream=True, display=False):
-                if isinstance(chunk, dict) and chunk.get("type") == "console" and "content" in chunk:
-                    result_chunks.append(chunk["content"])
-            
-            interpreter.messages = saved_messages
-            analysis = "".join(result_chunks)
+            result = await run_in_threadpool(run_code, runtime, "python", code, computer_api=True)
+            analysis = result["output"]
             return {"status": "success", "analysis": analysis}
         except Exception as e:
             return {"status": "error", "analysis": str(e)}
     
     @app.post("/vision/ocr")
-    async def vision_ocr(request: VisionOCRRequest, _: bool = Depends(verify_auth)):
+    async def vision_ocr(request: VisionOCRRequest, _: bool = Depends(verify_auth), runtime=Depends(tool_runtime)):
         """Extract text from image"""
         try:
-            saved_messages = interpreter.messages.copy()
-            interpreter.messages = []
-            result_chunks = []
-            
             if request.image_path:
                 code = f"""result = computer.vision.ocr('{request.image_path}')
 print(result)"""
@@ -1780,36 +1487,24 @@ print(result)"""
             else:
                 return {"status": "error", "text": "No image provided"}
             
-            for chunk in interpreter.chat(f"```python\n{code}\n```", stream=True, display=False):
-                if isinstance(chunk, dict) and chunk.get("type") == "console" and "content" in chunk:
-                    result_chunks.append(chunk["content"])
-            
-            interpreter.messages = saved_messages
-            text = "".join(result_chunks)
+            result = await run_in_threadpool(run_code, runtime, "python", code, computer_api=True)
+            text = result["output"]
             return {"status": "success", "text": text}
         except Exception as e:
             return {"status": "error", "text": str(e)}
     
     @app.post("/vision/screenshot_analyze")
-    async def vision_screenshot_analyze(request: VisionScreenshotAnalyzeRequest, _: bool = Depends(verify_auth)):
+    async def vision_screenshot_analyze(request: VisionScreenshotAnalyzeRequest, _: bool = Depends(verify_auth), runtime=Depends(tool_runtime)):
         """Take screenshot and analyze"""
         try:
-            saved_messages = interpreter.messages.copy()
-            interpreter.messages = []
-            result_chunks = []
-            
             code = f"""import base64
 screenshot = computer.display.screenshot()
 analysis = computer.vision.analyze_screenshot('{request.prompt}')
 print(f"screenshot:{screenshot}")
 print(f"analysis:{analysis}")"""
             
-            for chunk in interpreter.chat(f"```python\n{code}\n```", stream=True, display=False):
-                if isinstance(chunk, dict) and chunk.get("type") == "console" and "content" in chunk:
-                    result_chunks.append(chunk["content"])
-            
-            interpreter.messages = saved_messages
-            output = "".join(result_chunks)
+            result = await run_in_threadpool(run_code, runtime, "python", code, computer_api=True)
+            output = result["output"]
             
             # Parse screenshot and analysis from output
             screenshot = ""
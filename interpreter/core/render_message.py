@@ -1,4 +1,13 @@
 import re
+import time
+
+# A {{ }} block is re-run on every render, unless it opts into caching with a comment on its first line:
+#   {{ # ttl: 30              <- re-run if the cached output is older than 30 seconds
+#   {{ # ttl: inf             <- re-run only when the system message itself changes
+# (`# refresh: always` is also accepted, and is the same as no directive.)
+RENDER_DIRECTIVE_PATTERN = re.compile(
+    r"^\s*#\s*(refresh|ttl)\s*:\s*([\w.]+)\s*$", flags=re.IGNORECASE
+)
 
 
 def render_message(interpreter, message):
@@ -15,21 +24,7 @@ def render_message(interpreter, message):
     for i, part in enumerate(parts):
         # If the part is enclosed in {{ and }}
         if part.startswith("{{") and part.endswith("}}"):
-            # Run the code inside the brackets
-            output = interpreter.computer.run(
-                "python", part[2:-2].strip(), display=interpreter.verbose
-            )
-
-            # Extract the output content
-            outputs = (
-                line["content"]
-                for line in output
-                if line.get("format") == "output"
-                and "IGNORE_ALL_ABOVE_THIS_LINE" not in line["content"]
-            )
-
-            # Replace the part with the output
-            parts[i] = "\n".join(outputs)
+            parts[i] = render_block(interpreter, part[2:-2].strip())
 
     # Join the parts back into the message
     rendered_message = "".join(parts).strip()
@@ -44,3 +39,108 @@ def render_message(interpreter, message):
     interpreter.computer.save_skills = previous_save_skills_setting
 
     return rendered_message
+
+
+def render_block(interpreter, code):
+    """
+    Runs the code inside a {{ }} block and returns its printed output.
+    """
+    # Run the code inside the brackets
+    output = interpreter.computer.run("python", code, display=interpreter.verbose)
+
+    # Extract the output content
+    outputs = (
+        line["content"]
+        for line in output
+        if line.get("format") == "output"
+        and "IGNORE_ALL_ABOVE_THIS_LINE" not in line["content"]
+    )
+
+    return "\n".join(outputs)
+
+
+def parse_render_directive(code):
+    """
+    Returns the TTL (in seconds) declared by a {{ }} block.
+    0 (the default) means "always refresh", inf means "cache until the message changes".
+    """
+    first_line = code.split("\n", 1)[0]
+    match = RENDER_DIRECTIVE_PATTERN.match(first_line)
+    if not match or match.group(1).lower() != "ttl":
+        return 0
+    try:
+        return max(float(match.group(2)), 0)
+    except ValueError:
+        return 0
+
+
+class RenderCache:
+    """
+    Keeps the parsed system message around until one of its inputs changes,
+    so {{ }} blocks that declare a `# ttl:` aren't re-run through the kernel on every step.
+    """
+
+    def __init__(self):
+        self.clear()
+
+    def clear(self):
+        self.inputs = None
+        self.parts = []
+        self.blocks = {}  # part index -> {"code", "ttl", "output", "rendered_at"}
+        self.rendered_message = None
+
+    def is_current(self, inputs):
+        return self.inputs is not None and self.inputs == inputs
+
+    def set_message(self, inputs, message):
+        """
+        Stores a new (unrendered) message. Every block will be rendered again on the next `render()`.
+        """
+        self.inputs = inputs
+        self.parts = re.split(r"({{.*?}})", message, flags=re.DOTALL)
+        self.blocks = {}
+        self.rendered_message = None
+        for i, part in enumerate(self.parts):
+            if part.startswith("{{") and part.endswith("}}"):
+                code = part[2:-2].strip()
+                self.blocks[i] = {
+                    "code": code,
+                    "ttl": parse_render_directive(code),
+                    "output": None,
+                    "rendered_at": None,
+                }
+
+    def _is_stale(self, block, now):
+        if block["rendered_at"] is None:
+            return True
+        return now - block["rendered_at"] >= block["ttl"]
+
+    def render(self, interpreter):
+        """
+        Renders the stored message, only re-running blocks that are missing or expired.
+        """
+        now = time.monotonic()
+        stale_blocks = [
+            i for i, block in self.blocks.items() if self._is_stale(block, now)
+        ]
+
+        if not stale_blocks and self.rendered_message is not None:
+            return self.rendered_message
+
+        if stale_blocks:
+            previous_save_skills_setting = interpreter.computer.save_skills
+            interpreter.computer.save_skills = False
+            try:
+                for i in stale_blocks:
+                    block = self.blocks[i]
+                    block["output"] = render_block(interpreter, block["code"])
+                    block["rendered_at"] = now
+            finally:
+                interpreter.computer.save_skills = previous_save_skills_setting
+
+        parts = list(self.parts)
+        for i, block in self.blocks.items():
+            parts[i] = block["output"]
+        self.rendered_message = "".join(parts).strip()
+
+        return self.rendered_message
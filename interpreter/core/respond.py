@@ -8,6 +8,7 @@ os.environ["LITELLM_LOCAL_MODEL_COST_MAP"] = "True"
 import litellm
 import openai
 
+from .computer.terminal.terminal import StreamedCode
 from .render_message import render_message
 
 
@@ -23,34 +24,24 @@ def respond(interpreter):
     while True:
         ## RENDER SYSTEM MESSAGE ##
 
-        system_message = interpreter.system_message
-
-        # Add language-specific system messages
-        for language in interpreter.computer.terminal.languages:
-            if hasattr(language, "system_message"):
-                system_message += "\n\n" + language.system_message
-
-        # Add custom instructions
-        if interpreter.custom_instructions:
-            system_message += "\n\n" + interpreter.custom_instructions
-
-        # Add computer API system message
-        if interpreter.computer.import_computer_api:
-            if interpreter.computer.system_message not in system_message:
-                system_message = (
-                    system_message + "\n\n" + interpreter.computer.system_message
+        if interpreter.cache_system_message:
+            # Only rebuild (and re-render) the system message if one of its inputs changed
+            inputs = system_message_inputs(interpreter)
+            if not interpreter._system_message_cache.is_current(inputs):
+                interpreter._system_message_cache.set_message(
+                    inputs, build_system_message(interpreter)
                 )
+            rendered_system_message = interpreter._system_message_cache.render(
+                interpreter
+            )
+        else:
+            rendered_system_message = render_message(
+                interpreter, build_system_message(interpreter)
+            )
 
-        # Storing the messages so they're accessible in the interpreter's computer
-        # no... this is a huge time sink.....
-        # if interpreter.sync_computer:
-        #     output = interpreter.computer.run(
-        #         "python", f"messages={interpreter.messages}"
-        #     )
-
-        ## Rendering ↓
-        rendered_system_message = render_message(interpreter, system_message)
-        ## Rendering ↑
+        ## RECALL MEMORIES ##
+        # (Started in _streaming_chat, so it ran while the system message was rendered)
+        interpreter.memory_pipeline.insert_recalled_memories()
 
         rendered_system_message = {
             "role": "system",
@@ -84,7 +75,17 @@ def respond(interpreter):
             interpreter.messages[-1]["type"] != "code"
         ):  # If it is, we should run the code (we do below)
             try:
+                streamed_code = None  # The code block the LLM is writing, so far
                 for chunk in interpreter.llm.run(messages_for_llm):
+                    if chunk.get("type") == "code":
+                        # Start its language now, so the code can run as soon as it's written
+                        if streamed_code is None:
+                            streamed_code = StreamedCode(
+                                interpreter.computer.terminal, chunk.get("format")
+                            )
+                        streamed_code.append(chunk.get("content", ""))
+                    else:
+                        streamed_code = None
                     yield {"role": "assistant", **chunk}
 
             except litellm.exceptions.BudgetExceededError:
@@ -461,3 +462,51 @@ def respond(interpreter):
             break
 
     return
+
+
+def system_message_inputs(interpreter):
+    """
+    Everything the system message is built from. If none of these change, neither does the system message.
+    """
+    return (
+        interpreter.system_message,
+        tuple(
+            getattr(language, "system_message", None)
+            for language in interpreter.computer.terminal.languages
+        ),
+        interpreter.custom_instructions,
+        interpreter.computer.import_computer_api,
+        interpreter.computer.system_message,
+    )
+
+
+def build_system_message(interpreter):
+    """
+    Concatenates the system message, language-specific system messages, custom instructions and the computer API system message.
+    """
+    system_message = interpreter.system_message
+
+    # Add language-specific system messages
+    for language in interpreter.computer.terminal.languages:
+        if hasattr(language, "system_message"):
+            system_message += "\n\n" + language.system_message
+
+    # Add custom instructions
+    if interpreter.custom_instructions:
+        system_message += "\n\n" + interpreter.custom_instructions
+
+    # Add computer API system message
+    if interpreter.computer.import_computer_api:
+        if interpreter.computer.system_message not in system_message:
+            system_message = (
+                system_message + "\n\n" + interpreter.computer.system_message
+            )
+
+    # Storing the messages so they're accessible in the interpreter's computer
+    # no... this is a huge time sink.....
+    # if interpreter.sync_computer:
+    #     output = interpreter.computer.run(
+    #         "python", f"messages={interpreter.messages}"
+    #     )
+
+    return system_message
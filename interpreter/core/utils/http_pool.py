@@ -0,0 +1,197 @@
+import os
+import threading
+from collections import OrderedDict
+from http.cookiejar import DefaultCookiePolicy
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+
+class HttpPool:
+    """
+    Shared keep-alive connections for outbound HTTP, so repeated calls to the same host
+    (Ollama, a model provider, SearXNG...) don't open a new TCP/TLS connection every time.
+
+    `requests` traffic gets one pooled Session per host, for at most `max_hosts` hosts (the least
+    recently used one is closed to make room). The pool is shared by every interpreter, so these
+    Sessions never keep cookies; pass `cookies=` per request instead. LLM traffic goes through a
+    shared httpx client (HTTP/2 if `h2` is installed), which litellm picks up as its client session.
+    """
+
+    def __init__(
+        self, pool_connections=None, pool_maxsize=None, http2=None, max_hosts=None
+    ):
+        self.pool_connections = pool_connections or int(
+            os.environ.get("INTERPRETER_HTTP_POOL_CONNECTIONS", 10)
+        )
+        self.pool_maxsize = pool_maxsize or int(
+            os.environ.get("INTERPRETER_HTTP_POOL_MAXSIZE", 20)
+        )
+        if http2 is None:
+            http2 = os.environ.get("INTERPRETER_HTTP2", "true").lower() != "false"
+        self.http2 = http2
+        self.max_hosts = max_hosts or int(
+            os.environ.get("INTERPRETER_HTTP_POOL_MAX_HOSTS", 32)
+        )
+
+        self._sessions = (
+            OrderedDict()
+        )  # "scheme://host:port" -> requests.Session, LRU first
+        self._request_counts = {}
+        self._httpx_client = None
+        self._lock = threading.Lock()
+
+    def configure(self, pool_connections=None, pool_maxsize=None, http2=None):
+        """
+        Changes the pool sizes. Existing connections are closed, new ones use the new settings.
+        """
+        self.close()
+        if pool_connections is not None:
+            self.pool_connections = pool_connections
+        if pool_maxsize is not None:
+            self.pool_maxsize = pool_maxsize
+        if http2 is not None:
+            self.http2 = http2
+
+    def _host(self, url):
+        parts = urlsplit(url)
+        return f"{parts.scheme}://{parts.netloc}"
+
+    def session(self, url):
+        """
+        Returns the keep-alive Session for `url`'s host.
+        """
+        host = self._host(url)
+        evicted = []
+        with self._lock:
+            if host in self._sessions:
+                self._sessions.move_to_end(host)
+            else:
+                while len(self._sessions) >= self.max_hosts:
+                    old_host, old_session = self._sessions.popitem(last=False)
+                    self._request_counts.pop(old_host, None)
+                    evicted.append(old_session)
+                session = requests.Session()
+                session.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+                adapter = HTTPAdapter(
+                    pool_connections=self.pool_connections,
+                    pool_maxsize=self.pool_maxsize,
+                )
+                session.mount("http://", adapter)
+                session.mount("https://", adapter)
+                self._sessions[host] = session
+                self._request_counts[host] = 0
+            self._request_counts[host] += 1
+            session = self._sessions[host]
+
+        for old_session in evicted:
+            old_session.close()  # Requests already using it still finish
+        return session
+
+    def request(self, method, url, **kwargs):
+        return self.session(url).request(method, url, **kwargs)
+
+    def get(self, url, **kwargs):
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request("POST", url, **kwargs)
+
+    def _httpx_options(self):
+        import httpx
+
+        http2 = self.http2
+        if http2:
+            try:
+                import h2
+            except ImportError:
+                http2 = False
+
+        return {
+            "http2": http2,
+            "limits": httpx.Limits(
+                max_connections=self.pool_maxsize,
+                max_keepalive_connections=self.pool_connections,
+            ),
+            # litellm passes its own timeout per request, this is just the fallback
+            "timeout": httpx.Timeout(600.0, connect=10.0),
+        }
+
+    def httpx_client(self):
+        with self._lock:
+            if self._httpx_client is None:
+                import httpx
+
+                self._httpx_client = httpx.Client(**self._httpx_options())
+            return self._httpx_client
+
+    def use_for_litellm(self):
+        """
+        Makes litellm send requests through our pooled httpx client, unless the user gave it their own.
+        (Async clients are tied to an event loop, so litellm keeps managing those itself.)
+        """
+        import litellm
+
+        if litellm.client_session is None:
+            litellm.client_session = self.httpx_client()
+
+    def stats(self):
+        """
+        Per-host counts of requests made and connections opened. `connections_opened` much lower
+        than `requests` means keep-alive is working.
+        """
+        stats = {}
+        with self._lock:
+            sessions = list(self._sessions.items())
+            request_counts = dict(self._request_counts)
+
+        for host, session in sessions:
+            connections_opened = 0
+            pool_requests = 0
+            for adapter in set(session.adapters.values()):
+                pools = adapter.poolmanager.pools
+                for key in list(pools.keys()):
+                    pool = pools.get(key)
+                    if pool is not None:
+                        connections_opened += pool.num_connections
+                        pool_requests += pool.num_requests
+            stats[host] = {
+                "requests": request_counts.get(host, 0),
+                "connections_opened": connections_opened,
+                "pool_requests": pool_requests,
+            }
+
+        if self._httpx_client is not None:
+            # httpcore doesn't count connections over time, but we can see what's open right now
+            try:
+                open_connections = len(self._httpx_client._transport._pool.connections)
+            except AttributeError:
+                open_connections = None
+            stats["httpx"] = {
+                "http2": self._httpx_options()["http2"],
+                "open_connections": open_connections,
+            }
+
+        return stats
+
+    def close(self):
+        with self._lock:
+            sessions = list(self._sessions.values())
+            self._sessions = OrderedDict()
+            self._request_counts = {}
+            httpx_client, self._httpx_client = self._httpx_client, None
+
+        for session in sessions:
+            session.close()
+
+        if httpx_client is not None:
+            import litellm
+
+            if litellm.client_session is httpx_client:
+                litellm.client_session = None
+            httpx_client.close()
+
+
+# One pool per process, shared by every interpreter
+http_pool = HttpPool()
@@ -0,0 +1,85 @@
+import os
+import tempfile
+import weakref
+
+from .truncate_output import truncation_message
+
+
+class OutputBuffer:
+    """
+    Accumulates console output, keeping only the last `max_output_chars` characters in memory.
+    The full output is spilled to a temporary file, so `get_last_output()` can still page through it.
+    The file is removed by cleanup(), or when the buffer is garbage collected or the process exits.
+    """
+
+    def __init__(self, max_output_chars=2800, add_scrollbars=False, spill=True):
+        self.max_output_chars = max_output_chars
+        self.add_scrollbars = add_scrollbars
+        self.tail = ""
+        self.length = 0
+        self.path = None
+        self.message = None  # The LMC message this output is stored in
+        self._file = None
+        self._finalizer = None
+
+        if spill:
+            try:
+                self._file = tempfile.NamedTemporaryFile(
+                    mode="w",
+                    encoding="utf-8",
+                    prefix="oi_output_",
+                    suffix=".txt",
+                    delete=False,
+                )
+                self.path = self._file.name
+                self._finalizer = weakref.finalize(
+                    self, _remove_spill_file, self._file, self.path
+                )
+            except Exception as e:
+                print(f"Could not create output file: {e}")
+
+    def append(self, content):
+        self.length += len(content)
+
+        # Only ever slice the last max_output_chars, however big the output gets
+        if len(content) >= self.max_output_chars:
+            self.tail = content[len(content) - self.max_output_chars :]
+        else:
+            self.tail = (self.tail + content)[-self.max_output_chars :]
+
+        if self._file:
+            self._file.write(content)
+
+    @property
+    def truncated(self):
+        return self.length > self.max_output_chars
+
+    def value(self):
+        """
+        The output as it should be stored in messages (truncated, with a message saying so).
+        """
+        if self.truncated:
+            return (
+                truncation_message(self.max_output_chars, self.add_scrollbars)
+                + self.tail
+            )
+        return self.tail
+
+    def close(self):
+        if self._file:
+            self._file.close()
+            self._file = None
+
+    def cleanup(self):
+        self.close()
+        if self._finalizer:
+            self._finalizer()
+        self.path = None
+
+
+def _remove_spill_file(file, path):
+    file.close()
+    try:
+        os.remove(path)
+    except OSError:
+        pass
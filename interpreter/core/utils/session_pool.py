@@ -0,0 +1,278 @@
+import copy
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from ..render_message import RenderCache
+
+# Headers that name the conversation a request belongs to, most specific first.
+# Open WebUI sends X-OpenWebUI-Chat-Id when ENABLE_FORWARD_USER_INFO_HEADERS is on.
+SESSION_HEADERS = ("x-session-id", "x-openwebui-chat-id")
+
+# Computer tools that sessions share with the base interpreter instead of copying
+SHARED_TOOLS = ("vision",)
+
+
+class SessionPoolFull(RuntimeError):
+    pass
+
+
+class SessionBusy(SessionPoolFull):
+    pass
+
+
+def session_key(headers):
+    """
+    Picks the key a request's session is stored under, from its X-Session-Id or
+    X-OpenWebUI-Chat-Id header.
+
+    Returns None without one: nothing else in a request reliably tells conversations apart
+    (Open WebUI sends every user's requests with the same API key), so such requests get a
+    session of their own, which is closed when they finish. Forward one of these headers to
+    keep a conversation's kernel state between requests.
+    """
+    for header in SESSION_HEADERS:
+        if headers.get(header):
+            return f"{header}:{headers[header]}"
+    return None
+
+
+def isolated_interpreter(interpreter):
+    """
+    A copy of `interpreter` with its own conversation, LLM settings and code runtimes.
+
+    Heavy, shareable things (the memory store, the LLM's caches and router, vision models,
+    the devices the computer controls) are shared with `interpreter`. The terminal is new,
+    so its languages get fresh kernels (pre-warmed ones from the kernel pool, for Python).
+    """
+    from ...memory.pipeline import MemoryPipeline
+    from ..computer.terminal.terminal import Terminal
+
+    session = copy.copy(interpreter)
+    session.messages = []
+    session.responding = False
+    session.last_messages_count = 0
+    session._output_buffer = None
+    session._previous_output_buffer = None
+    session._system_message_cache = RenderCache()
+    session.conversation_filename = None
+    session.__dict__.pop("conversation_id", None)
+    session.memory_pipeline = MemoryPipeline(session)
+
+    if not interpreter.llm._is_loaded:
+        interpreter.llm.load()  # Once, instead of in every session
+    session.llm = copy.copy(interpreter.llm)
+    session.llm.interpreter = session
+    session.llm.token_ledger = copy.copy(interpreter.llm.token_ledger)
+
+    session.computer = copy.copy(interpreter.computer)
+    session.computer.interpreter = session
+    session.computer._has_imported_computer_api = False
+    session.computer._has_imported_skills = False
+    # Tools keep a reference to their computer. Point the session's copies at the session's computer,
+    # so skills are imported into its kernel and computer.ai saves and restores its conversation.
+    # Vision is shared: it only reads settings, and its models are loaded once, on first use.
+    for name, tool in list(vars(session.computer).items()):
+        if (
+            name in SHARED_TOOLS
+            or getattr(tool, "computer", None) is not interpreter.computer
+        ):
+            continue
+        tool = copy.copy(tool)
+        tool.computer = session.computer
+        setattr(session.computer, name, tool)
+    skills = getattr(session.computer, "skills", None)
+    if hasattr(skills, "new_skill"):  # Holds the skill being recorded
+        skills.new_skill = copy.copy(skills.new_skill)
+        skills.new_skill.skills = skills
+    terminal = Terminal(session.computer)
+    terminal.languages = list(interpreter.computer.terminal.languages)
+    terminal.speculative_warm_up = interpreter.computer.terminal.speculative_warm_up
+    session.computer.terminal = terminal
+
+    return session
+
+
+class Session:
+    def __init__(self, key, interpreter):
+        self.key = key
+        self.interpreter = interpreter
+        self.created = time.monotonic()
+        self.last_used = self.created
+        self.users = 0  # Requests holding or waiting for the session
+        self.lock = threading.Lock()  # One request at a time per conversation
+
+        # For the server: the profile applied to the interpreter, and the settings it starts from
+        self.profile = None
+        self.defaults = None
+
+        self.ephemeral = False  # Closed on release (see SessionPool.checkout(None))
+
+
+class SessionPool:
+    """
+    Gives each conversation its own interpreter, so concurrent chats can't overwrite each other's
+    messages, system message or kernel state. Sessions are copies of `interpreter` (see
+    `isolated_interpreter`), so settings applied to it before a session is created carry over.
+
+    At most `max_sessions` are kept. Sessions idle for `idle_timeout` seconds are closed, and when
+    the pool is full, the least recently used idle one makes room.
+
+    A request waits at most `lock_timeout` seconds for its session to be free.
+    Requests without a key get a session of their own, which is closed when they release it.
+
+    Configured with INTERPRETER_MAX_SESSIONS (default 32),
+    INTERPRETER_SESSION_IDLE_TIMEOUT (seconds, default 1800)
+    and INTERPRETER_SESSION_LOCK_TIMEOUT (seconds, default 300).
+    """
+
+    def __init__(
+        self,
+        interpreter,
+        max_sessions=None,
+        idle_timeout=None,
+        factory=None,
+        lock_timeout=None,
+    ):
+        if max_sessions is None:
+            max_sessions = int(os.environ.get("INTERPRETER_MAX_SESSIONS", 32))
+        if idle_timeout is None:
+            idle_timeout = float(
+                os.environ.get("INTERPRETER_SESSION_IDLE_TIMEOUT", 1800)
+            )
+        if lock_timeout is None:
+            lock_timeout = float(
+                os.environ.get("INTERPRETER_SESSION_LOCK_TIMEOUT", 300)
+            )
+        self.interpreter = interpreter
+        self.max_sessions = max_sessions
+        self.idle_timeout = idle_timeout
+        self.lock_timeout = lock_timeout
+        self.factory = factory or isolated_interpreter
+
+        self._sessions = OrderedDict()  # key -> Session, least recently used first
+        self._lock = threading.Lock()
+
+    def checkout(self, key):
+        """
+        Returns `key`'s session, creating it if needed, and locks it for the caller.
+        Blocks while another request is using the same session, and raises SessionBusy if it's
+        still in use after `lock_timeout` seconds. Pair with `release()`.
+        With `key=None`, returns a new session that no other request can check out.
+        """
+        ephemeral = key is None
+        if ephemeral:
+            key = f"ephemeral:{uuid.uuid4().hex}"
+
+        with self._lock:
+            closing = self._reap()
+            session = self._sessions.get(key)
+            if session is None and len(self._sessions) >= self.max_sessions:
+                closing += self._evict_idle(1)
+            if session is None and len(self._sessions) < self.max_sessions:
+                session = Session(key, None)
+                session.ephemeral = ephemeral
+                self._sessions[key] = session
+            if session is not None:
+                self._sessions.move_to_end(key)
+                session.users += 1
+
+        self._close_sessions(closing)
+        if session is None:
+            raise SessionPoolFull(
+                f"All {self.max_sessions} sessions are busy. Try again later."
+            )
+
+        if not session.lock.acquire(timeout=self.lock_timeout):
+            with self._lock:
+                session.users -= 1
+            raise SessionBusy(
+                f"This conversation has been busy for {self.lock_timeout:g} seconds. Try again later."
+            )
+        try:
+            if session.interpreter is None:
+                session.interpreter = self.factory(self.interpreter)
+        except BaseException:
+            session.lock.release()
+            with self._lock:
+                session.users -= 1
+                if self._sessions.get(key) is session:
+                    del self._sessions[key]
+            raise
+        return session
+
+    def release(self, session):
+        with self._lock:
+            session.users -= 1
+            session.last_used = time.monotonic()
+            if session.ephemeral and self._sessions.get(session.key) is session:
+                del self._sessions[session.key]
+        session.lock.release()
+        if session.ephemeral:
+            self._close_sessions([session])
+
+    @contextmanager
+    def session(self, key):
+        """
+        `checkout()` and `release()` as a context manager, which yields the session's interpreter.
+        """
+        session = self.checkout(key)
+        try:
+            yield session.interpreter
+        finally:
+            self.release(session)
+
+    def evict(self, key):
+        with self._lock:
+            session = self._sessions.pop(key, None)
+        if session is not None:
+            self._close_sessions([session])
+
+    def reap(self):
+        """
+        Closes sessions that have been idle for longer than `idle_timeout`.
+        (`checkout()` does this too, so calling it is optional.)
+        """
+        with self._lock:
+            closing = self._reap()
+        self._close_sessions(closing)
+        return len(closing)
+
+    def _reap(self):
+        now = time.monotonic()
+        expired = [
+            key
+            for key, session in self._sessions.items()
+            if session.users == 0 and now - session.last_used > self.idle_timeout
+        ]
+        return [self._sessions.pop(key) for key in expired]
+
+    def _evict_idle(self, count):
+        idle = [key for key, session in self._sessions.items() if session.users == 0]
+        return [self._sessions.pop(key) for key in idle[:count]]
+
+    def _close_sessions(self, sessions):
+        for session in sessions:
+            if session.interpreter is not None:
+                try:
+                    # Stops its kernels and memory worker, and deletes its output files
+                    session.interpreter.reset()
+                except Exception:
+                    pass
+
+    def stats(self):
+        with self._lock:
+            return {
+                "sessions": len(self._sessions),
+                "busy": sum(1 for session in self._sessions.values() if session.users),
+                "max_sessions": self.max_sessions,
+            }
+
+    def close(self):
+        with self._lock:
+            sessions = list(self._sessions.values())
+            self._sessions = OrderedDict()
+        self._close_sessions(sessions)
@@ -0,0 +1,95 @@
+import json
+import os
+import time
+
+
+class ChatCompletionStreamEncoder:
+    """
+    Encodes one streamed chat completion as OpenAI-style server-sent events.
+
+    Everything but the delta text is the same for every chunk, so the envelope is rendered once
+    and only the text is escaped per chunk. Small deltas are coalesced: text is held until
+    `coalesce_bytes` have built up or the oldest of it is `coalesce_window` seconds old (whichever
+    comes first), then sent as one event. `delta()` returns "" while it's holding text, and
+    `flush_due()` says when the caller should `flush()` even if no more text has arrived.
+
+    Configured with INTERPRETER_SSE_COALESCE_MS (default 15, 0 sends every delta on its own)
+    and INTERPRETER_SSE_COALESCE_BYTES (default 64).
+    """
+
+    def __init__(
+        self, completion_id, created, model, coalesce_window=None, coalesce_bytes=None
+    ):
+        if coalesce_window is None:
+            coalesce_window = (
+                float(os.environ.get("INTERPRETER_SSE_COALESCE_MS", 15)) / 1000
+            )
+        if coalesce_bytes is None:
+            coalesce_bytes = int(os.environ.get("INTERPRETER_SSE_COALESCE_BYTES", 64))
+        self.coalesce_window = coalesce_window
+        self.coalesce_bytes = coalesce_bytes
+
+        self.envelope = (
+            f'{{"id": {json.dumps(completion_id)}, "object": "chat.completion.chunk", '
+            f'"created": {int(created)}, "model": {json.dumps(model)}, "choices": [{{"index": 0, '
+        )
+        self._content_prefix = "data: " + self.envelope + '"delta": {"content": '
+        self._content_suffix = '}, "finish_reason": null}]}\n\n'
+
+        self._pending = []
+        self._pending_size = 0
+        self._pending_since = None
+
+    def role(self, role="assistant"):
+        return self._event({"role": role}, None)
+
+    def delta(self, content):
+        """
+        Adds text to the stream. Returns the events to send now, which may be "".
+        """
+        if not content:
+            return ""
+        if not self.coalesce_window or self.coalesce_bytes <= 1:
+            return self._content_event(content)
+
+        self._pending.append(content)
+        self._pending_size += len(content)
+        if self._pending_since is None:
+            self._pending_since = time.monotonic()
+        if self._pending_size >= self.coalesce_bytes or self.flush_due() == 0:
+            return self.flush()
+        return ""
+
+    def flush_due(self):
+        """
+        Seconds until held text should be flushed, 0 if it's overdue, or None if nothing is held.
+        """
+        if self._pending_since is None:
+            return None
+        return max(0, self.coalesce_window - (time.monotonic() - self._pending_since))
+
+    def flush(self):
+        if not self._pending:
+            return ""
+        content = "".join(self._pending)
+        self._pending = []
+        self._pending_size = 0
+        self._pending_since = None
+        return self._content_event(content)
+
+    def finish(self, finish_reason="stop", content=None):
+        """
+        Flushes held text and ends the completion.
+        """
+        delta = {} if content is None else {"content": content}
+        return self.flush() + self._event(delta, finish_reason)
+
+    def _content_event(self, content):
+        return self._content_prefix + json.dumps(content) + self._content_suffix
+
+    def _event(self, delta, finish_reason):
+        return (
+            "data: "
+            + self.envelope
+            + f'"delta": {json.dumps(delta)}, "finish_reason": {json.dumps(finish_reason)}}}]}}\n\n'
+        )
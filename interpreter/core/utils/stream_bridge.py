@@ -0,0 +1,131 @@
+import asyncio
+import concurrent.futures
+import threading
+
+_DONE = object()
+
+
+class StreamBridge:
+    """
+    Async iterator over a blocking iterator (like `interpreter.chat(stream=True)`), which runs it
+    in a worker thread so LLM reads and code execution don't block the event loop.
+
+    Items go through a queue of at most `max_queue_size`, so the worker waits for a slow client
+    instead of buffering the whole response. `close()` stops early: it sets `stop_event` (which
+    the interpreter checks between chunks and while running code) and the worker closes the
+    iterator. `on_done` runs in the worker once the iterator is finished with, however it ends.
+
+        bridge = StreamBridge(lambda: interpreter.chat(message, stream=True, display=False))
+        try:
+            async for chunk in bridge:
+                ...
+        finally:
+            bridge.close()
+    """
+
+    def __init__(self, make_iterator, stop_event=None, max_queue_size=64, on_done=None):
+        self.make_iterator = make_iterator
+        self.stop_event = stop_event
+        self.max_queue_size = max_queue_size
+        self.on_done = on_done
+
+        self._queue = None
+        self._loop = None
+        self._thread = None
+        self._closed = threading.Event()
+        self._finished = False
+        self._done_lock = threading.Lock()
+        self._done_called = False
+
+    def __aiter__(self):
+        if self._thread is None and not self._closed.is_set():
+            self._loop = asyncio.get_running_loop()
+            self._queue = asyncio.Queue(self.max_queue_size)
+            self._thread = threading.Thread(
+                target=self._worker, daemon=True, name="stream-bridge"
+            )
+            self._thread.start()
+        return self
+
+    async def __anext__(self):
+        return await self.next()
+
+    async def next(self, timeout=None):
+        """
+        The next item. With `timeout`, raises asyncio.TimeoutError if none arrives in time
+        (and the bridge carries on as if this wasn't called).
+        """
+        if self._thread is None:
+            self.__aiter__()
+        if self._queue is None or self._finished:
+            raise StopAsyncIteration
+        if timeout is None:
+            item, error = await self._queue.get()
+        else:
+            item, error = await asyncio.wait_for(self._queue.get(), timeout)
+        if item is _DONE:
+            self._finished = True
+            if error is not None:
+                raise error
+            raise StopAsyncIteration
+        return item
+
+    def close(self):
+        """
+        Stops the worker if it's still going. Safe to call more than once, and from `finally`.
+        """
+        if self._closed.is_set():
+            return
+        self._closed.set()
+        if self._thread is None:
+            self._done()  # Never started
+        elif not self._finished and self.stop_event is not None:
+            self.stop_event.set()
+
+    def _put(self, item):
+        """
+        Hands an item to the event loop, waiting while the queue is full.
+        Returns False if the consumer went away.
+        """
+        try:
+            future = asyncio.run_coroutine_threadsafe(self._queue.put(item), self._loop)
+        except RuntimeError:  # The event loop is gone
+            return False
+        while True:
+            try:
+                future.result(timeout=0.1)
+                return True
+            except concurrent.futures.TimeoutError:
+                if self._closed.is_set():
+                    future.cancel()
+                    return False
+            except concurrent.futures.CancelledError:
+                return False
+
+    def _worker(self):
+        iterator = None
+        try:
+            iterator = iter(self.make_iterator())
+            for item in iterator:
+                if self._closed.is_set() or not self._put((item, None)):
+                    break
+            else:
+                self._put((_DONE, None))
+        except BaseException as e:
+            self._put((_DONE, e))
+        finally:
+            close = getattr(iterator, "close", None)
+            if close is not None:
+                try:
+                    close()
+                except Exception:
+                    pass
+            self._done()
+
+    def _done(self):
+        with self._done_lock:
+            if self._done_called:
+                return
+            self._done_called = True
+        if self.on_done is not None:
+            self.on_done()
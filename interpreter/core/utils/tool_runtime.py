@@ -0,0 +1,45 @@
+import base64
+import io
+
+
+def run_code(interpreter, language, code, computer_api=False):
+    """
+    Runs `code` on `interpreter`'s computer directly, the way the LLM's code blocks are run, but
+    without the LLM round-trip, memory recall and extraction, or touching the conversation.
+    With `computer_api`, Python code can use `computer` (it's imported into the kernel first).
+
+    Returns {"output": text output, "images": [base64 images], "error": None or a message}.
+    """
+    if computer_api:
+        interpreter.computer.import_computer_api = (
+            True  # The terminal imports it once, before running
+        )
+    terminal = interpreter.computer.terminal
+    if terminal.get_language(language) is None:
+        return {
+            "output": "",
+            "images": [],
+            "error": f"`{language}` is not supported on this computer.",
+        }
+
+    output = []
+    images = []
+    for chunk in terminal.run(language, code, stream=True):
+        if chunk.get("type") == "console" and chunk.get("format") == "output":
+            output.append(str(chunk.get("content", "")))
+        elif chunk.get("type") == "image":
+            images.append(chunk.get("content"))
+    return {"output": "".join(output), "images": images, "error": None}
+
+
+def image_to_base64(image, image_format="PNG"):
+    buffered = io.BytesIO()
+    image.save(buffered, format=image_format)
+    return base64.b64encode(buffered.getvalue()).decode("utf-8")
+
+
+def screenshot_base64(computer):
+    """
+    Takes a screenshot with `computer` (without showing it) and returns it as a base64 PNG.
+    """
+    return image_to_base64(computer.display.screenshot(show=False))
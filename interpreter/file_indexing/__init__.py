@@ -7,6 +7,7 @@ class FileIndexer:
     def __init__(self, interpreter_instance):
         self.interpreter = interpreter_instance
         self.indexed_files = {}
+        self.batch_size = 32
         self.index_file_path = os.path.join(self.interpreter.conversation_history_path, "file_index.json")
         self._load_index()
 
@@ -24,35 +25,57 @@ class FileIndexer:
             print(f"Error: Directory not found: {directory_path}")
             return
 
+        # Files are embedded in batches, which is much faster than one encode() per file
+        batch = []
         for root, _, files in os.walk(directory_path):
             for file_name in files:
                 if extensions and not file_name.endswith(tuple(extensions)):
                     continue
                 
                 file_path = os.path.join(root, file_name)
-                self._index_file(file_path)
+                content = self._read_file(file_path)
+                if content is not None:
+                    batch.append((file_path, content))
+                if len(batch) >= self.batch_size:
+                    self._index_batch(batch)
+                    batch = []
+        if batch:
+            self._index_batch(batch)
         self._save_index()
 
-    def _index_file(self, file_path):
+    def _read_file(self, file_path):
         try:
             with open(file_path, 'r', encoding='utf-8') as f:
-                content = f.read()
-            
-            # Generate embedding for the content
-            embedding = self.interpreter.llm.embed(content)
+                return f.read()
+        except Exception as e:
+            print(f"Error indexing {file_path}: {e}")
+            return None
+
+    def _index_file(self, file_path):
+        content = self._read_file(file_path)
+        if content is not None:
+            self._index_batch([(file_path, content)])
+
+    def _index_batch(self, batch):
+        try:
+            contents = [content for _, content in batch]
+
+            # Generate embeddings for the contents
+            embeddings = self.interpreter.llm.embed(contents)
             
             # Store in semantic memory
-            self.interpreter.memory.add_semantic_memory(content, embedding)
+            self.interpreter.memory.add_semantic_memories(contents, embeddings)
             
             # Update indexed files record
-            self.indexed_files[file_path] = {
-                "last_indexed": datetime.now().isoformat(),
-                "size": os.path.getsize(file_path)
-            }
-            print(f"Indexed: {file_path}")
+            for file_path, _ in batch:
+                self.indexed_files[file_path] = {
+                    "last_indexed": datetime.now().isoformat(),
+                    "size": os.path.getsize(file_path)
+                }
+                print(f"Indexed: {file_path}")
 
         except Exception as e:
-            print(f"Error indexing {file_path}: {e}")
+            print(f"Error indexing {', '.join(file_path for file_path, _ in batch)}: {e}")
 
     def search_indexed_files(self, query, top_k=5):
         query_embedding = self.interpreter.llm.embed(query)
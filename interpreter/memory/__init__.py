@@ -1,6 +1,7 @@
 
 from .sqlite_chroma import SQLiteChromaBackend
 from .postgres_qdrant import PostgresQdrantBackend
+from .pipeline import MemoryPipeline
 
 class MemoryManager:
     def __init__(self, backend='sqlite_chroma', **kwargs):
@@ -20,5 +21,8 @@ class MemoryManager:
     def add_semantic_memory(self, text_chunk: str, embedding: list[float]):
         self.backend.add_semantic_memory(text_chunk, embedding)
 
+    def add_semantic_memories(self, text_chunks: list[str], embeddings: list[list[float]]):
+        self.backend.add_semantic_memories(text_chunks, embeddings)
+
     def search_semantic_memory(self, query_embedding: list[float], top_k: int) -> list[str]:
         return self.backend.search_semantic_memory(query_embedding, top_k)
@@ -18,3 +18,7 @@ class BaseMemoryBackend(ABC):
     @abstractmethod
     def search_semantic_memory(self, query_embedding: List[float], top_k: int) -> List[str]:
         pass
+
+    def add_semantic_memories(self, text_chunks: List[str], embeddings: List[List[float]]):
+        for text_chunk, embedding in zip(text_chunks, embeddings):
+            self.add_semantic_memory(text_chunk, embedding)
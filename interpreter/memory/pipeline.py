@@ -0,0 +1,183 @@
+import atexit
+import queue
+import threading
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+
+from ..core.computer.ai.ai import isolated_llm
+
+_STOP = object()  # Tells an extraction worker to finish what's queued and exit
+
+# Pipelines with a running extraction worker. Weak, so this doesn't keep them alive
+_pipelines = weakref.WeakSet()
+
+
+@atexit.register
+def _flush_pipelines(timeout=10):
+    for pipeline in list(_pipelines):
+        pipeline.flush(timeout=timeout)
+
+
+class MemoryPipeline:
+    """
+    Keeps memory work off the chat's critical path.
+
+    Recall is started as soon as the user's message arrives and runs while the system message is rendered.
+    `respond()` only waits for it (up to `recall_timeout` seconds) right before calling the LLM.
+
+    Extraction and embedding run on a background worker, which batches every exchange that queued up
+    while it was busy into a single LLM call and a single embedding call. `close()` stops the worker
+    (after it stores what's queued); it starts again if more is submitted.
+    """
+
+    def __init__(self, interpreter, recall_timeout=0.5, top_k=3, max_batch_size=8):
+        self.interpreter = interpreter
+        self.recall_timeout = recall_timeout
+        self.top_k = top_k
+        self.max_batch_size = max_batch_size
+
+        self._recall_executor = None
+        self._pending_recall = None
+
+        self._extraction_queue = queue.Queue()
+        self._worker = None
+        self._worker_lock = threading.Lock()
+
+    ## Recall
+
+    def prefetch_recall(self, text):
+        """
+        Starts searching semantic memory for `text` in the background.
+        """
+        if not isinstance(text, str) or not text.strip():
+            return
+        if self._recall_executor is None:
+            self._recall_executor = ThreadPoolExecutor(
+                max_workers=1, thread_name_prefix="memory-recall"
+            )
+        self._pending_recall = self._recall_executor.submit(self._recall, text)
+
+    def _recall(self, text):
+        return self.interpreter.memory.search_semantic_memory(
+            self.interpreter.llm.embed(text), top_k=self.top_k
+        )
+
+    def insert_recalled_memories(self):
+        """
+        Waits (at most recall_timeout) for a prefetched recall, and inserts its results before the last message.
+        """
+        future, self._pending_recall = self._pending_recall, None
+        if future is None:
+            return
+
+        try:
+            recalled_memories = future.result(timeout=self.recall_timeout)
+        except FutureTimeoutError:
+            if self.interpreter.verbose:
+                print("Memory recall timed out. Continuing without it.")
+            return
+        except Exception as e:
+            if self.interpreter.debug:
+                raise
+            if self.interpreter.verbose:
+                print(f"Memory recall failed: {e}")
+            return
+
+        if recalled_memories:
+            # Only the first message can be a system message, so this goes in as a user message
+            self.interpreter.messages.insert(
+                -1,
+                {
+                    "role": "user",
+                    "type": "message",
+                    "content": "Relevant memories:\n" + "\n".join(recalled_memories),
+                },
+            )
+
+    ## Extraction
+
+    def submit_extraction(self, text):
+        """
+        Queues a conversation snippet for memory extraction. Never blocks.
+        """
+        if not isinstance(text, str) or not text.strip():
+            return
+        self._ensure_worker()
+        self._extraction_queue.put(text)
+
+    def _ensure_worker(self):
+        with self._worker_lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(
+                    target=self._extraction_worker,
+                    args=(self._extraction_queue,),
+                    name="memory-extraction",
+                    daemon=True,
+                )
+                self._worker.start()
+                _pipelines.add(self)
+
+    def _extraction_worker(self, extraction_queue):
+        while True:
+            batch = [extraction_queue.get()]
+            # Take everything else that queued up while we were busy
+            while len(batch) < self.max_batch_size and batch[-1] is not _STOP:
+                try:
+                    batch.append(extraction_queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            stopping = batch[-1] is _STOP
+            try:
+                texts = batch[:-1] if stopping else batch
+                if texts:
+                    self._extract_and_store(texts)
+            except Exception as e:
+                if self.interpreter.verbose:
+                    print(f"Memory extraction failed: {e}")
+            finally:
+                for _ in batch:
+                    extraction_queue.task_done()
+            if stopping:
+                return
+
+    def _extract_and_store(self, batch):
+        # On its own copy of the LLM, so it can't interfere with (or count tokens toward) the chat
+        llm = isolated_llm(self.interpreter.llm)
+        memories = llm.extract_memories("\n\n---\n\n".join(batch))
+        if not memories:
+            return
+        embeddings = llm.embed(memories)
+        self.interpreter.memory.add_semantic_memories(memories, embeddings)
+
+    def flush(self, timeout=None):
+        """
+        Waits for queued extractions to be stored. Returns False if `timeout` ran out first.
+        """
+        if self._worker is None:
+            return True
+        done = threading.Event()
+
+        def wait():
+            self._extraction_queue.join()
+            done.set()
+
+        threading.Thread(target=wait, daemon=True).start()
+        return done.wait(timeout)
+
+    def close(self):
+        """
+        Stops the background threads. Queued extractions are still stored, but nothing waits for them.
+        """
+        with self._worker_lock:
+            if self._worker is not None:
+                # The worker drains its own queue, so later submissions get a fresh one (and worker)
+                self._extraction_queue.put(_STOP)
+                self._extraction_queue = queue.Queue()
+                self._worker = None
+            _pipelines.discard(self)
+        if self._recall_executor is not None:
+            self._recall_executor.shutdown(wait=False)
+            self._recall_executor = None
+        self._pending_recall = None
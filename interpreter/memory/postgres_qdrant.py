@@ -39,6 +39,11 @@ class PostgresQdrantBackend(BaseMemoryBackend):
         return result[0] if result else None
 
     def add_semantic_memory(self, text_chunk: str, embedding: List[float]):
+        self.add_semantic_memories([text_chunk], [embedding])
+
+    def add_semantic_memories(self, text_chunks: List[str], embeddings: List[List[float]]):
+        if not text_chunks:
+            return
         self.qdrant_client.upsert(
             collection_name=self.collection_name,
             points=[
@@ -47,6 +52,7 @@ class PostgresQdrantBackend(BaseMemoryBackend):
                     vector=embedding,
                     payload={"text": text_chunk}
                 )
+                for text_chunk, embedding in zip(text_chunks, embeddings)
             ]
         )
 
@@ -1,4 +1,5 @@
 import sqlite3
+import threading
 import numpy as np
 from sklearn.neighbors import NearestNeighbors
 from typing import Any, List
@@ -6,7 +7,9 @@ from .base import BaseMemoryBackend
 
 class SQLiteChromaBackend(BaseMemoryBackend):
     def __init__(self, db_path='memory.db'):
-        self.conn = sqlite3.connect(db_path)
+        # Memories are stored from a background thread (see MemoryPipeline), so share the connection behind a lock
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._lock = threading.RLock()
         self.cursor = self.conn.cursor()
         self.cursor.execute('''
             CREATE TABLE IF NOT EXISTS structured_memory (
@@ -37,26 +40,39 @@ class SQLiteChromaBackend(BaseMemoryBackend):
             self.nn_model.fit(np.array(self.embeddings_cache))
 
     def save_structured_memory(self, key: str, value: Any):
-        self.cursor.execute("INSERT OR REPLACE INTO structured_memory (key, value) VALUES (?, ?)", (key, str(value)))
-        self.conn.commit()
+        with self._lock:
+            self.cursor.execute("INSERT OR REPLACE INTO structured_memory (key, value) VALUES (?, ?)", (key, str(value)))
+            self.conn.commit()
 
     def get_structured_memory(self, key: str) -> Any:
-        self.cursor.execute("SELECT value FROM structured_memory WHERE key = ?", (key,))
-        result = self.cursor.fetchone()
+        with self._lock:
+            self.cursor.execute("SELECT value FROM structured_memory WHERE key = ?", (key,))
+            result = self.cursor.fetchone()
         return result[0] if result else None
 
     def add_semantic_memory(self, text_chunk: str, embedding: List[float]):
-        embedding_np = np.array(embedding, dtype=np.float32)
-        self.cursor.execute("INSERT INTO semantic_memory (text_chunk, embedding) VALUES (?, ?)", (text_chunk, embedding_np.tobytes()))
-        self.conn.commit()
-        self.embeddings_cache.append(embedding_np)
-        self.texts_cache.append(text_chunk)
-        self.nn_model = NearestNeighbors(n_neighbors=min(len(self.embeddings_cache), 5), metric='cosine')
-        self.nn_model.fit(np.array(self.embeddings_cache))
+        self.add_semantic_memories([text_chunk], [embedding])
+
+    def add_semantic_memories(self, text_chunks: List[str], embeddings: List[List[float]]):
+        if not text_chunks:
+            return
+        embeddings_np = [np.array(embedding, dtype=np.float32) for embedding in embeddings]
+        with self._lock:
+            self.cursor.executemany(
+                "INSERT INTO semantic_memory (text_chunk, embedding) VALUES (?, ?)",
+                [(text_chunk, embedding_np.tobytes()) for text_chunk, embedding_np in zip(text_chunks, embeddings_np)],
+            )
+            self.conn.commit()
+            self.embeddings_cache.extend(embeddings_np)
+            self.texts_cache.extend(text_chunks)
+            # Refit once per batch, not once per memory
+            self.nn_model = NearestNeighbors(n_neighbors=min(len(self.embeddings_cache), 5), metric='cosine')
+            self.nn_model.fit(np.array(self.embeddings_cache))
 
     def search_semantic_memory(self, query_embedding: List[float], top_k: int) -> List[str]:
-        if not self.embeddings_cache:
-            return []
-        query_embedding_np = np.array(query_embedding, dtype=np.float32).reshape(1, -1)
-        distances, indices = self.nn_model.kneighbors(query_embedding_np, n_neighbors=min(len(self.embeddings_cache), top_k))
-        return [self.texts_cache[i] for i in indices[0]]
\ No newline at end of file
+        with self._lock:
+            if not self.embeddings_cache:
+                return []
+            query_embedding_np = np.array(query_embedding, dtype=np.float32).reshape(1, -1)
+            distances, indices = self.nn_model.kneighbors(query_embedding_np, n_neighbors=min(len(self.embeddings_cache), top_k))
+            return [self.texts_cache[i] for i in indices[0]]
@@ -6,7 +6,7 @@ import time
 from datetime import datetime
 
 from ..core.utils.system_debug_info import system_info
-from .utils.count_tokens import count_messages_tokens
+from .utils.count_tokens import count_messages_tokens, token_cost
 from .utils.export_to_markdown import export_to_markdown
 
 
@@ -175,20 +175,20 @@ def handle_count_tokens(self, prompt):
 
     outputs = []
 
-    if len(self.messages) == 0:
-        (conversation_tokens, conversation_cost) = count_messages_tokens(
-            messages=messages, model=self.llm.model
+    if self.llm.context_tokens:
+        # The token ledger already knows what the last request cost, no need to re-tokenize
+        conversation_tokens = self.llm.context_tokens
+        conversation_cost = token_cost(conversation_tokens, model=self.llm.model)
+        outputs.append(
+            f"> Tokens sent with the last request as context: {conversation_tokens} (Estimated Cost: ${conversation_cost})"
         )
     else:
         (conversation_tokens, conversation_cost) = count_messages_tokens(
             messages=messages, model=self.llm.model
         )
-
-    outputs.append(
-        (
+        outputs.append(
             f"> Tokens sent with next request as context: {conversation_tokens} (Estimated Cost: ${conversation_cost})"
         )
-    )
 
     if prompt:
         (prompt_tokens, prompt_cost) = count_messages_tokens(
@@ -108,6 +108,7 @@ Include `computer.display.view()` after a 2 second delay at the end of _every_ c
 6. What options could you take next to get closer to your goal?
 
 {{
+# refresh: always
 # Add window information
 
 try:
@@ -0,0 +1,174 @@
+import copy
+import os
+import threading
+import time
+
+from . import profiles
+from .profiles import OI_VERSION, default_profiles_names, oi_default_profiles_path
+
+
+class CompiledProfile:
+    """
+    A profile, read and parsed once. `settings` are (attribute path, value) pairs, and a Python
+    profile's script is compiled ahead of time, so applying it to an interpreter is just setattrs
+    (and running the script).
+    """
+
+    __slots__ = ("name", "path", "version", "settings", "languages", "code")
+
+    def __init__(self, name, path, version, settings, languages, code):
+        object.__setattr__(self, "name", name)
+        object.__setattr__(self, "path", path)
+        object.__setattr__(
+            self, "version", version
+        )  # File mtime and size, or fetch time
+        object.__setattr__(self, "settings", settings)
+        object.__setattr__(self, "languages", languages)
+        object.__setattr__(self, "code", code)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("Compiled profiles can't be changed")
+
+    def apply(self, interpreter):
+        if self.code is not None:
+            scope = {"interpreter": interpreter}
+            exec(self.code, scope, scope)
+
+        if self.languages is not None:
+            interpreter.computer.languages = [
+                language
+                for language in interpreter.computer.languages
+                if language.name.lower() in self.languages
+            ]
+
+        for path, value in self.settings:
+            obj = interpreter
+            for key in path[:-1]:
+                obj = getattr(obj, key)
+            if isinstance(value, (list, dict, set)):
+                value = copy.deepcopy(value)  # Don't share it between interpreters
+            setattr(obj, path[-1], value)
+
+        return interpreter
+
+
+def compile_profile(name, path, version, profile):
+    """
+    Turns a profile dict (as `get_profile` returns it) into a CompiledProfile.
+    """
+    profile = dict(profile or {})
+    if profile.get("version", OI_VERSION) != OI_VERSION:
+        raise ValueError(
+            f"Profile '{name}' uses an old format. Run `interpreter --profile {name}` once to migrate it."
+        )
+
+    code = None
+    if "start_script" in profile:
+        code = compile(profile.pop("start_script"), path, "exec")
+
+    languages = None
+    computer = profile.get("computer")
+    if isinstance(computer, dict) and "languages" in computer:
+        profile["computer"] = dict(computer)
+        languages = tuple(
+            language.lower() for language in profile["computer"].pop("languages")
+        )
+
+    settings = []
+
+    def flatten(prefix, values):
+        for key, value in values.items():
+            if isinstance(value, dict):
+                if key == "wtf":  # The wtf command has a special part of the profile
+                    continue
+                flatten(prefix + (key,), value)
+            else:
+                settings.append((prefix + (key,), value))
+
+    profile.pop("version", None)
+    flatten((), profile)
+
+    return CompiledProfile(name, path, version, tuple(settings), languages, code)
+
+
+class ProfileRegistry:
+    """
+    Compiles each profile once and hands out the compiled version, so servers can apply a profile
+    on every request without re-reading, re-parsing or re-downloading it.
+
+    Local profiles are re-read when their file changes (by mtime and size). Profiles loaded from a
+    URL are kept for `url_ttl` seconds.
+
+    Unlike `profiles.profile()`, this never asks questions or renames files, so it's safe to use
+    without a terminal: profiles in an old format raise ValueError instead of offering a migration.
+    """
+
+    def __init__(self, url_ttl=300):
+        self.url_ttl = url_ttl
+        self._profiles = {}  # Resolved name -> CompiledProfile
+        self._lock = threading.Lock()
+
+    def resolve(self, name):
+        """
+        Returns (name, path) for a profile name, shorthand (like "fast") or URL.
+        Default profiles come from the package, everything else from the profiles directory.
+        """
+        name_without_extension = os.path.splitext(name)[0]
+        for default_name in default_profiles_names:
+            if name_without_extension == os.path.splitext(default_name)[0]:
+                name = default_name
+                break
+
+        if name in default_profiles_names and name not in ["default", "default.yaml"]:
+            return name, os.path.join(oi_default_profiles_path, name)
+        user_path = os.path.join(profiles.profile_dir, name)
+        if name in ["default", "default.yaml"] and not os.path.isfile(user_path):
+            return "default.yaml", os.path.join(
+                oi_default_profiles_path, "default.yaml"
+            )
+        return name, user_path
+
+    def get(self, name):
+        name, path = self.resolve(name)
+        is_file = os.path.isfile(path)
+        if is_file:
+            stat = os.stat(path)
+            version = (stat.st_mtime_ns, stat.st_size)
+        else:
+            version = None
+
+        with self._lock:
+            compiled = self._profiles.get(name)
+        if compiled is not None and compiled.path == path:
+            if is_file and compiled.version == version:
+                return compiled
+            if (
+                not is_file
+                and not isinstance(compiled.version, tuple)
+                and time.monotonic() - compiled.version < self.url_ttl
+            ):
+                return compiled
+
+        if is_file and path.startswith(oi_default_profiles_path):
+            profile = profiles.get_default_profile(name)
+        else:
+            profile = profiles.get_profile(name, path)  # Local, or downloaded
+        if not is_file:
+            version = time.monotonic()
+
+        compiled = compile_profile(name, path, version, profile)
+        with self._lock:
+            self._profiles[name] = compiled
+        return compiled
+
+    def apply(self, interpreter, name):
+        """
+        Applies profile `name` to `interpreter` and returns the CompiledProfile.
+        """
+        compiled = self.get(name)
+        compiled.apply(interpreter)
+        return compiled
+
+    def clear(self):
+        with self._lock:
+            self._profiles = {}
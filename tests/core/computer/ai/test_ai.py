@@ -0,0 +1,78 @@
+import threading
+import time
+import unittest
+from unittest import mock
+
+from interpreter.core.computer.ai.ai import Ai, query_reduce_chunks
+
+
+class FakeLlm:
+    """
+    Answers every request with "summary(<number of words>)", and records how many ran at once.
+    (In `stats`, which the copies made for each request share.)
+    """
+
+    model = "fake-model"
+    _is_loaded = True
+
+    def __init__(self):
+        self.token_ledger = mock.Mock()
+        self.stats = {"in_flight": 0, "max_in_flight": 0, "requests": 0}
+        self.lock = threading.Lock()
+
+    def run(self, messages):
+        assert messages[0]["role"] == "system"
+        stats = self.stats
+        with self.lock:
+            stats["in_flight"] += 1
+            stats["requests"] += 1
+            stats["max_in_flight"] = max(stats["max_in_flight"], stats["in_flight"])
+        time.sleep(0.01)
+        with self.lock:
+            stats["in_flight"] -= 1
+        words = len(messages[1]["content"].split())
+        yield {"type": "message", "content": f"summary({words})"}
+
+
+class TestAiMapReduce(unittest.TestCase):
+    def setUp(self):
+        self.computer = mock.Mock()
+        self.computer.interpreter.messages = ["untouched"]
+        self.computer.interpreter.llm = FakeLlm()
+        self.ai = Ai(self.computer)
+
+    def test_summarize_is_bounded_and_isolated(self):
+        self.ai.chunk_size = 100
+        self.ai.max_concurrency = 3
+        progress = []
+        self.ai.progress_callback = lambda *args: progress.append(args)
+
+        summary = self.ai.summarize("word " * 20000)
+
+        self.assertTrue(summary.startswith("summary("))
+        llm = self.computer.interpreter.llm
+        self.assertEqual(llm.stats["max_in_flight"], 3)
+        self.assertEqual(self.computer.interpreter.messages, ["untouched"])
+
+        stages = [stage for stage, _, _ in progress]
+        self.assertEqual(stages[0], "map")
+        self.assertIn("reduce 1", stages)
+        map_progress = [args for args in progress if args[0] == "map"]
+        self.assertEqual(map_progress[-1][1], map_progress[-1][2])
+
+    def test_reduce_terminates(self):
+        llm = self.computer.interpreter.llm
+
+        self.assertEqual(query_reduce_chunks([], llm, 100, "q"), "")
+        self.assertEqual(query_reduce_chunks(["only"], llm, 100, "q"), "only")
+
+        # Responses too big to pack together are merged in pairs, and levels are bounded
+        big = ["x " * 1000] * 8
+        result = query_reduce_chunks(big, llm, 10, "q", max_levels=2)
+        self.assertTrue(result.startswith("summary("))
+        # 8 -> 4 -> 2 pairwise, then one final request
+        self.assertEqual(llm.stats["requests"], 4 + 2 + 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,74 @@
+import threading
+import time
+import unittest
+
+from interpreter.core.computer.terminal.languages.fork_server import (
+    ForkServer,
+    fork_server_supported,
+)
+
+
+def output_of(chunks):
+    return "".join(
+        chunk["content"] for chunk in chunks if chunk.get("format") == "output"
+    )
+
+
+@unittest.skipUnless(fork_server_supported(), "The fork server needs os.fork()")
+class TestForkServer(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ForkServer(preload_modules=["json"])
+        cls.server.start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.close()
+
+    def test_sessions_are_fast_and_isolated(self):
+        started = time.monotonic()
+        first = self.server.session()
+        self.assertLess(time.monotonic() - started, 1)
+        second = self.server.session()
+
+        list(first.run("x = 1"))
+        self.assertEqual(output_of(first.run("print(x)")), "1\n")
+        self.assertIn("NameError", output_of(second.run("x")))
+        self.assertNotEqual(first.pid, second.pid)
+
+        first.close()
+        second.close()
+
+    def test_chunks(self):
+        session = self.server.session()
+
+        chunks = list(session.run("import json\nprint('hi')\njson.dumps([1])"))
+        self.assertEqual(output_of(chunks), "hi\n'[1]'")
+        self.assertIn(
+            {"type": "console", "format": "active_line", "content": 1}, chunks
+        )
+
+        error = output_of(session.run("def f():\n    1 / 0\nf()"))
+        self.assertIn("ZeroDivisionError", error)
+        self.assertNotIn("fork_server_process", error)
+
+        session.close()
+
+    def test_interrupt_and_abandoned_runs(self):
+        session = self.server.session()
+        chunks = session.run("import time\nprint('start')\ntime.sleep(30)")
+        self.assertEqual(next(chunks)["format"], "active_line")
+
+        threading.Timer(0.2, session.interrupt).start()
+        self.assertIn("KeyboardInterrupt", output_of(chunks))
+
+        # Stop reading part way, the next run shouldn't see the rest
+        abandoned = session.run("print('a')\nprint('b')")
+        next(abandoned)
+        self.assertEqual(output_of(session.run("print('c')")), "c\n")
+
+        session.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
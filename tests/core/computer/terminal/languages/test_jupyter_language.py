@@ -0,0 +1,265 @@
+import itertools
+import os
+import queue
+import threading
+import time
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+from interpreter.core.computer.terminal.languages import jupyter_language
+from interpreter.core.computer.terminal.languages.jupyter_language import (
+    JupyterLanguage,
+)
+
+
+def iopub_message(parent_msg_id, msg_type, content):
+    return {
+        "header": {"msg_type": msg_type},
+        "msg_type": msg_type,
+        "parent_header": {"msg_id": parent_msg_id},
+        "content": content,
+    }
+
+
+def stream(parent_msg_id, text):
+    return iopub_message(parent_msg_id, "stream", {"name": "stdout", "text": text})
+
+
+def status(parent_msg_id, execution_state):
+    return iopub_message(parent_msg_id, "status", {"execution_state": execution_state})
+
+
+class FakeKernelClient:
+    """
+    Answers every execute with the iopub messages `reply(msg_id, code)` returns,
+    the way a kernel would: on one channel, tagged with the request's msg_id.
+    """
+
+    def __init__(self):
+        self.iopub = queue.Queue()
+        self.iopub_channel = SimpleNamespace(get_msg=self.get_msg)
+        self.executed = []
+        self.inputs = []
+        self._msg_ids = itertools.count(1)
+        self.reply = lambda msg_id, code: [
+            status(msg_id, "busy"),
+            status(msg_id, "idle"),
+        ]
+
+    def get_msg(self, timeout=None):
+        return self.iopub.get(timeout=timeout)
+
+    def execute(self, code):
+        msg_id = f"msg-{next(self._msg_ids)}"
+        self.executed.append(code)
+        for message in self.reply(msg_id, code):
+            self.iopub.put(message)
+        return msg_id
+
+    def input(self, text):
+        self.inputs.append(text)
+
+    def is_alive(self):
+        return True
+
+    def stop_channels(self):
+        pass
+
+
+class TestIopubDispatch(unittest.TestCase):
+    def setUp(self):
+        self.kc = FakeKernelClient()
+        self.km = mock.Mock()
+        with mock.patch.object(
+            jupyter_language.kernel_pool, "acquire", return_value=(self.km, self.kc)
+        ):
+            self.language = JupyterLanguage(
+                SimpleNamespace(interpreter=SimpleNamespace())
+            )
+        self.language.active_line_mode = "print"  # No sampler to install first
+
+    def tearDown(self):
+        self.language.terminate()
+
+    def output(self, chunks):
+        return "".join(
+            chunk["content"] for chunk in chunks if chunk.get("format") == "output"
+        )
+
+    def test_messages_are_routed_by_parent_msg_id(self):
+        self.kc.reply = lambda msg_id, code: []
+        first_id, first_queue = self.language._execute_code("first")
+        second_id, second_queue = self.language._execute_code("second")
+
+        for message in [
+            stream(second_id, "2a"),
+            stream(first_id, "1a"),
+            stream("someone-else", "x"),
+            stream(first_id, "1b"),
+            stream(second_id, "2b"),
+        ]:
+            self.kc.iopub.put(message)
+
+        def texts(message_queue, count):
+            return [
+                message_queue.get(timeout=2)["content"]["text"] for _ in range(count)
+            ]
+
+        self.assertEqual(texts(first_queue, 2), ["1a", "1b"])
+        self.assertEqual(texts(second_queue, 2), ["2a", "2b"])
+        time.sleep(0.1)
+        self.assertTrue(first_queue.empty())
+        self.assertTrue(second_queue.empty())
+
+    def test_run_finishes_on_idle(self):
+        self.kc.reply = lambda msg_id, code: [
+            status(msg_id, "busy"),
+            stream(msg_id, "hello\n"),
+            status(msg_id, "idle"),
+            stream(msg_id, "after idle\n"),  # Never waited for
+        ]
+
+        started = time.monotonic()
+        chunks = list(self.language.run("print('hello')"))
+        self.assertLess(time.monotonic() - started, 0.5)
+        self.assertEqual(self.output(chunks), "hello\n")
+        self.assertTrue(self.language.finish_flag)
+        self.km.interrupt_kernel.assert_not_called()
+        self.assertEqual(self.language._execution_queues, {})
+
+    def test_stray_messages_from_an_earlier_execution_are_discarded(self):
+        self.kc.reply = lambda msg_id, code: [
+            # Left over from an execution that was stopped before its kernel went idle
+            stream("msg-earlier", "stale output\n"),
+            status("msg-earlier", "idle"),
+            status(msg_id, "busy"),
+            stream(msg_id, "fresh output\n"),
+            status(msg_id, "idle"),
+        ]
+
+        chunks = list(self.language.run("print('fresh output')"))
+        self.assertEqual(self.output(chunks), "fresh output\n")
+
+        # And nothing from this run leaks into the next one
+        self.kc.reply = lambda msg_id, code: [
+            stream("msg-1", "late\n"),
+            stream(msg_id, "next\n"),
+            status(msg_id, "idle"),
+        ]
+        self.assertEqual(self.output(self.language.run("print('next')")), "next\n")
+
+    def test_stop_interrupts_the_kernel(self):
+        self.kc.reply = lambda msg_id, code: [status(msg_id, "busy")]  # Never goes idle
+        timer = threading.Timer(0.2, self.language.stop)
+        timer.start()
+        list(self.language.run("while True: pass"))
+        timer.join()
+        self.km.interrupt_kernel.assert_called_once()
+
+    def test_input_patience_goes_through_the_response_cache(self):
+        def chunk(content):
+            return SimpleNamespace(
+                choices=[SimpleNamespace(delta=SimpleNamespace(content=content))]
+            )
+
+        llm = SimpleNamespace(
+            model="gpt-4o",
+            api_key=None,
+            completions=mock.Mock(),
+            router=mock.Mock(),
+            response_cache=mock.Mock(),
+        )
+        llm.response_cache.completions.return_value = iter(
+            [chunk("Type <input>y"), chunk("</input>"), chunk(None)]
+        )
+        self.language.computer.interpreter.messages = []
+        self.language.computer.interpreter.llm = llm
+        self.language.last_output_time = 0
+        self.language.last_output_message_time = 0
+
+        self.language._check_input_patience()
+
+        llm.router.route.assert_called_once_with(llm.completions)
+        args, params = llm.response_cache.completions.call_args
+        self.assertEqual(args, (llm.router.route.return_value,))
+        self.assertEqual(params["temperature"], 0)
+        self.assertEqual(self.kc.inputs, ["y"])
+
+
+class TestActiveLineModes(unittest.TestCase):
+    """
+    On a real kernel: "sample" (the default) reports active lines from a trace hook in the kernel,
+    and "print" (INTERPRETER_ACTIVE_LINE_MODE=print) still inserts a print before every statement.
+    """
+
+    code = (
+        "import time\nfor i in range(5):\n    time.sleep(0.1)\n    x = i\nprint('done')"
+    )
+
+    def start(self, mode):
+        with mock.patch.dict(os.environ, {"INTERPRETER_ACTIVE_LINE_MODE": mode}):
+            language = JupyterLanguage(SimpleNamespace(interpreter=SimpleNamespace()))
+        self.addCleanup(language.terminate)
+        return language
+
+    def run_code(self, language, code):
+        chunks = list(language.run(code))
+        active_lines = [
+            chunk["content"] for chunk in chunks if chunk["format"] == "active_line"
+        ]
+        output = "".join(
+            chunk["content"] for chunk in chunks if chunk["format"] == "output"
+        )
+        return active_lines, output
+
+    def test_sample_mode_reports_active_lines(self):
+        language = self.start("sample")
+        self.assertEqual(language.preprocess_code(self.code), self.code)
+
+        active_lines, output = self.run_code(language, self.code)
+        self.assertTrue(language._active_line_sampler_enabled)
+        self.assertEqual(output, "done\n")
+        self.assertTrue(active_lines)
+        self.assertTrue(set(active_lines) <= {1, 2, 3, 4, 5})
+        self.assertTrue(set(active_lines) & {2, 3, 4})  # Sampled while in the loop
+        _, output = self.run_code(language, "import sys\nprint(sys.gettrace() is None)")
+        self.assertEqual(output, "False\n")
+
+        # Library code isn't traced, so only the cell's own lines are ever reported
+        active_lines, output = self.run_code(
+            language, "import json\nprint(json.dumps([1]))"
+        )
+        self.assertEqual(output, "[1]\n")
+        self.assertTrue(set(active_lines) <= {1, 2})
+
+    def test_print_mode_is_unchanged(self):
+        language = self.start("print")
+        code = "a = 1\nprint(a)\nb = a + 1\nprint(b)"
+        preprocessed = language.preprocess_code(code)
+        for line in range(1, 5):
+            self.assertIn(f"##active_line{line}##", preprocessed)
+
+        active_lines, output = self.run_code(language, code)
+        self.assertIsNone(language._active_line_sampler_enabled)  # Never installed
+        self.assertEqual(output, "1\n2\n")
+        self.assertEqual(active_lines[-1], 4)
+        self.assertEqual(active_lines, sorted(active_lines))
+
+    def test_switching_to_print_mode_turns_the_sampler_off(self):
+        language = self.start("sample")
+        self.run_code(language, "x = 1")
+        self.assertTrue(language._active_line_sampler_enabled)
+
+        language.active_line_mode = "print"
+        active_lines, output = self.run_code(language, self.code)
+        self.assertFalse(language._active_line_sampler_enabled)
+        self.assertEqual(output, "done\n")
+        self.assertEqual(active_lines[-1], 5)
+        # The kernel no longer traces cells, so only the inserted prints report lines
+        _, output = self.run_code(language, "import sys\nprint(sys.gettrace() is None)")
+        self.assertEqual(output, "True\n")
+
+
+if __name__ == "__main__":
+    unittest.main()
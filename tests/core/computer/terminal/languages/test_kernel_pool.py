@@ -0,0 +1,86 @@
+import threading
+import time
+import unittest
+from unittest import mock
+
+from interpreter.core.computer.terminal.languages.kernel_pool import KernelPool
+
+
+class FakeKernelPool(KernelPool):
+    """
+    Starts fake kernels, which take `startup_time` seconds like a real one would.
+    """
+
+    startup_time = 0.2
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.started = 0
+        self._count_lock = threading.Lock()
+
+    def start_kernel(self):
+        time.sleep(self.startup_time)
+        with self._count_lock:
+            self.started += 1
+        km = mock.Mock()
+        km.is_alive.return_value = True
+        return km, mock.Mock()
+
+
+class TestKernelPool(unittest.TestCase):
+    def wait_until_ready(self, pool, count):
+        deadline = time.monotonic() + 5
+        while pool.stats()["ready"] < count and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+    def test_acquire_is_instant_once_warm_and_refills(self):
+        pool = FakeKernelPool(size=2, preload_modules=[])
+        pool.fill()
+        self.wait_until_ready(pool, 2)
+
+        started = time.monotonic()
+        first = pool.acquire()
+        second = pool.acquire()
+        self.assertLess(time.monotonic() - started, 0.1)
+        self.assertIsNot(first, second)
+
+        self.wait_until_ready(pool, 2)
+        self.assertEqual(pool.stats(), {"size": 2, "ready": 2, "starting": 0})
+        self.assertEqual(pool.started, 4)
+        pool.close()
+
+    def test_waits_for_a_kernel_that_is_already_starting(self):
+        pool = FakeKernelPool(size=1, preload_modules=[])
+        pool.acquire()
+        # The first kernel, plus one refill
+        self.wait_until_ready(pool, 1)
+        self.assertEqual(pool.started, 2)
+        pool.close()
+
+    def test_disabled_pool_starts_in_the_foreground(self):
+        pool = FakeKernelPool(size=0, preload_modules=[])
+        pool.acquire()
+        self.assertEqual(pool.started, 1)
+        self.assertEqual(pool.stats()["starting"], 0)
+
+    def test_dead_kernels_are_skipped(self):
+        pool = FakeKernelPool(size=1, preload_modules=[])
+        pool.fill()
+        self.wait_until_ready(pool, 1)
+        pool._ready[0][0].is_alive.return_value = False
+
+        km, _ = pool.acquire()
+        self.assertTrue(km.is_alive())
+        pool.close()
+
+    def test_setup_code_preloads_modules(self):
+        pool = KernelPool(size=0, preload_modules=["numpy", "pandas"])
+        code = pool.setup_code()
+        self.assertIn("%matplotlib inline", code)
+        self.assertIn("import numpy", code)
+        self.assertIn("import pandas", code)
+        compile(code.replace("%matplotlib inline", ""), "<setup>", "exec")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,42 @@
+import platform
+import statistics
+import time
+import unittest
+
+from interpreter.core.computer.terminal.languages.shell import Shell
+
+
+@unittest.skipIf(platform.system() == "Windows", "Benchmark uses a POSIX shell")
+class TestShellLatency(unittest.TestCase):
+    def setUp(self):
+        self.shell = Shell()
+
+    def tearDown(self):
+        self.shell.terminate()
+
+    def run_code(self, code):
+        return [chunk for chunk in self.shell.run(code)]
+
+    def test_output(self):
+        output = self.run_code("echo hi")
+        content = "".join(
+            chunk["content"] for chunk in output if chunk["format"] == "output"
+        )
+        self.assertEqual(content.strip(), "hi")
+
+    def test_trivial_command_latency(self):
+        # Warm up (starts the process)
+        self.run_code("echo warmup")
+
+        timings = []
+        for _ in range(20):
+            start = time.perf_counter()
+            self.run_code("echo hi")
+            timings.append(time.perf_counter() - start)
+
+        # Trivial commands should return in milliseconds, not wait on a polling floor
+        self.assertLess(statistics.median(timings), 0.1)
+
+
+if __name__ == "__main__":
+    unittest.main()
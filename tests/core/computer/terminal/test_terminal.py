@@ -0,0 +1,89 @@
+import threading
+import time
+import unittest
+from unittest import mock
+
+from interpreter.core.computer.terminal.terminal import StreamedCode, Terminal
+
+
+class SlowLanguage:
+    name = "Slow"
+    instances = 0
+
+    def __init__(self):
+        time.sleep(0.2)  # Like a kernel starting up
+        SlowLanguage.instances += 1
+        self.prepared = []
+        self.started = threading.Event()
+
+    def prepare(self, code):
+        self.prepared.append(code)
+
+    def run(self, code):
+        yield {"type": "console", "format": "output", "content": code}
+
+    def stop(self):
+        pass
+
+    def terminate(self):
+        pass
+
+
+class TestTerminalWarmUp(unittest.TestCase):
+    def setUp(self):
+        SlowLanguage.instances = 0
+        self.terminal = Terminal(mock.Mock())
+        self.terminal.languages = [SlowLanguage]
+
+    def tearDown(self):
+        self.terminal.terminate()
+
+    def test_warm_up_starts_the_language_in_the_background(self):
+        started = time.monotonic()
+        self.terminal.warm_up("slow", "print(1)")
+        self.assertLess(time.monotonic() - started, 0.1)
+
+        output = self.terminal.run("slow", "print(1)")
+        self.assertEqual(output[0]["content"], "print(1)")
+        self.assertEqual(SlowLanguage.instances, 1)
+
+    def test_prepares_the_latest_code(self):
+        self.terminal.run("slow", "")  # Already running
+        for code in ["a", "a\n", "a\nb"]:
+            self.terminal.warm_up("Slow ", code)
+
+        deadline = time.monotonic() + 2
+        language = self.terminal._active_languages["slow"]
+        while self.terminal._warm_up_thread is not None and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(language.prepared[-1], "a\nb")
+
+    def test_unknown_languages_and_disabling(self):
+        self.terminal.warm_up("text", "hello")
+        self.terminal.speculative_warm_up = False
+        self.terminal.warm_up("slow", "print(1)")
+        time.sleep(0.3)
+        self.assertEqual(SlowLanguage.instances, 0)
+
+
+class TestStreamedCode(unittest.TestCase):
+    def test_code_is_handed_over_at_line_ends_and_throttled(self):
+        terminal = mock.Mock()
+        streamed_code = StreamedCode(terminal, "python", interval=0)
+        terminal.warm_up.assert_called_once_with("python")
+
+        for token in ["for i", " in range(3):", "\n", "    print", "(i)"]:
+            streamed_code.append(token)
+        self.assertEqual(
+            terminal.warm_up.call_args_list[1:],
+            [mock.call("python", "for i in range(3):\n")],
+        )
+        self.assertEqual(streamed_code.code, "for i in range(3):\n    print(i)")
+
+        streamed_code.interval = 60
+        streamed_code.append("\nprint('done')\n")
+        self.assertEqual(terminal.warm_up.call_count, 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,80 @@
+import base64
+import io
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import numpy as np
+from PIL import Image
+
+from interpreter.core.computer.vision.vision import Vision
+
+
+def png_base64(color):
+    buffered = io.BytesIO()
+    Image.new("RGB", (8, 8), color).save(buffered, format="PNG")
+    return base64.b64encode(buffered.getvalue()).decode("utf-8")
+
+
+class TestVisionCaching(unittest.TestCase):
+    def setUp(self):
+        self.vision = Vision(mock.Mock())
+        self.vision.easyocr = mock.Mock()
+        self.vision.easyocr.readtext.return_value = [
+            ([], "hello", 0.9),
+            ([], "world", 0.8),
+        ]
+
+    def test_ocr_reads_arrays_and_never_writes_files(self):
+        with mock.patch.object(tempfile, "NamedTemporaryFile") as temporary_file:
+            text = self.vision.ocr(base_64=png_base64((255, 0, 0)))
+
+        self.assertEqual(text, "hello world")
+        temporary_file.assert_not_called()
+
+        pixels = self.vision.easyocr.readtext.call_args[0][0]
+        self.assertIsInstance(pixels, np.ndarray)
+        self.assertEqual(pixels.shape, (8, 8, 3))
+        self.assertEqual(
+            tuple(pixels[0, 0]), (0, 0, 255)
+        )  # BGR, like EasyOCR reads files
+
+    def test_identical_images_are_only_ocrd_once(self):
+        red = png_base64((255, 0, 0))
+        self.vision.ocr(base_64=red)
+        self.vision.ocr(lmc={"type": "image", "format": "base64.png", "content": red})
+        self.vision.ocr(pil_image=Image.open(io.BytesIO(base64.b64decode(red))))
+        self.assertEqual(
+            self.vision.easyocr.readtext.call_count, 2
+        )  # Bytes, then pixels
+
+        self.vision.ocr(base_64=png_base64((0, 0, 255)))
+        self.assertEqual(self.vision.easyocr.readtext.call_count, 3)
+
+    def test_paths_and_eviction(self):
+        self.vision.cache_size = 1
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "image.png")
+            with open(path, "wb") as f:
+                f.write(base64.b64decode(png_base64((0, 255, 0))))
+
+            self.vision.ocr(path=path)
+            self.vision.ocr(base_64=png_base64((0, 0, 0)))
+            self.vision.ocr(path=path)
+        self.assertEqual(self.vision.easyocr.readtext.call_count, 3)
+
+    def test_query_results_are_cached_per_question(self):
+        self.vision.model = mock.Mock()
+        self.vision.tokenizer = mock.Mock()
+        self.vision.model.answer_question.return_value = "a red square"
+
+        red = png_base64((255, 0, 0))
+        self.assertEqual(self.vision.query(base_64=red), "a red square")
+        self.vision.query(base_64=red)
+        self.vision.query(query="What color?", base_64=red)
+        self.assertEqual(self.vision.model.answer_question.call_count, 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
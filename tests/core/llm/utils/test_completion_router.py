@@ -0,0 +1,126 @@
+import threading
+import time
+import unittest
+
+from interpreter.core.llm.utils.completion_router import (
+    CompletionRouter,
+    CompletionTimeout,
+)
+
+
+def make_completions(behaviors):
+    """
+    A fake completions function. `behaviors` maps model -> list of behaviors, one per call:
+    an exception to raise, or (delay before the first chunk, chunks).
+    """
+    calls = []
+    lock = threading.Lock()
+
+    def completions(**params):
+        with lock:
+            calls.append(dict(params))
+            behavior = behaviors[params["model"]].pop(0)
+        if isinstance(behavior, Exception):
+            raise behavior
+        delay, chunks = behavior
+        time.sleep(delay)
+        for chunk in chunks:
+            if isinstance(chunk, Exception):
+                raise chunk
+            yield chunk
+
+    return completions, calls
+
+
+class TestCompletionRouter(unittest.TestCase):
+    def test_retries_with_backoff_without_changing_params(self):
+        completions, calls = make_completions(
+            {"a": [ConnectionError("1"), ConnectionError("2"), (0, ["x", "y"])]}
+        )
+        router = CompletionRouter(backoff=0.01)
+        chunks = list(router.completions(completions, model="a", temperature=0))
+
+        self.assertEqual(chunks, ["x", "y"])
+        self.assertEqual(len(calls), 3)
+        self.assertTrue(all(call["temperature"] == 0 for call in calls))
+
+    def test_falls_back_in_order(self):
+        completions, calls = make_completions(
+            {
+                "a": [ConnectionError("a")] * 2,
+                "b": [ConnectionError("b")] * 2,
+                "c": [(0, ["from c"])],
+            }
+        )
+        router = CompletionRouter(
+            fallbacks=["b", {"model": "c", "api_base": "http://c"}],
+            max_retries=1,
+            backoff=0,
+        )
+        chunks = list(
+            router.completions(completions, model="a", api_base="http://a", stream=True)
+        )
+
+        self.assertEqual(chunks, ["from c"])
+        self.assertEqual([call["model"] for call in calls], ["a", "a", "b", "b", "c"])
+        self.assertNotIn("api_base", calls[2])
+        self.assertEqual(calls[4]["api_base"], "http://c")
+        self.assertTrue(calls[4]["stream"])
+
+    def test_raises_first_error_when_everything_fails(self):
+        completions, _ = make_completions(
+            {"a": [ValueError("first"), ValueError("second")]}
+        )
+        router = CompletionRouter(max_retries=1, backoff=0)
+        with self.assertRaisesRegex(ValueError, "first"):
+            list(router.completions(completions, model="a"))
+
+    def test_first_token_timeout_abandons_a_stalled_stream(self):
+        completions, calls = make_completions({"a": [(2, ["stalled"]), (0, ["fresh"])]})
+        router = CompletionRouter(first_token_timeout=0.1, backoff=0)
+
+        started = time.monotonic()
+        chunks = list(router.completions(completions, model="a"))
+
+        self.assertEqual(chunks, ["fresh"])
+        self.assertLess(time.monotonic() - started, 2)
+
+    def test_hedged_request_wins(self):
+        completions, calls = make_completions(
+            {"slow": [(1, ["slow"])], "fast": [(0, ["fast", "er"])]}
+        )
+        router = CompletionRouter(fallbacks=["fast"], hedge_after=0.05)
+
+        started = time.monotonic()
+        chunks = list(router.completions(completions, model="slow"))
+
+        self.assertEqual(chunks, ["fast", "er"])
+        self.assertLess(time.monotonic() - started, 0.5)
+        self.assertEqual([call["model"] for call in calls], ["slow", "fast"])
+
+    def test_deadline(self):
+        completions, _ = make_completions({"a": [(2, ["late"])]})
+        router = CompletionRouter(deadline=0.1)
+
+        started = time.monotonic()
+        with self.assertRaises(CompletionTimeout):
+            list(router.completions(completions, model="a"))
+        self.assertLess(time.monotonic() - started, 2)
+
+    def test_errors_mid_stream_are_not_retried(self):
+        completions, calls = make_completions(
+            {"a": [(0, ["x", ConnectionError("lost")]), (0, ["x", "y"])]}
+        )
+        router = CompletionRouter(backoff=0)
+
+        chunks = []
+        with self.assertRaises(ConnectionError):
+            for chunk in router.completions(completions, model="a"):
+                chunks.append(chunk)
+
+        self.assertEqual(chunks, ["x"])
+        self.assertEqual(len(calls), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
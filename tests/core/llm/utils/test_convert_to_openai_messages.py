@@ -0,0 +1,141 @@
+import os
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+from interpreter.core.llm.utils import convert_to_openai_messages as conversion
+from interpreter.core.llm.utils.convert_to_openai_messages import (
+    clear_path_image_cache,
+    convert_to_openai_messages,
+)
+
+
+class TestConvertToOpenAIMessages(unittest.TestCase):
+    def setUp(self):
+        clear_path_image_cache()
+        self.interpreter = mock.Mock()
+        self.interpreter.always_apply_user_message_template = False
+        self.interpreter.user_message_template = "<{content}>"
+        self.interpreter.code_output_sender = "user"
+        self.interpreter.code_output_template = "Output: {content}"
+        self.interpreter.empty_code_output_template = "No output"
+
+    def convert(self, messages, **kwargs):
+        return convert_to_openai_messages(
+            messages, interpreter=self.interpreter, **kwargs
+        )
+
+    def test_template_only_applies_to_last_user_message(self):
+        messages = [
+            {"role": "user", "type": "message", "content": "same"},
+            {"role": "assistant", "type": "message", "content": "ok"},
+            {"role": "user", "type": "message", "content": "same"},
+        ]
+        self.assertEqual(
+            [m["content"] for m in self.convert(messages)], ["same", "ok", "<same>"]
+        )
+
+        # Once it's no longer the last user message, it loses the template
+        messages.append({"role": "user", "type": "message", "content": "next"})
+        self.assertEqual(
+            [m["content"] for m in self.convert(messages)],
+            ["same", "ok", "same", "<next>"],
+        )
+
+    def test_settings_are_applied(self):
+        messages = [
+            {"role": "computer", "type": "console", "format": "output", "content": "1"}
+        ]
+        self.assertEqual(self.convert(messages)[0]["role"], "function")
+        self.assertEqual(
+            self.convert(messages, function_calling=False)[0]["content"], "Output: 1"
+        )
+
+    def test_conversion_is_not_slower_than_converting_each_message(self):
+        messages = []
+        for i in range(50):
+            messages += [
+                {"role": "user", "type": "message", "content": f"{i}" + "u" * 2000},
+                {
+                    "role": "assistant",
+                    "type": "code",
+                    "format": "python",
+                    "content": "c" * 2000,
+                },
+                {
+                    "role": "computer",
+                    "type": "console",
+                    "format": "output",
+                    "content": "o" * 2000,
+                },
+                {"role": "assistant", "type": "message", "content": "a" * 2000},
+            ]
+
+        def direct():
+            for message in messages:
+                conversion.convert_message(message, interpreter=self.interpreter)
+
+        def best_of(function, repeat=20):
+            times = []
+            for _ in range(repeat):
+                started = time.perf_counter()
+                function()
+                times.append(time.perf_counter() - started)
+            return min(times)
+
+        self.convert(messages)  # Warm up
+        self.assertLessEqual(
+            best_of(lambda: self.convert(messages)), best_of(direct) * 1.5 + 0.001
+        )
+
+    def test_path_images_are_read_once(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "image.png")
+            with open(path, "wb") as f:
+                f.write(b"first")
+
+            messages = [
+                {"role": "user", "type": "image", "format": "path", "content": path}
+            ]
+            first = self.convert(messages, vision=True)
+            with mock.patch.object(
+                conversion, "image_data_url", wraps=conversion.image_data_url
+            ) as image_data_url:
+                self.assertEqual(first, self.convert(messages, vision=True))
+                self.assertEqual(
+                    first, self.convert(messages, vision=True, shrink_images=True)
+                )
+            image_data_url.assert_not_called()
+
+            # Settings that change the encoding aren't served from the cache
+            with mock.patch.object(
+                conversion, "image_data_url", return_value="data:image/png;base64,"
+            ) as image_data_url:
+                self.convert(messages, vision=True, shrink_images=False)
+            image_data_url.assert_called_once()
+
+    def test_path_images_are_reread_when_changed(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "image.png")
+            with open(path, "wb") as f:
+                f.write(b"first")
+
+            messages = [
+                {"role": "user", "type": "image", "format": "path", "content": path}
+            ]
+            first = self.convert(messages, vision=True)
+            self.assertEqual(first, self.convert(messages, vision=True))
+
+            with open(path, "wb") as f:
+                f.write(b"second!")
+            second = self.convert(messages, vision=True)
+
+        self.assertNotEqual(
+            first[0]["content"][0]["image_url"]["url"],
+            second[0]["content"][0]["image_url"]["url"],
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
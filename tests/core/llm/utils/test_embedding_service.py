@@ -0,0 +1,66 @@
+import threading
+import time
+import unittest
+from unittest import mock
+
+import numpy as np
+
+from interpreter.core.llm.utils.embedding_service import (
+    EmbeddingService,
+    get_embedding_service,
+)
+
+
+class FakeModel:
+    def __init__(self):
+        self.calls = []
+
+    def encode(self, texts):
+        self.calls.append(list(texts))
+        time.sleep(0.05)
+        return np.array([[float(len(text))] for text in texts])
+
+
+class TestEmbeddingService(unittest.TestCase):
+    def setUp(self):
+        self.service = EmbeddingService("fake")
+        self.model = FakeModel()
+        self.service._model = self.model
+
+    def test_shared_per_model(self):
+        self.assertIs(get_embedding_service("a"), get_embedding_service("a"))
+        self.assertIsNot(get_embedding_service("a"), get_embedding_service("b"))
+
+    def test_model_is_loaded_lazily(self):
+        with mock.patch.dict("sys.modules", {"sentence_transformers": mock.Mock()}):
+            service = EmbeddingService("lazy")
+            self.assertIsNone(service._model)
+
+    def test_embed_matches_encode_tolist(self):
+        self.assertEqual(self.service.embed("abc"), [3.0])
+        self.assertEqual(self.service.embed(["a", "ab"]), [[1.0], [2.0]])
+
+    def test_cache(self):
+        self.service.embed("hello")
+        self.service.embed("hello")
+        self.service.embed(["hello", "hi"])
+        self.assertEqual(self.model.calls, [["hello"], ["hi"]])
+
+    def test_concurrent_calls_are_batched(self):
+        results = {}
+
+        def embed(text):
+            results[text] = self.service.embed(text)
+
+        threads = [threading.Thread(target=embed, args=("x" * i,)) for i in range(1, 9)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(results, {"x" * i: [float(i)] for i in range(1, 9)})
+        self.assertLess(len(self.model.calls), 8)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,86 @@
+import base64
+import io
+import os
+import time
+import unittest
+from unittest import mock
+
+from PIL import Image
+
+from interpreter.core.llm.utils import image_encoder
+from interpreter.core.llm.utils.image_encoder import clear_image_cache, image_data_url
+
+
+def noisy_png(width=400, height=300, mode="RGB"):
+    image = Image.frombytes(
+        mode, (width, height), os.urandom(width * height * len(mode))
+    )
+    buffered = io.BytesIO()
+    image.save(buffered, format="PNG")
+    return buffered.getvalue()
+
+
+def decode(content):
+    header, encoded_string = content.split(",", 1)
+    return header, Image.open(io.BytesIO(base64.b64decode(encoded_string)))
+
+
+class TestImageEncoder(unittest.TestCase):
+    def setUp(self):
+        clear_image_cache()
+
+    def test_small_images_pass_through(self):
+        png = noisy_png(20, 20)
+        encoded_string = base64.b64encode(png).decode("utf-8")
+        self.assertEqual(
+            image_data_url(encoded_string, "png"),
+            f"data:image/png;base64,{encoded_string}",
+        )
+        self.assertEqual(
+            image_data_url(png, "png"), f"data:image/png;base64,{encoded_string}"
+        )
+
+    def test_shrinks_to_budget_in_one_resize(self):
+        png = noisy_png()  # About 360kb
+        max_bytes = 100 * 1024
+
+        with mock.patch.object(
+            image_encoder, "_encode", wraps=image_encoder._encode
+        ) as encode:
+            content = image_data_url(png, "png", max_bytes=max_bytes)
+
+        self.assertLessEqual(len(content), max_bytes)
+        self.assertEqual(encode.call_count, 1)
+        header, image = decode(content)
+        self.assertEqual(header, "data:image/png;base64")
+        self.assertLess(image.width, 400)
+        self.assertAlmostEqual(image.width / image.height, 4 / 3, places=1)
+
+    def test_results_are_cached_by_content(self):
+        png = noisy_png()
+        first = image_data_url(png, "png", max_bytes=100 * 1024)
+
+        started = time.perf_counter()
+        second = image_data_url(bytes(png), "png", max_bytes=100 * 1024)
+        self.assertIs(first, second)
+        self.assertLess(time.perf_counter() - started, 0.05)
+
+        # Different settings are a different entry
+        self.assertIsNot(first, image_data_url(png, "png", max_bytes=50 * 1024))
+
+    def test_reencodes_screenshots(self):
+        png = noisy_png(64, 64, mode="RGBA")
+
+        header, image = decode(image_data_url(png, "png", image_format="jpeg"))
+        self.assertEqual(header, "data:image/jpeg;base64")
+        self.assertEqual(image.format, "JPEG")
+
+        header, image = decode(image_data_url(png, "png", image_format="webp"))
+        self.assertEqual(header, "data:image/webp;base64")
+
+        with self.assertRaises(ValueError):
+            image_data_url(png, "png", image_format="bmp")
+
+
+if __name__ == "__main__":
+    unittest.main()
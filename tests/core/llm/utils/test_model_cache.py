@@ -0,0 +1,76 @@
+import os
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+from interpreter.core.llm.llm import Llm
+from interpreter.core.llm.utils.model_cache import ModelCache
+
+
+class TestModelCache(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "model_cache.json")
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_entries_persist_per_model_and_api_base(self):
+        ModelCache(self.path).update("gpt-4o", None, supports_vision=True)
+        ModelCache(self.path).update("gpt-4o", "http://x", supports_vision=False)
+
+        cache = ModelCache(self.path)
+        self.assertTrue(cache.get("gpt-4o")["supports_vision"])
+        self.assertFalse(cache.get("gpt-4o", "http://x")["supports_vision"])
+        self.assertEqual(cache.get("other"), {})
+
+    def test_expired_entries_are_ignored(self):
+        cache = ModelCache(self.path, ttl=60)
+        cache.update("gpt-4o", supports_vision=True)
+
+        with mock.patch("time.time", return_value=time.time() + 120):
+            self.assertEqual(cache.get("gpt-4o"), {})
+
+    def test_recently_warmed_up(self):
+        cache = ModelCache(self.path, warmup_ttl=60)
+        self.assertFalse(cache.recently_warmed_up("ollama/llama3:latest"))
+
+        cache.update("ollama/llama3:latest", warmed_up_at=time.time())
+        self.assertTrue(cache.recently_warmed_up("ollama/llama3:latest"))
+
+        with mock.patch("time.time", return_value=time.time() + 120):
+            self.assertFalse(cache.recently_warmed_up("ollama/llama3:latest"))
+
+    def test_second_ollama_load_skips_probes_and_ping(self):
+        def make_llm():
+            llm = Llm(mock.Mock())
+            llm.model_cache = ModelCache(self.path)
+            llm.model = "ollama/llama3"
+            return llm
+
+        tags = mock.Mock(ok=True)
+        tags.json.return_value = {"models": [{"name": "llama3:latest"}]}
+        show = mock.Mock()
+        show.json.return_value = {"model_info": {"llama.context_length": 8192}}
+
+        with mock.patch(
+            "interpreter.core.llm.llm.http_pool.get", return_value=tags
+        ) as get, mock.patch(
+            "interpreter.core.llm.llm.http_pool.post", return_value=show
+        ) as post:
+            first = make_llm()
+            first.load()
+            second = make_llm()
+            second.load()
+
+        self.assertEqual(get.call_count, 1)
+        self.assertEqual(post.call_count, 1)
+        self.assertEqual(first.interpreter.computer.ai.chat.call_count, 1)
+        self.assertEqual(second.interpreter.computer.ai.chat.call_count, 0)
+        self.assertEqual(second.context_window, 8192)
+        self.assertEqual(second.max_tokens, int(8192 * 0.2))
+
+
+if __name__ == "__main__":
+    unittest.main()
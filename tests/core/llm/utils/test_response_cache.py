@@ -0,0 +1,109 @@
+import tempfile
+import unittest
+
+from interpreter.core.llm.utils.response_cache import ResponseCache, ResponseCacheMiss
+
+
+def text_chunk(content):
+    return {
+        "id": "chatcmpl-test",
+        "object": "chat.completion.chunk",
+        "created": 0,
+        "model": "gpt-4o",
+        "choices": [{"index": 0, "delta": {"role": "assistant", "content": content}}],
+    }
+
+
+class FakeCompletions:
+    def __init__(self, contents):
+        self.contents = contents
+        self.calls = 0
+
+    def __call__(self, **params):
+        self.calls += 1
+        for content in self.contents:
+            yield text_chunk(content)
+
+
+def contents(chunks):
+    return [chunk["choices"][0]["delta"]["content"] for chunk in chunks]
+
+
+class TestResponseCache(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.params = {
+            "model": "gpt-4o",
+            "messages": [{"role": "user", "content": "hi"}],
+            "stream": True,
+        }
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def cache(self, mode):
+        return ResponseCache(mode=mode, path=self.directory.name)
+
+    def test_disabled_by_default(self):
+        completions = FakeCompletions(["a"])
+        cache = self.cache(None)
+        list(cache.completions(completions, **self.params))
+        list(cache.completions(completions, **self.params))
+        self.assertEqual(completions.calls, 2)
+
+    def test_cache_mode_replays_deterministic_requests(self):
+        completions = FakeCompletions(["Hel", "lo"])
+        cache = self.cache("cache")
+
+        first = list(cache.completions(completions, **self.params))
+        second = list(cache.completions(completions, **self.params))
+
+        self.assertEqual(completions.calls, 1)
+        self.assertEqual(contents(first), contents(second))
+
+        # Sampled requests always go to the provider
+        list(cache.completions(completions, temperature=0.7, **self.params))
+        self.assertEqual(completions.calls, 2)
+
+    def test_key_ignores_credentials(self):
+        cache = self.cache("cache")
+        self.assertEqual(
+            cache.key(self.params), cache.key({**self.params, "api_key": "secret"})
+        )
+        self.assertNotEqual(
+            cache.key(self.params), cache.key({**self.params, "max_tokens": 5})
+        )
+
+    def test_replay_mode_never_calls_the_provider(self):
+        completions = FakeCompletions(["a"])
+        self.assertEqual(
+            contents(self.cache("record").completions(completions, **self.params)),
+            ["a"],
+        )
+
+        replayed = list(self.cache("replay").completions(completions, **self.params))
+        self.assertEqual(contents(replayed), ["a"])
+        self.assertEqual(completions.calls, 1)
+
+        with self.assertRaises(ResponseCacheMiss):
+            list(
+                self.cache("replay").completions(
+                    completions, **{**self.params, "model": "other"}
+                )
+            )
+        self.assertEqual(completions.calls, 1)
+
+    def test_interrupted_streams_are_not_saved(self):
+        completions = FakeCompletions(["a", "b"])
+        cache = self.cache("cache")
+
+        stream = cache.completions(completions, **self.params)
+        next(stream)
+        stream.close()
+
+        list(cache.completions(completions, **self.params))
+        self.assertEqual(completions.calls, 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
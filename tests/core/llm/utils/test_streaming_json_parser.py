@@ -0,0 +1,75 @@
+import json
+import random
+import unittest
+
+from interpreter.core.llm.utils.streaming_json_parser import StreamingJsonParser
+
+
+def feed_in_pieces(parser, text, sizes):
+    decoded = {}
+    i = 0
+    while i < len(text):
+        size = next(sizes)
+        for key, new_text in parser.feed(text[i : i + size]).items():
+            decoded[key] = decoded.get(key, "") + new_text
+        i += size
+    return decoded
+
+
+class TestStreamingJsonParser(unittest.TestCase):
+    def test_emits_only_new_code(self):
+        parser = StreamingJsonParser()
+        self.assertEqual(parser.feed('{"language": "pyt'), {"language": "pyt"})
+        self.assertEqual(
+            parser.feed('hon", "code": "print('), {"language": "hon", "code": "print("}
+        )
+        self.assertEqual(parser.feed('\\"hi\\")\\n'), {"code": '"hi")\n'})
+        self.assertEqual(parser.feed('"}'), {})
+
+        self.assertTrue(parser.done)
+        self.assertEqual(parser.value, {"language": "python", "code": 'print("hi")\n'})
+        self.assertEqual(parser.complete_keys, ["language", "code"])
+
+    def test_escapes_split_across_deltas(self):
+        parser = StreamingJsonParser()
+        text = json.dumps({"code": 'a\\b\n"é😀'}, ensure_ascii=True)
+        decoded = feed_in_pieces(parser, text, iter(lambda: 1, None))
+        self.assertEqual(decoded["code"], 'a\\b\n"é😀')
+
+    def test_matches_json_loads(self):
+        generator = random.Random(0)
+        alphabet = 'ab"\\\n\t/é😀 {}[],:'
+        for _ in range(500):
+            value = {
+                "language": generator.choice(["python", "shell"]),
+                "code": "".join(
+                    generator.choice(alphabet) for _ in range(generator.randint(0, 40))
+                ),
+                "extra": generator.choice([1, 2.5, True, None, [1, {"a": "}"}]]),
+            }
+            text = json.dumps(value, ensure_ascii=generator.random() < 0.5)
+
+            parser = StreamingJsonParser()
+            decoded = feed_in_pieces(
+                parser, text, iter(lambda: generator.randint(1, 6), None)
+            )
+
+            self.assertTrue(parser.done)
+            self.assertEqual(parser.value, value)
+            self.assertEqual(decoded.get("code", ""), value["code"])
+
+    def test_tolerates_raw_newlines(self):
+        parser = StreamingJsonParser()
+        parser.feed('{"language": "python", "code": "a\nb')
+        self.assertEqual(parser.get("code"), "a\nb")
+        self.assertFalse(parser.failed)
+
+    def test_not_an_object(self):
+        parser = StreamingJsonParser()
+        parser.feed("print('hi')")
+        self.assertTrue(parser.failed)
+        self.assertEqual(parser.value, {})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,67 @@
+import copy
+import unittest
+from unittest import mock
+
+import tokentrim as tt
+from tokentrim.tokentrim import num_tokens_from_messages
+
+from interpreter.core.llm.utils.token_ledger import TokenLedger
+
+
+def conversation(turns):
+    messages = []
+    for i in range(turns):
+        messages.append({"role": "user", "content": f"Question {i}? " + "word " * 40})
+        messages.append({"role": "assistant", "content": f"Answer {i}. " + "ok " * 60})
+    return messages
+
+
+class TestTokenLedger(unittest.TestCase):
+    def test_matches_tokentrim(self):
+        messages = conversation(30)
+        for max_tokens in [200, 1000, 5000, 100000]:
+            for model in [None, "gpt-4"]:
+                ledger = TokenLedger()
+                expected = tt.trim(
+                    copy.deepcopy(messages),
+                    system_message="You are helpful.",
+                    model=model,
+                    max_tokens=max_tokens,
+                )
+                trimmed = ledger.trim(
+                    messages,
+                    system_message="You are helpful.",
+                    model=model,
+                    max_tokens=max_tokens,
+                )
+                self.assertEqual(trimmed, expected)
+                self.assertEqual(
+                    ledger.total_tokens, num_tokens_from_messages(expected, model)
+                )
+
+    def test_unknown_model_without_max_tokens_raises(self):
+        with self.assertRaises(ValueError):
+            TokenLedger().trim(conversation(1), model="not-a-real-model")
+
+    def test_does_not_modify_messages(self):
+        messages = conversation(10)
+        original = copy.deepcopy(messages)
+        TokenLedger().trim(messages, system_message="Hi", max_tokens=300)
+        self.assertEqual(messages, original)
+
+    def test_only_new_messages_are_tokenized(self):
+        ledger = TokenLedger()
+        messages = conversation(20)
+        ledger.trim(messages, system_message="You are helpful.", max_tokens=100000)
+
+        encoding = ledger.counting_params(None)[0]
+        with mock.patch.object(encoding, "encode", wraps=encoding.encode) as encode:
+            messages.append({"role": "user", "content": "One more thing"})
+            ledger.trim(messages, system_message="You are helpful.", max_tokens=100000)
+
+        # Just the new message's role and content
+        self.assertEqual(encode.call_count, 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,55 @@
+import unittest
+from unittest import mock
+
+from interpreter.core.render_message import RenderCache, parse_render_directive
+
+
+class TestRenderCache(unittest.TestCase):
+    def setUp(self):
+        self.interpreter = mock.Mock()
+        self.interpreter.verbose = False
+        self.interpreter.computer.run.side_effect = lambda language, code, display: [
+            {"type": "console", "format": "output", "content": "rendered"}
+        ]
+
+    def test_parse_render_directive(self):
+        self.assertEqual(parse_render_directive("print('hi')"), 0)
+        self.assertEqual(parse_render_directive("# refresh: always\nprint('hi')"), 0)
+        self.assertEqual(parse_render_directive("# ttl: 30\nprint('hi')"), 30)
+        self.assertEqual(
+            parse_render_directive("# ttl: inf\nprint('hi')"), float("inf")
+        )
+        self.assertEqual(parse_render_directive("# ttl: soon\nprint('hi')"), 0)
+
+    def test_blocks_are_cached_until_inputs_change(self):
+        cache = RenderCache()
+        cache.set_message(("a",), "Hello {{\n# ttl: inf\nprint('x')\n}}")
+
+        self.assertEqual(cache.render(self.interpreter), "Hello rendered")
+        self.assertEqual(cache.render(self.interpreter), "Hello rendered")
+        self.assertEqual(self.interpreter.computer.run.call_count, 1)
+
+        self.assertTrue(cache.is_current(("a",)))
+        self.assertFalse(cache.is_current(("b",)))
+
+        cache.set_message(("b",), "Bye {{\n# ttl: inf\nprint('x')\n}}")
+        self.assertEqual(cache.render(self.interpreter), "Bye rendered")
+        self.assertEqual(self.interpreter.computer.run.call_count, 2)
+
+    def test_blocks_without_a_directive_refresh_every_render(self):
+        cache = RenderCache()
+        cache.set_message(
+            ("a",),
+            "{{\n# ttl: 60\nprint('x')\n}} {{print('y')}} {{\n# refresh: always\nprint('z')\n}}",
+        )
+
+        cache.render(self.interpreter)
+        cache.render(self.interpreter)
+        cache.render(self.interpreter)
+
+        # The ttl block ran once, the other two ran every time
+        self.assertEqual(self.interpreter.computer.run.call_count, 7)
+
+
+if __name__ == "__main__":
+    unittest.main()
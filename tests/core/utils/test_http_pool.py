@@ -0,0 +1,90 @@
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import litellm
+
+from interpreter.core.utils.http_pool import HttpPool
+
+
+class OkHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # Keep-alive
+
+    def do_GET(self):
+        body = b'{"ok": true}'
+        if self.headers.get("Cookie"):
+            body = b'{"cookie": true}'
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Set-Cookie", "session=secret; Path=/")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class TestHttpPool(unittest.TestCase):
+    def setUp(self):
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), OkHandler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.url = f"http://127.0.0.1:{self.server.server_port}"
+        self.pool = HttpPool(pool_connections=2, pool_maxsize=4)
+
+    def tearDown(self):
+        self.pool.close()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_connections_are_reused(self):
+        for _ in range(5):
+            self.assertEqual(self.pool.get(self.url + "/api/tags").json(), {"ok": True})
+
+        stats = self.pool.stats()[self.url]
+        self.assertEqual(stats["requests"], 5)
+        self.assertEqual(stats["connections_opened"], 1)
+
+    def test_one_session_per_host(self):
+        self.assertIs(
+            self.pool.session(self.url + "/a"), self.pool.session(self.url + "/b")
+        )
+        self.assertIsNot(
+            self.pool.session(self.url), self.pool.session("http://localhost:1")
+        )
+
+    def test_least_recently_used_hosts_are_closed(self):
+        self.pool.max_hosts = 2
+        first = self.pool.session("http://a.test")
+        self.pool.session("http://b.test")
+        self.pool.session("http://a.test")
+        self.pool.session("http://c.test")
+
+        self.assertEqual(list(self.pool._sessions), ["http://a.test", "http://c.test"])
+        self.assertIs(self.pool.session("http://a.test"), first)
+        self.assertNotIn("http://b.test", self.pool.stats())
+
+    def test_sessions_dont_keep_cookies(self):
+        self.assertEqual(self.pool.get(self.url).json(), {"ok": True})
+        self.assertEqual(self.pool.get(self.url).json(), {"ok": True})
+        self.assertEqual(len(self.pool.session(self.url).cookies), 0)
+
+        # Cookies given for a request are still sent
+        response = self.pool.get(self.url, cookies={"session": "mine"})
+        self.assertEqual(response.json(), {"cookie": True})
+
+    def test_litellm_uses_the_shared_client(self):
+        previous = litellm.client_session
+        litellm.client_session = None
+        try:
+            self.pool.use_for_litellm()
+            self.assertIs(litellm.client_session, self.pool.httpx_client())
+
+            self.pool.close()
+            self.assertIsNone(litellm.client_session)
+        finally:
+            litellm.client_session = previous
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,57 @@
+import gc
+import os
+import unittest
+
+from interpreter.core.utils.output_buffer import OutputBuffer
+from interpreter.core.utils.truncate_output import truncate_output
+
+
+class TestOutputBuffer(unittest.TestCase):
+    def setUp(self):
+        self.buffer = OutputBuffer(max_output_chars=10)
+
+    def tearDown(self):
+        self.buffer.cleanup()
+
+    def test_short_output_is_not_truncated(self):
+        self.buffer.append("hello")
+        self.assertEqual(self.buffer.value(), "hello")
+
+    def test_matches_truncate_output(self):
+        output = ""
+        for i in range(1000):
+            chunk = f"line {i}\n"
+            output += chunk
+            self.buffer.append(chunk)
+        self.assertEqual(self.buffer.value(), truncate_output(output, 10))
+
+    def test_full_output_is_spilled_to_disk(self):
+        self.buffer.append("a" * 100)
+        self.buffer.append("b" * 100)
+        self.buffer.close()
+        with open(self.buffer.path, encoding="utf-8") as f:
+            self.assertEqual(f.read(), "a" * 100 + "b" * 100)
+
+        path = self.buffer.path
+        self.buffer.cleanup()
+        self.assertFalse(os.path.exists(path))
+
+    def test_spill_file_is_removed_when_the_buffer_is_collected(self):
+        buffer = OutputBuffer(max_output_chars=10)
+        buffer.append("hello")
+        path = buffer.path
+        del buffer
+        gc.collect()
+        self.assertFalse(os.path.exists(path))
+
+    def test_spill_file_is_removed_at_exit(self):
+        self.buffer.append("hello")
+        path = self.buffer.path
+        self.assertTrue(self.buffer._finalizer.atexit)
+        self.buffer._finalizer()  # What atexit runs
+        self.assertFalse(os.path.exists(path))
+        self.buffer.cleanup()  # And cleaning up afterwards is harmless
+
+
+if __name__ == "__main__":
+    unittest.main()
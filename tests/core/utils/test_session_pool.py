@@ -0,0 +1,170 @@
+import threading
+import time
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+from interpreter.core.utils.session_pool import (
+    SessionBusy,
+    SessionPool,
+    SessionPoolFull,
+    isolated_interpreter,
+    session_key,
+)
+
+
+def fake_interpreter(template):
+    return mock.Mock(messages=[])
+
+
+class TestSessionPool(unittest.TestCase):
+    def setUp(self):
+        self.pool = SessionPool(
+            object(), max_sessions=2, idle_timeout=60, factory=fake_interpreter
+        )
+
+    def test_sessions_are_per_key(self):
+        with self.pool.session("a") as first:
+            first.messages.append("hello")
+        with self.pool.session("b") as second:
+            self.assertEqual(second.messages, [])
+        with self.pool.session("a") as again:
+            self.assertIs(again, first)
+
+    def test_one_request_per_session_at_a_time(self):
+        session = self.pool.checkout("a")
+        events = []
+
+        def second_request():
+            with self.pool.session("a"):
+                events.append("second")
+
+        thread = threading.Thread(target=second_request)
+        thread.start()
+        time.sleep(0.1)
+        events.append("first done")
+        self.pool.release(session)
+        thread.join(5)
+
+        self.assertEqual(events, ["first done", "second"])
+
+    def test_waiting_for_a_busy_session_times_out(self):
+        self.pool.lock_timeout = 0.05
+        session = self.pool.checkout("a")
+        with self.assertRaises(SessionBusy):
+            self.pool.checkout("a")
+        self.assertEqual(session.users, 1)
+        self.pool.release(session)
+
+        with self.pool.session("a") as again:
+            self.assertIs(again, session.interpreter)
+
+    def test_least_recently_used_idle_session_is_evicted(self):
+        with self.pool.session("a") as a:
+            pass
+        with self.pool.session("b"):
+            pass
+        with self.pool.session("a"):
+            pass
+
+        with self.pool.session("c"):
+            pass
+        b = self.pool._sessions.get("b")
+        self.assertIsNone(b)
+        self.assertIn("a", self.pool._sessions)
+        a.reset.assert_not_called()
+
+        # Busy sessions are never evicted
+        held = [self.pool.checkout("a"), self.pool.checkout("c")]
+        with self.assertRaises(SessionPoolFull):
+            self.pool.checkout("d")
+        for session in held:
+            self.pool.release(session)
+        self.assertEqual(self.pool.stats()["busy"], 0)
+
+    def test_idle_sessions_are_closed(self):
+        with self.pool.session("a") as a:
+            pass
+        self.assertEqual(self.pool.reap(), 0)
+
+        self.pool.idle_timeout = 0
+        time.sleep(0.01)
+        self.assertEqual(self.pool.reap(), 1)
+        a.reset.assert_called_once()
+        self.assertEqual(self.pool.stats()["sessions"], 0)
+
+    def test_session_key(self):
+        self.assertEqual(
+            session_key({"x-openwebui-chat-id": "chat1"}), "x-openwebui-chat-id:chat1"
+        )
+        self.assertEqual(
+            session_key({"x-session-id": "s1", "x-openwebui-chat-id": "chat1"}),
+            "x-session-id:s1",
+        )
+        self.assertIsNone(session_key({"authorization": "Bearer shared-api-key"}))
+        self.assertIsNone(session_key({"x-openwebui-user-id": "bob"}))
+
+    def test_requests_without_a_key_get_their_own_sessions(self):
+        # Two users of one Open WebUI (one API key) both opening with "hi"
+        headers = {"authorization": "Bearer shared-api-key"}
+        alice = self.pool.checkout(session_key(headers))
+        bob = self.pool.checkout(session_key(headers))
+        self.assertIsNot(alice.interpreter, bob.interpreter)
+        alice.interpreter.messages.append({"role": "user", "content": "hi"})
+        self.assertEqual(bob.interpreter.messages, [])
+
+        # They're closed when released, so they never hold a slot (or kernels) afterwards
+        self.pool.release(alice)
+        alice.interpreter.reset.assert_called_once()
+        self.assertEqual(self.pool.stats()["sessions"], 1)
+        self.pool.release(bob)
+        bob.interpreter.reset.assert_called_once()
+        self.assertEqual(self.pool.stats()["sessions"], 0)
+
+
+class TestIsolatedInterpreter(unittest.TestCase):
+    def test_copies_have_their_own_state(self):
+        llm = SimpleNamespace(_is_loaded=True, model="gpt-4o", token_ledger=mock.Mock())
+        terminal = SimpleNamespace(languages=["python"], speculative_warm_up=False)
+        interpreter = SimpleNamespace(
+            messages=["old"],
+            system_message="system",
+            conversation_filename="old.json",
+            llm=llm,
+            computer=SimpleNamespace(terminal=terminal),
+        )
+        computer = interpreter.computer
+        computer.interpreter = interpreter
+        computer.vision = SimpleNamespace(computer=computer, model="loaded")
+        computer.ai = SimpleNamespace(computer=computer)
+        computer.skills = SimpleNamespace(computer=computer, path="skills")
+        computer.skills.new_skill = SimpleNamespace(skills=computer.skills)
+        llm.interpreter = interpreter
+
+        session = isolated_interpreter(interpreter)
+
+        self.assertEqual(session.messages, [])
+        self.assertIsNone(session.conversation_filename)
+        self.assertEqual(session.system_message, "system")
+
+        self.assertIsNot(session.llm, llm)
+        self.assertIs(session.llm.interpreter, session)
+        session.llm.model = "other"
+        self.assertEqual(llm.model, "gpt-4o")
+
+        self.assertIs(session.computer.interpreter, session)
+        self.assertIs(session.computer.vision, computer.vision)
+        for tool in (session.computer.ai, session.computer.skills):
+            self.assertIs(tool.computer, session.computer)
+        self.assertIs(computer.ai.computer, computer)
+        self.assertIs(session.computer.skills.new_skill.skills, session.computer.skills)
+        self.assertIs(computer.skills.new_skill.skills, computer.skills)
+        self.assertIsNot(session.computer.terminal, terminal)
+        self.assertEqual(session.computer.terminal.languages, ["python"])
+        self.assertFalse(session.computer.terminal.speculative_warm_up)
+        self.assertIs(session.memory_pipeline.interpreter, session)
+        self.assertEqual(interpreter.messages, ["old"])
+
+
+if __name__ == "__main__":
+    unittest.main()
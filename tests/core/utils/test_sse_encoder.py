@@ -0,0 +1,57 @@
+import json
+import time
+import unittest
+
+from interpreter.core.utils.sse_encoder import ChatCompletionStreamEncoder
+
+
+def event(delta, finish_reason=None):
+    data = {
+        "id": "chatcmpl-1",
+        "object": "chat.completion.chunk",
+        "created": 123,
+        "model": "the-colonel",
+        "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+    }
+    return f"data: {json.dumps(data)}\n\n"
+
+
+class TestChatCompletionStreamEncoder(unittest.TestCase):
+    def encoder(self, **kwargs):
+        return ChatCompletionStreamEncoder("chatcmpl-1", 123, "the-colonel", **kwargs)
+
+    def test_events_match_json_dumps(self):
+        encoder = self.encoder(coalesce_window=0)
+        self.assertEqual(encoder.role(), event({"role": "assistant"}))
+        for content in ['say "hi"\n', "naïve ✓ \\ </script>", "\x00"]:
+            self.assertEqual(encoder.delta(content), event({"content": content}))
+        self.assertEqual(encoder.delta(""), "")
+        self.assertEqual(encoder.finish(), event({}, "stop"))
+        self.assertEqual(
+            encoder.finish("error", "\n\nError: boom"),
+            event({"content": "\n\nError: boom"}, "error"),
+        )
+
+    def test_small_deltas_are_coalesced_up_to_a_size(self):
+        encoder = self.encoder(coalesce_window=60, coalesce_bytes=10)
+        self.assertEqual(encoder.delta("abc"), "")
+        self.assertEqual(encoder.delta("def"), "")
+        self.assertEqual(encoder.delta("ghij"), event({"content": "abcdefghij"}))
+        self.assertIsNone(encoder.flush_due())
+
+        self.assertEqual(encoder.delta("k"), "")
+        self.assertEqual(encoder.finish(), event({"content": "k"}) + event({}, "stop"))
+
+    def test_held_text_is_due_after_the_window(self):
+        encoder = self.encoder(coalesce_window=0.02, coalesce_bytes=1000)
+        self.assertEqual(encoder.delta("a"), "")
+        self.assertGreater(encoder.flush_due(), 0)
+
+        time.sleep(0.03)
+        self.assertEqual(encoder.flush_due(), 0)
+        self.assertEqual(encoder.delta("b"), event({"content": "ab"}))
+        self.assertEqual(encoder.flush(), "")
+
+
+if __name__ == "__main__":
+    unittest.main()
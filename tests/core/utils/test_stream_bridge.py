@@ -0,0 +1,130 @@
+import asyncio
+import threading
+import time
+import unittest
+
+from interpreter.core.utils.stream_bridge import StreamBridge
+
+
+class TestStreamBridge(unittest.TestCase):
+    def test_blocking_iterators_dont_block_the_loop(self):
+        def slow_chunks():
+            for i in range(3):
+                time.sleep(0.1)  # Like waiting on the LLM, or running code
+                yield i
+
+        async def main():
+            ticks = 0
+
+            async def ticker():
+                nonlocal ticks
+                while True:
+                    await asyncio.sleep(0.01)
+                    ticks += 1
+
+            ticking = asyncio.ensure_future(ticker())
+            chunks = [chunk async for chunk in StreamBridge(slow_chunks)]
+            ticking.cancel()
+            return chunks, ticks
+
+        chunks, ticks = asyncio.run(main())
+        self.assertEqual(chunks, [0, 1, 2])
+        self.assertGreater(ticks, 10)
+
+    def test_backpressure(self):
+        produced = []
+
+        def chunks():
+            for i in range(100):
+                produced.append(i)
+                yield i
+
+        async def main():
+            bridge = StreamBridge(chunks, max_queue_size=4)
+            first = await bridge.__aiter__().__anext__()
+            await asyncio.sleep(0.2)
+            ahead = len(produced)
+            rest = [chunk async for chunk in bridge]
+            return first, ahead, rest
+
+        first, ahead, rest = asyncio.run(main())
+        self.assertEqual(first, 0)
+        self.assertLessEqual(ahead, 4 + 2)  # The queue, plus one waiting on each side
+        self.assertEqual(rest, list(range(1, 100)))
+
+    def test_close_stops_the_run(self):
+        stop_event = threading.Event()
+        closed = threading.Event()
+        done = []
+
+        def chunks():
+            try:
+                i = 0
+                while not stop_event.is_set():
+                    time.sleep(0.01)
+                    yield i
+                    i += 1
+            finally:
+                closed.set()
+
+        async def main():
+            bridge = StreamBridge(
+                chunks, stop_event=stop_event, on_done=lambda: done.append(True)
+            )
+            try:
+                async for chunk in bridge:
+                    if chunk == 2:
+                        break
+            finally:
+                bridge.close()
+                bridge.close()
+
+        asyncio.run(main())
+        self.assertTrue(stop_event.is_set())
+        self.assertTrue(closed.wait(2))
+        time.sleep(0.05)
+        self.assertEqual(done, [True])
+
+    def test_errors_are_raised_in_the_consumer(self):
+        def chunks():
+            yield "ok"
+            raise ValueError("boom")
+
+        async def main():
+            received = []
+            with self.assertRaises(ValueError):
+                async for chunk in StreamBridge(chunks):
+                    received.append(chunk)
+            return received
+
+        self.assertEqual(asyncio.run(main()), ["ok"])
+
+    def test_next_with_timeout(self):
+        release = threading.Event()
+
+        def chunks():
+            yield "first"
+            release.wait(5)
+            yield "second"
+
+        async def main():
+            bridge = StreamBridge(chunks)
+            first = await bridge.next(timeout=1)
+            with self.assertRaises(asyncio.TimeoutError):
+                await bridge.next(timeout=0.05)
+            release.set()
+            second = await bridge.next(timeout=1)
+            with self.assertRaises(StopAsyncIteration):
+                await bridge.next()
+            return first, second
+
+        self.assertEqual(asyncio.run(main()), ("first", "second"))
+
+    def test_on_done_runs_even_if_never_started(self):
+        done = []
+        StreamBridge(lambda: iter([]), on_done=lambda: done.append(True)).close()
+        self.assertEqual(done, [True])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,66 @@
+import unittest
+from types import SimpleNamespace
+
+from interpreter.core.utils.tool_runtime import run_code
+
+
+class FakeTerminal:
+    def __init__(self, chunks):
+        self.chunks = chunks
+        self.calls = []
+
+    def get_language(self, language):
+        return language if language in ("python", "shell") else None
+
+    def run(self, language, code, stream=False):
+        self.calls.append((language, code, stream))
+        yield from self.chunks
+
+
+def fake_interpreter(chunks=()):
+    return SimpleNamespace(
+        messages=[],
+        computer=SimpleNamespace(
+            terminal=FakeTerminal(list(chunks)), import_computer_api=False
+        ),
+    )
+
+
+class TestRunCode(unittest.TestCase):
+    def test_output_and_images_are_collected(self):
+        interpreter = fake_interpreter(
+            [
+                {"type": "console", "format": "active_line", "content": 1},
+                {"type": "console", "format": "output", "content": "hello "},
+                {"type": "image", "format": "base64.png", "content": "aW1n"},
+                {"type": "console", "format": "output", "content": "world\n"},
+                {"type": "console", "format": "active_line", "content": None},
+            ]
+        )
+        result = run_code(interpreter, "python", "print('hello world')")
+        self.assertEqual(
+            result, {"output": "hello world\n", "images": ["aW1n"], "error": None}
+        )
+        self.assertEqual(
+            interpreter.computer.terminal.calls,
+            [("python", "print('hello world')", True)],
+        )
+        self.assertEqual(interpreter.messages, [])  # The conversation is untouched
+
+    def test_unsupported_languages_are_errors(self):
+        interpreter = fake_interpreter()
+        result = run_code(interpreter, "cobol", "DISPLAY 'HI'.")
+        self.assertEqual(result["output"], "")
+        self.assertIn("cobol", result["error"])
+        self.assertEqual(interpreter.computer.terminal.calls, [])
+
+    def test_computer_api_is_imported_on_request(self):
+        interpreter = fake_interpreter()
+        run_code(interpreter, "python", "print(1)")
+        self.assertFalse(interpreter.computer.import_computer_api)
+        run_code(interpreter, "python", "computer.clipboard.view()", computer_api=True)
+        self.assertTrue(interpreter.computer.import_computer_api)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,102 @@
+import time
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+from interpreter.memory.pipeline import MemoryPipeline
+
+
+class TestMemoryPipeline(unittest.TestCase):
+    def setUp(self):
+        self.interpreter = mock.Mock()
+        self.interpreter.verbose = False
+        self.interpreter.debug = False
+        self.interpreter.messages = [
+            {"role": "user", "type": "message", "content": "What's my name?"}
+        ]
+        self.pipeline = MemoryPipeline(self.interpreter, recall_timeout=0.5)
+
+    def test_recalled_memories_are_inserted_before_the_last_message(self):
+        self.interpreter.memory.search_semantic_memory.return_value = ["Name is Ada"]
+
+        self.pipeline.prefetch_recall("What's my name?")
+        self.pipeline.insert_recalled_memories()
+
+        self.assertEqual(len(self.interpreter.messages), 2)
+        self.assertIn("Name is Ada", self.interpreter.messages[0]["content"])
+        self.assertEqual(self.interpreter.messages[-1]["content"], "What's my name?")
+
+    def test_slow_recall_is_skipped(self):
+        def slow_search(*args, **kwargs):
+            time.sleep(1)
+            return ["Too late"]
+
+        self.interpreter.memory.search_semantic_memory.side_effect = slow_search
+        self.pipeline.recall_timeout = 0.05
+
+        start = time.time()
+        self.pipeline.prefetch_recall("What's my name?")
+        self.pipeline.insert_recalled_memories()
+
+        self.assertLess(time.time() - start, 0.5)
+        self.assertEqual(len(self.interpreter.messages), 1)
+
+    def test_extraction_is_batched_in_the_background(self):
+        self.interpreter.llm.extract_memories.return_value = ["a", "b"]
+        self.interpreter.llm.embed.return_value = [[0.1], [0.2]]
+
+        self.pipeline.submit_extraction("first exchange")
+        self.pipeline.submit_extraction("second exchange")
+        self.assertTrue(self.pipeline.flush(timeout=5))
+
+        self.interpreter.memory.add_semantic_memories.assert_called_with(
+            ["a", "b"], [[0.1], [0.2]]
+        )
+        # Memories are embedded in one call per batch, never one at a time
+        for call in self.interpreter.llm.embed.call_args_list:
+            self.assertIsInstance(call.args[0], list)
+
+    def test_extraction_runs_on_a_copy_of_the_llm(self):
+        used = []
+
+        class FakeLlm:
+            _is_loaded = True
+
+            def __init__(self):
+                self.token_ledger = SimpleNamespace(total_tokens=0)
+
+            def extract_memories(self, text):
+                used.append(self)
+                self.token_ledger.total_tokens += 100
+                return ["a"]
+
+            def embed(self, texts):
+                return [[0.1]]
+
+        self.interpreter.llm = FakeLlm()
+        self.pipeline.submit_extraction("an exchange")
+        self.assertTrue(self.pipeline.flush(timeout=5))
+
+        self.assertEqual(len(used), 1)
+        self.assertIsNot(used[0], self.interpreter.llm)
+        self.assertEqual(self.interpreter.llm.token_ledger.total_tokens, 0)
+
+    def test_close_stops_the_worker(self):
+        self.interpreter.llm.extract_memories.return_value = ["a"]
+        self.interpreter.llm.embed.return_value = [[0.1]]
+
+        self.pipeline.submit_extraction("first exchange")
+        worker = self.pipeline._worker
+        self.pipeline.close()
+        worker.join(5)
+        self.assertFalse(worker.is_alive())
+        # What was queued before closing is still stored
+        self.interpreter.memory.add_semantic_memories.assert_called_once()
+
+        self.pipeline.submit_extraction("second exchange")
+        self.assertTrue(self.pipeline.flush(timeout=5))
+        self.assertEqual(self.interpreter.memory.add_semantic_memories.call_count, 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
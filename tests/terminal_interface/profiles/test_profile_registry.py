@@ -0,0 +1,83 @@
+import os
+import tempfile
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+from interpreter.terminal_interface.profiles import profiles
+from interpreter.terminal_interface.profiles.profile_registry import ProfileRegistry
+
+
+def fake_interpreter():
+    return SimpleNamespace(
+        custom_instructions="",
+        llm=SimpleNamespace(model=None, temperature=None),
+        computer=SimpleNamespace(import_computer_api=False),
+    )
+
+
+class TestProfileRegistry(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        patcher = mock.patch.object(profiles, "profile_dir", self.directory.name)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(self.directory.cleanup)
+        self.registry = ProfileRegistry()
+
+    def write(self, name, text):
+        path = os.path.join(self.directory.name, name)
+        with open(path, "w") as f:
+            f.write(text)
+        return path
+
+    def test_default_profiles_are_compiled_once(self):
+        with mock.patch.object(
+            profiles, "get_default_profile", wraps=profiles.get_default_profile
+        ) as get_default_profile:
+            compiled = self.registry.get("fast")
+            self.assertIs(self.registry.get("fast.yaml"), compiled)
+        self.assertEqual(get_default_profile.call_count, 1)
+
+        first, second = fake_interpreter(), fake_interpreter()
+        self.registry.apply(first, "fast")
+        self.registry.apply(second, "fast")
+        self.assertEqual(first.llm.model, "gpt-4o-mini")
+        self.assertTrue(second.computer.import_computer_api)
+        self.assertIn("FAST mode", second.custom_instructions)
+
+        with self.assertRaises(AttributeError):
+            compiled.settings = ()
+
+    def test_changed_files_are_recompiled(self):
+        path = self.write("mine.yaml", "llm:\n  model: first\nversion: 0.2.5\n")
+        interpreter = fake_interpreter()
+        compiled = self.registry.apply(interpreter, "mine.yaml")
+        self.assertEqual(interpreter.llm.model, "first")
+        self.assertIs(self.registry.get("mine.yaml"), compiled)
+
+        self.write("mine.yaml", "llm:\n  model: second\nversion: 0.2.5\n")
+        stat = os.stat(path)
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+        self.registry.apply(interpreter, "mine.yaml")
+        self.assertEqual(interpreter.llm.model, "second")
+
+    def test_python_profiles_run_against_the_given_interpreter(self):
+        self.write(
+            "script.py",
+            "from interpreter import interpreter\ninterpreter.llm.model = 'scripted'\n",
+        )
+        interpreter = fake_interpreter()
+        self.registry.apply(interpreter, "script.py")
+        self.assertEqual(interpreter.llm.model, "scripted")
+
+    def test_old_profiles_are_rejected_without_prompting(self):
+        self.write("old.yaml", "model: gpt-4\nversion: 0.2.1\n")
+        with mock.patch("builtins.input") as prompt:
+            with self.assertRaises(ValueError):
+                self.registry.get("old.yaml")
+        prompt.assert_not_called()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -3,6 +3,7 @@ import platform
 import signal
 import time
 from random import randint
+from unittest import mock
 
 import pytest
 
@@ -1297,6 +1298,27 @@ def test_reset():
     assert interpreter.messages == []
 
 
+def test_streamed_output_is_not_truncated():
+    # Only the stored message is truncated to max_output, never the chunks we stream
+    def respond(interpreter):
+        yield {"role": "computer", "type": "console", "format": "output", "content": "x" * 5000}
+        yield {"role": "computer", "type": "console", "format": "output", "content": "y" * 5000}
+
+    max_output = interpreter.max_output
+    interpreter.max_output = 100
+    try:
+        with mock.patch("interpreter.core.core.respond", respond):
+            chunks = [
+                chunk for chunk in interpreter._respond_and_store() if "content" in chunk
+            ]
+        assert [chunk["content"] for chunk in chunks] == ["x" * 5000, "y" * 5000]
+        assert interpreter.messages[-1]["content"].endswith("y" * 100)
+        assert len(interpreter.messages[-1]["content"]) < 5000
+    finally:
+        interpreter.max_output = max_output
+        interpreter.reset()
+
+
 def test_token_counter():
     system_tokens = count_tokens(
         text=interpreter.system_message, model=interpreter.llm.model